@@ -20,9 +20,88 @@ Moving any of these folders or files will prevent the game from working properly
 Author: Walker M. White (wmw2)
 Date:   November 1, 2017 (Python 3 Version)
 """
+import config    # First, so that it records the start time
 from consts import *
-from app import *
 
-# Application code
+# Application code. Only import what the chosen run needs: a headless run never
+# loads game2d or Kivy.
 if __name__ == '__main__':
-    Invaders(width=GAME_WIDTH,height=GAME_HEIGHT).run()
+    if WAVES != None:
+        #Compile the campaign now, so a bad file is reported before any play
+        from formations import openCampaign
+        try:
+            openCampaign(WAVES)
+        except (OSError, ValueError) as e:
+            import sys
+            sys.exit('--waves %s: %s' % (WAVES, e))
+    if SERVE_PORT != None:
+        from server import runServer
+        if not runServer(SERVE_PORT, SERVE_BOTS, BENCH_FRAMES or REPORT_FRAMES):
+            import sys
+            sys.exit(1)
+    elif DIFF != None:
+        from difftest import runDiffTest
+        import sys
+        try:
+            passed = runDiffTest(DIFF, BENCH_FRAMES or REPORT_FRAMES)
+        except ValueError as e:
+            sys.exit('--diff %s: %s' % (DIFF, e))
+        if not passed:
+            sys.exit(1)
+    elif VERSUS != None:
+        from versus import runVersus
+        if not runVersus(VERSUS, BENCH_FRAMES or REPORT_FRAMES):
+            import sys
+            sys.exit(1)
+    elif SOAK != None:
+        from soak import runSoak
+        if not runSoak(SOAK):
+            import sys
+            sys.exit(1)
+    elif HEADLESS and SPLIT:
+        from bench import runSplitBenchmark
+        runSplitBenchmark(BENCH_FRAMES or REPORT_FRAMES)
+    elif HEADLESS:
+        from bench import runBenchmark
+        from perf import AllocationCounter
+        counter = AllocationCounter() if ALLOC_CHECK else None
+        feed = None
+        if SPECTATE != None:
+            from spectate import SpectatorFeed
+            feed = SpectatorFeed(SPECTATE)
+        events = None
+        if TELEMETRY != None:
+            from telemetry import EventLog
+            events = EventLog(TELEMETRY)
+        recorder = None
+        if RECORD != None:
+            from raster import FrameRenderer, FrameRecorder
+            renderer = FrameRenderer.create()
+            if renderer == None:
+                import sys
+                sys.exit('--record needs NumPy')
+            recorder = FrameRecorder(RECORD, renderer)
+            if RECORD == '-':
+                #The frames go to standard output, so the reports must not
+                import sys
+                sys.stdout = sys.stderr
+            for error in renderer.getErrors():
+                print('record: %s (drawn as a rectangle)' % error)
+        timer = runBenchmark(BENCH_FRAMES or REPORT_FRAMES, counter, feed,
+        events, recorder)
+        if recorder != None:
+            recorder.close()
+        if feed != None:
+            feed.close()
+        if events != None:
+            events.close()
+            print(events.report())
+        if counter != None and not counter.isPassing():
+            import sys
+            sys.exit(1)
+        if GAME_MODE == MODE_BULLET_HELL and not timer.isStressPassing():
+            import sys
+            sys.exit(1)
+    else:
+        from app import Invaders
+        Invaders(width=GAME_WIDTH,height=GAME_HEIGHT).run()
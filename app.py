@@ -13,6 +13,13 @@ Date: May 7, 2019
 from consts import *
 from game2d import *
 from wave import *
+from perf import *
+from preload import *
+from hud import *
+from controls import *
+import config
+import atexit
+import time
 
 
 # PRIMARY RULE: Invaders can only access attributes in wave.py via getters/setters
@@ -72,11 +79,46 @@ class Invaders(GameApp):
     LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
 
     INSTANCE ATTRIBUTES:
-        _last:  [bool] True if 's' was pressed during the last frame, False
-                otherwise
+        _keys:  [InputSnapshot] the keys of this frame, read once at the
+                start of update, with the presses and releases
+        _probe: [LatencyProbe, or None unless LATENCY_REPORT] measures the
+                time from a key press to the frame that shows it
+        _keyNames: [dict of int to str] the names of the Kivy keycodes in
+                INPUT_KEYS
         _prev:  [int] contains the previous state
         _level: [int] contains the number of waves completed
         _score: [int] contains the current score of the game
+        _timer: [FrameTimer, or None if GAME_MODE is MODE_CLASSIC]
+                measures every frame against FRAME_BUDGET
+        _next:  [Wave or None] the next wave, built a slice at a time while
+                the welcome or wave-complete screen is showing; None if no
+                next wave has been started (the first is only started once
+                _loader is installed)
+        _loader: [Preloader] reads the images, sounds and font in the
+                background while the welcome screen is showing
+        _drawn: [bool] True once the first frame has been drawn
+        _messages: [MessageCache] the state messages, each laid out once
+        _background: [GRectangle] the black background, made once
+        _link:  [SimulationLink, or None unless SPLIT] the simulation process
+                of a split run; its waves are RemoteWaves
+        _feed:  [SpectatorFeed, or None unless SPECTATE] streams each tick
+                of play to spectators (not in a split run, whose waves live
+                in the other process)
+        _events: [EventLog, or None unless TELEMETRY] records state changes,
+                and the kills, hits and shots of every wave (those are not
+                recorded in a split run)
+        _scores: [Leaderboard] every finished game, kept between runs in
+                LEADERBOARD (or LEADERBOARD_FILE)
+        _governor: [FrameGovernor, or None unless GOVERNOR] sheds optional
+                work while frames run over budget
+        _retained: [RetainedView, or None unless GOVERNOR] the last frame of
+                the wave, shown again when the governor skips a draw
+        _pilot: [Autopilot, or None unless AUTOPILOT] flies the ship and
+                presses 'S' on the pause screens (not in a split run, whose
+                waves live in the other process)
+        _timeScale: [TimeScale, or None in a split run] plays the wave faster
+                or slower than real time ('-' and '=' change it; a split
+                run's simulation keeps its own 60 Hz)
     """
 
     # DO NOT MAKE A NEW INITIALIZER!
@@ -99,14 +141,61 @@ class Invaders(GameApp):
         #Initializing Game State
         self._state = STATE_INACTIVE
         self._wave = None
-        self._text = GLabel(\
-        text="Press 'S' to Play\n'M' to mute // 'P' to unmute",
-        font_name = 'Arcade.ttf', font_size = 48, linecolor = 'white',
-        x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
+        self._messages = MessageCache()
+        self._text = self._messages.get(\
+        "Press 'S' to Play\n'M' to mute // 'P' to unmute\n"
+        "'-' slower // '=' faster")
         self._prev = self._state
-        self._last = False
+        self._keys = InputSnapshot()
+        self._probe = None
+        if LATENCY_REPORT and not SPLIT:
+            self._probe = LatencyProbe()
+        self._listenForKeys()
         self._level = 0
         self._score = 0
+        self._timer = None
+        if GAME_MODE != MODE_CLASSIC:
+            self._timer = FrameTimer()
+        self._drawn = False
+        self._background = GRectangle(width = GAME_WIDTH,
+        height = GAME_HEIGHT, x = GAME_WIDTH/2, y = GAME_HEIGHT/2,
+        fillcolor = 'black')
+        self._loader = Preloader()
+        self._loader.start()
+        self._link = None
+        if SPLIT:
+            from simulation import SimulationLink
+            self._link = SimulationLink()
+            self._link.start()
+        self._feed = None
+        if SPECTATE != None and not SPLIT:
+            from spectate import SpectatorFeed
+            self._feed = SpectatorFeed(SPECTATE)
+        self._events = None
+        if TELEMETRY != None:
+            from telemetry import EventLog
+            self._events = EventLog(TELEMETRY)
+            atexit.register(self._events.close)
+        from leaderboard import Leaderboard
+        self._scores = Leaderboard(LEADERBOARD or LEADERBOARD_FILE)
+        atexit.register(self._scores.close)
+        self._governor = None
+        self._retained = None
+        if GOVERNOR:
+            self._governor = FrameGovernor()
+            self._retained = RetainedView()
+        self._timeScale = None
+        if not SPLIT:
+            self._timeScale = TimeScale(TIME_SCALE)
+            if self._retained == None:
+                self._retained = RetainedView()
+        self._pilot = None
+        if AUTOPILOT and not SPLIT:
+            from autopilot import Autopilot
+            self._pilot = Autopilot()
+        #The first wave is only started once the preloader is installed (see
+        #update), so its ship, sprites and sounds come from the cache
+        self._next = None
 
     def update(self,dt):
         """
@@ -152,27 +241,68 @@ class Invaders(GameApp):
 
         STATE_COMPLETE: The wave is over, and is either won or lost.
 
+        In every state '-' and '=' halve and double the time scale (see
+        _playActive).
+
         You are allowed to add more states if you wish. Should you do so, you
         should describe them here.
 
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        if self._timer != None:
+            self._timer.begin()
+        if self._governor != None:
+            self._governor.begin()
+        if self._pilot != None:
+            self._keys.setMask(self._pilotKeys())
+        else:
+            self._keys.sample(self.input)
+        if self._timeScale != None:
+            self._changeTimeScale()
+
         #Process the states. Send to helper methods.
         if self._state == STATE_INACTIVE:
             self._dismissWelcome()
+            if self._loader.isDone():
+                self._loader.install()
+                if self._next == None:
+                    self._prebuild(self._level, self._score)
+            if self._next != None:
+                self._next.buildStep(PREBUILD_BUDGET)
         elif self._state == STATE_NEWWAVE:
-            self._createWave()
+            #Wait for the preloader a frame at a time rather than block
+            if self._loader.isDone():
+                self._createWave()
         elif self._state == STATE_ACTIVE:
-            self._wave.update(self.input, dt)
-            self._didLoseLife()
-            self._isGameOver()
+            if self._governor != None:
+                self._wave.setDetail(self._governor.getLevel())
+            self._playActive(dt)
         elif self._state == STATE_PAUSED:
+            #Explosions keep playing while the wave waits
+            self._wave.updateEffects(dt)
             self._gamePaused()
+        elif self._state == STATE_COMPLETE and self._wave != None:
+            self._wave.updateEffects(dt)
+
+        #Keep collector pauses out of play (see GC_CONTROL)
+        if self._state != self._prev:
+            if self._events != None:
+                self._events.emit(EVENT_STATE, self._prev, self._state,
+                self._level)
+            if self._state == STATE_ACTIVE:
+                pauseCollector()
+            elif self._prev == STATE_ACTIVE:
+                resumeCollector()
 
         #Update previous state
         self._prev = self._state
 
+        if self._timer != None:
+            self._timer.endUpdate()
+        if self._governor != None:
+            self._governor.endUpdate()
+
     def draw(self):
         """
         Draws the game objects to the view.
@@ -186,48 +316,261 @@ class Invaders(GameApp):
         Wave. We suggest the latter. See the example subcontroller.py from
         class.
         """
+        if self._timer != None:
+            self._timer.begin()
+        if self._governor != None:
+            self._governor.begin()
+
         #Draw background color
-        GRectangle(width = GAME_WIDTH, height = GAME_HEIGHT, x = GAME_WIDTH/2,
-        y = GAME_HEIGHT/2, fillcolor = 'black').draw(self.view)
+        self._background.draw(self.view)
 
         #Draw alien wave, ship, and defense line
+        drawn = True
         if self._wave != None:
-            self._wave.draw(self.view)
+            drawn = self._drawWave()
 
         #Draw start text
         if self._text != None:
             self._text.draw(self.view)
 
+        #Report the time to first frame
+        if not self._drawn:
+            self._drawn = True
+            if STARTUP_REPORT:
+                print('first frame after %.1f ms' %
+                ((time.perf_counter()-config.STARTED)*1000))
+
+        #Check the frame against the frame budget
+        if self._timer != None:
+            bolts = 0
+            if self._wave != None:
+                bolts = self._wave.getBoltCount()
+            self._timer.endDraw(bolts)
+            if self._timer.isReportDue():
+                self._printReport()
+        if self._probe != None:
+            self._probe.afterDraw()
+            if self._probe.isReportDue():
+                print(self._probe.report())
+        if self._pilot != None and self._pilot.isReportDue():
+            print(self._pilot.report())
+        if self._timeScale != None and self._timeScale.isReportDue():
+            #Only a host that cannot keep up is worth a line
+            if self._timeScale.isKeepingUp():
+                self._timeScale.report()
+            else:
+                print(self._timeScale.report())
+        if self._governor != None:
+            self._governor.endDraw(drawn)
+
     # HELPER METHODS FOR THE STATES GO HERE
+    def _playActive(self, dt):
+        """
+        Plays the wave for one frame, at the time scale.
+
+        At 1x the wave is updated once with dt, as always. Otherwise it plays
+        the ticks the TimeScale asks for, each FRAME_BUDGET seconds long, so
+        the aliens (timed by dt) and the ship and bolts (moved per update)
+        keep pace with each other. The ticks stop early if the wave ends or
+        the frame runs out of time. Only the first tick sees this frame's key
+        presses; with the autopilot flying, it decides before every tick. The
+        presses of a frame that plays no tick are kept for the next tick (see
+        InputSnapshot.keepPresses), so slow motion drops no taps.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        if self._timeScale == None or self._timeScale.isRealTime():
+            planned = 1
+            tick = dt
+        else:
+            planned = self._timeScale.plan(dt)
+            tick = FRAME_BUDGET
+        played = 0
+        while played < planned and self._state == STATE_ACTIVE and \
+        (played == 0 or self._timeScale.hasTime()):
+            if played > 0:
+                self._keys.setMask(self._pilotKeys() if self._pilot != None
+                else self._keys.getMask())
+            self._wave.update(self._keys, tick)
+            if self._probe != None:
+                self._probe.afterUpdate(self._keys, self._wave)
+            if self._feed != None:
+                self._feed.publish(self._wave)
+            self._didLoseLife()
+            self._isGameOver()
+            played += 1
+        if played == 0:
+            #Slow motion: a tap on a frame with no tick goes to the next tick
+            self._keys.keepPresses(KEY_PLAY)
+        if self._state != STATE_ACTIVE:
+            #The ticks left when the wave ends are not dropped, just not owed
+            planned = played
+        if self._timeScale != None:
+            self._timeScale.endTicks(planned, played, dt)
+
+    def _changeTimeScale(self):
+        """
+        Halves the time scale when '-' is pressed and doubles it for '='.
+        """
+        if self._keys.isPressed(KEY_SLOWER):
+            self._timeScale.slower()
+        if self._keys.isPressed(KEY_FASTER):
+            self._timeScale.faster()
+
     def _dismissWelcome(self):
         """
         Dismisses the welcome screen text when the player presses 's'.
         """
-        #Dismissing the Welcome Screen
-        curr_keys = self._input.is_key_down('s')
-        #Only change if we pressed keys THIS animation frame
-        if curr_keys and not self._last:
+        #Dismissing the Welcome Screen, only if 's' went down THIS frame
+        if self._keys.isPressed(KEY_START):
             self._state = STATE_NEWWAVE
             self._text = None
-        self._last = curr_keys
+
+    def _pilotKeys(self):
+        """
+        Returns the keys of this frame when the autopilot is flying.
+
+        The autopilot gives the moves and shots in play, and presses 'S' on
+        the welcome and pause screens; the player only keeps the mute and
+        time scale keys.
+        """
+        mask = packKeys(self.input) & (KEY_MUTE | KEY_UNMUTE | KEY_SLOWER |
+        KEY_FASTER)
+        if self._state == STATE_ACTIVE:
+            mask |= self._pilot.decide(self._wave)
+        elif self._state in (STATE_INACTIVE, STATE_PAUSED):
+            mask |= self._pilot.waitKeys()
+        return mask
 
     def _createWave(self):
         """
         Creates a new Wave with the player's level and score. Then sets the
         state to STATE_ACTIVE.
+
+        The wave is normally already built by _prebuild during the previous
+        screen, so this is only a swap. Whatever is left is finished here.
+        The preloader must be done (see update).
         """
-        self._wave = Wave(self._level, self._score)
+        if GAME_MODE == MODE_ENDLESS and self._wave != None:
+            self._printReport()
+        self._loader.install()
+        if self._next == None:
+            self._prebuild(self._level, self._score)
+        self._next.buildStep(None)
+        if self._events != None and self._link == None:
+            self._next.setTelemetry(self._events)
+        self._wave = self._next
+        self._next = None
+        if self._retained != None:
+            self._retained.clear()
+        if self._timer != None:
+            self._timer.resetRates()
         self._state = STATE_ACTIVE
 
+    def _prebuild(self, level, score):
+        """
+        Starts building the wave for the given level in the background.
+
+        The new wave is lazy: the welcome and wave-complete screens call its
+        buildStep every frame with PREBUILD_BUDGET seconds to spare. In endless
+        mode the formation grows with the level (see waveFormation).
+        In a split run the wave is a RemoteWave, built by the simulation
+        process instead.
+
+        Parameter level: the number of waves completed
+        Precondition: level is an int >= 0
+
+        Parameter score: the score the wave starts with
+        Precondition: score is an int >= 0
+        """
+        if self._link != None:
+            self._next = self._link.newWave(level, score)
+        else:
+            self._next = Wave(level, score, waveFormation(level), True)
+
+    def _listenForKeys(self):
+        """
+        Passes every key press to the snapshot as it happens.
+
+        GInput only says which keys are down when the frame asks. Listening to
+        the Kivy window as well gives the snapshot the time each key actually
+        went down, so a LatencyProbe also counts the wait for the next frame.
+        """
+        from kivy.core.window import Window, Keyboard
+        self._keyNames = {}
+        for name in INPUT_KEYS:
+            if name in Keyboard.keycodes:
+                self._keyNames[Keyboard.keycodes[name]] = name
+        Window.bind(on_key_down = self._keyDown)
+
+    def _keyDown(self, window, key, *args):
+        """
+        Records the time of a key press in the snapshot (a Kivy handler).
+
+        Parameter window: the Kivy window
+        Precondition: window is the Window
+
+        Parameter key: the Kivy keycode of the key
+        Precondition: key is an int
+        """
+        if key in self._keyNames:
+            self._keys.keyEvent(self._keyNames[key])
+
+    def _drawWave(self):
+        """
+        Draws the wave, or shows its last frame again if the governor or the
+        time scale is skipping this draw.
+
+        Returns True if the wave was drawn, False if the last frame was shown.
+        While draws are being skipped (the governor at SHED_DRAW, or a fast
+        time scale in play), every frame of the wave goes through _retained,
+        so there is always a frame to show again. The time scale decides
+        which draws to skip while it is skipping.
+        """
+        fast = self._timeScale != None and self._timeScale.isSkipping() and \
+        self._state == STATE_ACTIVE
+        shed = self._governor != None and self._governor.getLevel() >= SHED_DRAW
+        if not fast and not shed:
+            #Objects go straight to the view again, not to the kept frame
+            if self._retained != None and not self._retained.isEmpty():
+                self._retained.clear()
+            self._wave.draw(self.view)
+            return True
+        if fast:
+            drawn = self._timeScale.shouldDraw()
+        else:
+            drawn = self._governor.shouldDraw()
+        drawn = drawn or self._retained.isEmpty()
+        if drawn:
+            self._retained.clear()
+            self._wave.draw(self._retained)
+        self._retained.show(self.view)
+        return drawn
+
+    def _printReport(self):
+        """
+        Prints the frame timer report for the current mode.
+
+        Endless mode reports sustained update and draw rates against the size
+        of the formation; bullet-hell mode reports frame times against
+        FRAME_BUDGET.
+        """
+        if GAME_MODE == MODE_ENDLESS:
+            aliens = 0
+            if self._wave != None:
+                aliens = self._wave.getAlienCount()
+            print(self._timer.rateReport(aliens))
+        else:
+            print(self._timer.report())
+
     def _didLoseLife(self):
         """
         Checks to see if the player still has remaining lives after dying. If
         there are remaining lives, displays text and pauses the game.
         """
         if self._wave.getShip() == None and self._wave.getLives() > 0:
-            self._text = GLabel(text="Press 'S' to Continue",
-            font_name = 'Arcade.ttf', font_size = 48, linecolor = 'white',
-            x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
+            self._text = self._messages.get("Press 'S' to Continue")
             self._state = STATE_PAUSED
 
     def _gamePaused(self):
@@ -236,35 +579,48 @@ class Invaders(GameApp):
         game or completed a wave. If the game is still playing, this creates a
         new Wave.
         """
-        curr_keys = self._input.is_key_down('s')
+        curr_keys = self._keys.isPressed(KEY_START)
         if self._wave.getResult() == 1:
-            self._text = GLabel(text="Game Over!",
-            font_name = 'Arcade.ttf', font_size = 48, linecolor = 'white',
-            x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
-            self._state = STATE_COMPLETE
+            self._endGame("Game Over!")
         elif self._wave.getResult() == 2:
-            if self._level >= 2:
-                self._text = GLabel(text="You won the game!",
-                font_name = 'Arcade.ttf', font_size = 48, linecolor = 'white',
-                x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
-                self._state = STATE_COMPLETE
+            if self._level >= finalLevel() and GAME_MODE != MODE_ENDLESS:
+                self._endGame("You won the game!")
             else:
-                self._text = GLabel(\
-                text="You completed the wave.\nPress 'S' to Continue",
-                font_name = 'Arcade.ttf', font_size = 48, linecolor = 'white',
-                x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
-                if curr_keys and not self._last:
+                self._text = self._messages.get(\
+                "You completed the wave.\nPress 'S' to Continue")
+                #Use the time on this screen to build the next wave
+                if self._next == None:
+                    self._prebuild(self._level+1, self._wave.getScore())
+                self._next.buildStep(PREBUILD_BUDGET)
+                if curr_keys:
                     self._level += 1
                     self._score = self._wave.getScore()
                     self._state = STATE_NEWWAVE
                     self._text = None
-        if curr_keys and not self._last:
+        if curr_keys:
             self._wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
             SHIP_HEIGHT, 'ship.png'))
             if self._state == STATE_PAUSED:
                 self._state = STATE_ACTIVE
             self._text = None
-        self._last = curr_keys
+
+    def _endGame(self, message):
+        """
+        Records the finished game on the leaderboard and shows its rank.
+
+        The rank is looked up before the game is submitted, and the game is
+        written in the background, so this never waits for the disk.
+
+        Parameter message: the first line of the message to show
+        Precondition: message is a string
+        """
+        score = self._wave.getScore()
+        rank = self._scores.rank(score)
+        games = self._scores.count() + 1
+        self._scores.submit(PLAYER, score, self._level)
+        self._text = self._messages.get("%s\nRank %d of %d" % (message, rank,
+        games))
+        self._state = STATE_COMPLETE
 
     def _isGameOver(self):
         """
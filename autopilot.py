@@ -0,0 +1,314 @@
+"""
+Autopilot for Alien Invaders
+
+This module plays the ship on its own, for demo kiosks and as the baseline
+player of automated regression games. It is what flies the ship for
+
+    python invaders --autopilot
+    python invaders --bench 3000 --autopilot --mode bullethell
+
+An Autopilot gives the same keys a player would: every frame it returns a
+bitmask of KEY_LEFT, KEY_RIGHT and KEY_FIRE for an InputSnapshot, which is all
+Ship.moveShip and Wave._fireBolt read. It never reaches into the wave beyond
+its getters.
+
+Alien bolts fly in straight lines at a constant velocity, so the autopilot can
+tell exactly where each one will be on every frame. For each of the three
+moves (hold left, stay, hold right) it works out the first frame, within
+AUTOPILOT_HORIZON frames, on which holding that move would put the ship under
+a bolt. A move with no hit in that time is safe. Of the safe moves it takes
+the one that gets closest to its target, the lowest living alien in the
+column nearest the ship; if no move is safe, it takes the one that is hit
+last. It fires whenever the ship is under the target.
+
+Each decision must fit in AUTOPILOT_BUDGET seconds. Player bolts are passed
+over without being counted. For at most AUTOPILOT_GATHER of the budget the
+autopilot picks out the alien bolts that could be level with the ship within
+the horizon. Alien bolts all fall at one speed and are kept in the order they
+were fired, so any it has no time for are the newest, which are mostly the
+highest. It then follows the ones it picked out lowest first until it has
+spent AUTOPILOT_SCAN of the budget, so any it leaves out are the furthest from
+the ship. It looks at the clock every AUTOPILOT_CHECK alien bolts. Decisions
+that still ran over are counted, and every report says how many there were.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from models import Bolt
+import math
+import time
+
+
+class Autopilot(object):
+    """
+    A class to decide the keys of the ship, one frame at a time.
+
+    INSTANCE ATTRIBUTES:
+        _budget:    [float > 0] the seconds a decision may take
+        _fired:     [bool] True if fire was down in the last decision (a
+                    classic shot needs fire to go down again)
+        _waited:    [int >= 0] the frames spent on the current pause screen
+        _decisions: [int >= 0] the decisions made
+        _total:     [float >= 0] the seconds spent on all decisions
+        _worst:     [float >= 0] the longest decision in seconds
+        _over:      [int >= 0] the decisions that took longer than _budget
+        _cut:       [int >= 0] the decisions that ran out of time before they
+                    had looked at every alien bolt
+        _frames:    [int >= 0] decisions since the last report
+        _near:      [list of Bolt] the alien bolts that could reach the ship
+                    within AUTOPILOT_HORIZON frames, lowest first (empty
+                    between decisions)
+    """
+
+    def getOverruns(self):
+        """
+        Returns the number of decisions that took longer than the budget.
+        """
+        return self._over
+
+    def isWithinBudget(self):
+        """
+        Returns True if no decision has taken longer than the budget.
+        """
+        return self._over == 0
+
+    def __init__(self, budget = AUTOPILOT_BUDGET):
+        """
+        Initializes an Autopilot that has made no decisions.
+
+        Parameter budget: the seconds a decision may take
+        Precondition: budget is a number > 0
+        """
+        self._budget = budget
+        self._fired = False
+        self._waited = 0
+        self._decisions = 0
+        self._total = 0.0
+        self._worst = 0.0
+        self._over = 0
+        self._cut = 0
+        self._frames = 0
+        self._near = []
+
+    def decide(self, wave):
+        """
+        Returns the keys to hold down for the next frame of play.
+
+        The result is a bitmask of KEY_LEFT, KEY_RIGHT and KEY_FIRE, for
+        InputSnapshot.setMask (or unpackKeys and HeadlessInput.setKeys).
+
+        Parameter wave: the wave in play
+        Precondition: wave is a Wave
+        """
+        start = time.perf_counter()
+        self._waited = 0
+        ship = wave.getShip()
+        mask = 0
+        if ship != None:
+            x = ship.getShipX()
+            target = self._target(wave, x)
+            first = [AUTOPILOT_HORIZON+1]*3
+            reloaded = self._threats(wave.getBolts(), x, ship.getShipY(),
+            first, start)
+            mask = self._steer(x, target, first)
+            fire = False
+            if target != None:
+                fire = abs(target - x) <= wave.getAlienSize()[0]/2
+            if GAME_MODE == MODE_BULLET_HELL:
+                fire = True
+            elif fire and (self._fired or not reloaded):
+                #A classic shot needs a fresh press, and only one flies at once
+                fire = False
+            if fire:
+                mask |= KEY_FIRE
+            self._fired = fire
+        self._record(time.perf_counter() - start)
+        return mask
+
+    def waitKeys(self):
+        """
+        Returns the keys to hold down for a frame of a pause screen.
+
+        This is KEY_START once every AUTOPILOT_PAUSE frames, so the autopilot
+        starts or continues the game after a short wait, and 0 otherwise.
+        """
+        self._waited += 1
+        if self._waited < AUTOPILOT_PAUSE:
+            return 0
+        self._waited = 0
+        return KEY_START
+
+    def isReportDue(self):
+        """
+        Returns True once REPORT_FRAMES decisions were made since the last
+        report.
+        """
+        return self._frames >= REPORT_FRAMES
+
+    def report(self):
+        """
+        Returns a one line summary of the decision times so far.
+        """
+        self._frames = 0
+        mean = self._total/self._decisions if self._decisions > 0 else 0
+        status = 'WITHIN BUDGET' if self._over == 0 else 'OVER BUDGET'
+        return 'autopilot decisions=%d mean=%.3fms worst=%.3fms budget=%.3fms ' \
+        'over=%d cut=%d %s' % (self._decisions, mean*1000, self._worst*1000,
+        self._budget*1000, self._over, self._cut, status)
+
+    def _target(self, wave, x):
+        """
+        Returns the x-coordinate to aim at, or None if no alien is alive.
+
+        This is the lowest living alien of the column nearest to x that has
+        one. The search goes out from that column one column each way at a
+        time, and an empty column costs one look at its alive count.
+
+        Parameter wave: the wave in play
+        Precondition: wave is a Wave
+
+        Parameter x: the x-coordinate of the ship
+        Precondition: x is a number
+        """
+        cols = wave.getFormation().getCols()
+        origin = wave.getOrigin()[0]
+        pitch = wave.getPitch()[0]
+        col = min(max(int(round((x - origin)/pitch)), 0), cols-1)
+        for step in range(cols):
+            for near in (col - step, col + step):
+                if near >= 0 and near < cols:
+                    alien = wave.getBottomAlien(near)
+                    if alien != None:
+                        return alien.getAlienX()
+        return None
+
+    def _threats(self, bolts, x, y, first, start):
+        """
+        Fills in first with the frame each move would first be hit.
+
+        Returns True if no player bolt is in the air (as far as the bolts
+        looked at tell).
+
+        first[0] is for holding left, first[1] for staying and first[2] for
+        holding right; a move that is not hit within AUTOPILOT_HORIZON frames
+        keeps AUTOPILOT_HORIZON+1. The ship is tested where Wave.update would
+        test it: after the ship and the bolts have moved.
+
+        Parameter bolts: the bolts on screen
+        Precondition: bolts is a list of Bolt
+
+        Parameter x: the x-coordinate of the ship
+        Precondition: x is a number
+
+        Parameter y: the y-coordinate of the ship
+        Precondition: y is a number
+
+        Parameter first: the frames to fill in
+        Precondition: first is a list of 3 ints, each AUTOPILOT_HORIZON+1
+
+        Parameter start: the perf_counter value when the decision started
+        Precondition: start is a float
+        """
+        reach = (SHIP_WIDTH + BOLT_WIDTH)/2
+        top = y + (SHIP_HEIGHT + BOLT_HEIGHT)/2
+        bottom = y - (SHIP_HEIGHT + BOLT_HEIGHT)/2
+        low = SHIP_WIDTH/2
+        high = GAME_WIDTH - SHIP_WIDTH/2
+        deadline = start + self._budget*AUTOPILOT_GATHER
+        reloaded = True
+        near = self._near
+        cut = False
+        seen = 0
+        for b in bolts:
+            vy = b.getBoltVelocity()
+            if vy > 0:
+                reloaded = False
+                continue
+            seen += 1
+            if seen % AUTOPILOT_CHECK == 0 and time.perf_counter() >= deadline:
+                cut = True
+                break
+            #Only bolts that can be level with the ship within the horizon
+            by = b.getBoltY()
+            if by >= bottom and by <= top - vy*AUTOPILOT_HORIZON:
+                near.append(b)
+        #Nearest the ship first, so a cut leaves out the furthest bolts
+        near.sort(key=Bolt.getBoltY)
+        deadline = start + self._budget*AUTOPILOT_SCAN
+        seen = 0
+        for b in near:
+            seen += 1
+            if seen % AUTOPILOT_CHECK == 0 and time.perf_counter() >= deadline:
+                cut = True
+                break
+            vy = b.getBoltVelocity()
+            by = b.getBoltY()
+            #The frames on which the bolt is level with the ship
+            enter = max(1, math.ceil((by - top)/-vy))
+            leave = min(AUTOPILOT_HORIZON, math.floor((by - bottom)/-vy))
+            if enter > leave:
+                continue
+            bx = b.getBoltX()
+            vx = b.getBoltVX()
+            if abs(bx - x) > reach + (SHIP_MOVEMENT + abs(vx))*leave:
+                continue
+            for move in range(3):
+                if first[move] <= enter:
+                    continue
+                step = (move-1)*SHIP_MOVEMENT
+                for k in range(enter, leave+1):
+                    ship_x = min(max(x + step*k, low), high)
+                    if abs(bx + vx*k - ship_x) <= reach:
+                        first[move] = k
+                        break
+        #Let go of the bolts, so none outlives its wave
+        del near[:]
+        if cut:
+            self._cut += 1
+        return reloaded
+
+    def _steer(self, x, target, first):
+        """
+        Returns KEY_LEFT, KEY_RIGHT or 0 for the move to make.
+
+        Parameter x: the x-coordinate of the ship
+        Precondition: x is a number
+
+        Parameter target: the x-coordinate to aim at
+        Precondition: target is a number or None
+
+        Parameter first: the frame each move is first hit (see _threats)
+        Precondition: first is a list of 3 ints
+        """
+        if target == None:
+            target = GAME_WIDTH/2
+        best = 1
+        best_gap = abs(target - x)
+        safe = first[1] > AUTOPILOT_HORIZON
+        for move in (0, 2):
+            gap = abs(target - x - (move-1)*SHIP_MOVEMENT)
+            if first[move] > AUTOPILOT_HORIZON:
+                if not safe or gap < best_gap - SHIP_MOVEMENT/2:
+                    best = move
+                    best_gap = gap
+                    safe = True
+            elif not safe and first[move] > first[best]:
+                best = move
+                best_gap = gap
+        return (KEY_LEFT, 0, KEY_RIGHT)[best]
+
+    def _record(self, elapsed):
+        """
+        Counts one decision that took elapsed seconds.
+
+        Parameter elapsed: the time of the decision
+        Precondition: elapsed is a number >= 0
+        """
+        self._decisions += 1
+        self._frames += 1
+        self._total += elapsed
+        if elapsed > self._worst:
+            self._worst = elapsed
+        if elapsed > self._budget:
+            self._over += 1
@@ -0,0 +1,17 @@
+"""
+Graphics backend for Alien Invaders
+
+The models and Wave import their graphics classes from here instead of from
+game2d. In a normal run this is game2d. In a headless run (HEADLESS in
+consts.py) it is the module headless, and neither game2d nor Kivy is ever
+imported.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+
+if HEADLESS:
+    from headless import *
+else:
+    from game2d import *
@@ -0,0 +1,253 @@
+"""
+Headless benchmark for Alien Invaders
+
+This module plays a scripted game without a window and reports how long each
+Wave.update takes. It is what runs for
+
+    python invaders --bench 3000 --mode bullethell
+
+The script holds the spacebar and sweeps the ship left and right, so every
+part of Wave.update (ship, aliens, bolts, collisions) is exercised. In
+bullet-hell mode it fires only for the first BENCH_HELL_FIRE frames of each
+sweep, so the formation lives long enough to put STRESS_BOLTS bolts on screen;
+the run then fails if no stress frames were measured, or too few of them fit
+in the frame budget. Every frame is drawn into a frame buffer by the offscreen
+renderer (see raster.py), so the frame times and the stress target cover
+update and draw. Without NumPy there is no renderer, and frames are drawn to a
+headless GView that draws nothing; the target then covers update only, and
+the stress report says so. When a wave ends a new one starts, growing in
+endless mode, until all the frames are played.
+
+With --split the same script drives a RemoteWave instead, and every draw is
+padded to SPLIT_SLOW_DRAW seconds. The report compares the render frame rate
+with the tick rate the simulation process kept, which should stay at 60.
+
+With --alloc-check the benchmark also runs an AllocationCounter and prints its
+report at the end; the process exits with status 1 if the update of any frame
+after warm-up took more than ALLOC_SCRATCH bytes from the allocator. The draw
+is left out, as the renderer works in NumPy arrays made for each frame. The
+counter traces every allocation, so frame times are slower with it.
+With --latency it runs a LatencyProbe and prints its report with the others.
+With --record every frame is also drawn offscreen by a FrameRecorder (see
+raster.py), in the draw part of the frame, and written out. With --governor a
+FrameGovernor watches the frames and the waves shed work as it says; a skipped
+draw writes the last frame again. With --autopilot an Autopilot (see
+autopilot.py) flies the ship instead of the script, and its decision times are
+reported with the others.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from backend import *
+from wave import *
+from perf import *
+from controls import *
+import config
+import time
+
+
+def scriptKeys(frame):
+    """
+    Returns the keys the benchmark script holds down on the given frame.
+
+    Parameter frame: the frame number
+    Precondition: frame is an int >= 0
+    """
+    if GAME_MODE == MODE_BULLET_HELL and frame % BENCH_SWEEP >= BENCH_HELL_FIRE:
+        fire = ()
+    else:
+        fire = ('spacebar',)
+    if (frame // BENCH_SWEEP) % 2 == 0:
+        return fire + ('left',)
+    return fire + ('right',)
+
+
+def runBenchmark(frames, counter = None, feed = None, events = None,
+recorder = None):
+    """
+    Plays frames scripted frames headless and prints the timing reports.
+
+    Returns the frame timer, so callers can look at the results.
+
+    Parameter frames: the number of frames to play
+    Precondition: frames is an int > 0
+
+    Parameter counter: the allocation counter to feed every frame
+    Precondition: counter is an AllocationCounter or None
+
+    Parameter feed: the spectator feed to publish every frame to; a
+    SpectatorClient watches it and checks it at every report
+    Precondition: feed is a SpectatorFeed or None
+
+    Parameter events: the event log every wave records to
+    Precondition: events is an EventLog or None
+
+    Parameter recorder: the recorder to draw every frame with
+    Precondition: recorder is a FrameRecorder or None
+    """
+    input = HeadlessInput()
+    keys = InputSnapshot()
+    probe = LatencyProbe() if LATENCY_REPORT else None
+    pilot = None
+    if AUTOPILOT:
+        from autopilot import Autopilot
+        pilot = Autopilot()
+    governor = FrameGovernor() if GOVERNOR else None
+    client = None
+    if feed != None:
+        from spectate import SpectatorClient
+        client = SpectatorClient(feed.getServer().getAddress())
+    timer = FrameTimer()
+    renderer = None
+    view = None
+    if recorder == None:
+        from raster import FrameRenderer
+        renderer = FrameRenderer.create()
+        if renderer == None:
+            view = GView()
+            print('bench: no NumPy, so frames are not drawn; the frame times '
+            'cover update only')
+        else:
+            for error in renderer.getErrors():
+                print('bench: %s (drawn as a rectangle)' % error)
+    level = 0
+    wave = Wave(level, 0, waveFormation(level))
+    wave.setTelemetry(events)
+    print('ready to tick after %.1f ms' % ((time.perf_counter()-config.STARTED)
+    *1000))
+    resumeCollector()
+    pauseCollector()
+    if counter != None:
+        counter.restart()
+    for frame in range(frames):
+        if pilot != None:
+            input.setKeys(unpackKeys(pilot.decide(wave)))
+        else:
+            input.setKeys(scriptKeys(frame))
+        if counter != None:
+            counter.beginFrame()
+        timer.begin()
+        if governor != None:
+            governor.begin()
+            wave.setDetail(governor.getLevel())
+        keys.sample(input)
+        wave.update(keys, FRAME_BUDGET)
+        if feed != None:
+            feed.publish(wave)
+        if probe != None:
+            probe.afterUpdate(keys, wave)
+        if counter != None:
+            counter.endFrame()
+        timer.endUpdate()
+        drawn = governor == None or governor.shouldDraw()
+        if governor != None:
+            governor.endUpdate()
+            governor.begin()
+        timer.begin()
+        if recorder != None:
+            if drawn:
+                recorder.record(wave)
+            else:
+                recorder.repeat()
+        elif drawn and renderer != None:
+            renderer.render(wave)
+        elif drawn:
+            wave.draw(view)
+        timer.endDraw(wave.getBoltCount())
+        if governor != None:
+            governor.endDraw(drawn)
+        if probe != None:
+            probe.afterDraw()
+        if timer.isReportDue():
+            print(timer.report())
+            if client != None:
+                print(client.check(wave, feed.getTick()))
+            if probe != None:
+                print(probe.report())
+            if pilot != None:
+                print(pilot.report())
+        if wave.getResult() != 0:
+            print(timer.rateReport(wave.getAlienCount()))
+            level += 1
+            resumeCollector()
+            wave = Wave(level, wave.getScore(), waveFormation(level))
+            wave.setTelemetry(events)
+            pauseCollector()
+            timer.resetRates()
+            if counter != None:
+                counter.restart()
+        elif wave.getShip() == None:
+            resumeCollector()
+            wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+            pauseCollector()
+            if counter != None:
+                counter.restart()
+    resumeCollector()
+    print(timer.report())
+    print(timer.rateReport(wave.getAlienCount()))
+    if GAME_MODE == MODE_BULLET_HELL:
+        print(timer.stressReport('update+draw' if view == None else
+        'update only'))
+    if counter != None:
+        print(counter.report())
+    if probe != None:
+        print(probe.report())
+    if recorder != None:
+        print(recorder.report())
+    if pilot != None:
+        print(pilot.report())
+    if client != None:
+        print(client.check(wave, feed.getTick()))
+        client.close()
+    return timer
+
+
+def runSplitBenchmark(frames):
+    """
+    Plays frames scripted render frames against a simulation process.
+
+    Each frame sends the keys, then draws for at least SPLIT_SLOW_DRAW
+    seconds. Prints the render frame rate and the simulation tick rate, and
+    returns the tick rate.
+
+    Parameter frames: the number of frames to play
+    Precondition: frames is an int > 0
+    """
+    from simulation import SimulationLink
+    input = HeadlessInput()
+    keys = InputSnapshot()
+    view = GView()
+    link = SimulationLink()
+    link.start()
+    level = 0
+    wave = link.newWave(level, 0)
+    wave.buildStep(None)
+    print('ready to tick after %.1f ms' % ((time.perf_counter()-config.STARTED)
+    *1000))
+    start = time.perf_counter()
+    for frame in range(frames):
+        begin = time.perf_counter()
+        input.setKeys(scriptKeys(frame))
+        keys.sample(input)
+        wave.update(keys, FRAME_BUDGET)
+        wave.draw(view)
+        delay = SPLIT_SLOW_DRAW - (time.perf_counter() - begin)
+        if delay > 0:
+            time.sleep(delay)
+        if wave.getResult() != 0:
+            level += 1
+            wave = link.newWave(level, wave.getScore())
+            wave.buildStep(None)
+        elif wave.getShip() == None:
+            wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+    fps = frames/(time.perf_counter() - start)
+    rate = link.getTickRate()
+    link.stop()
+    status = 'PASS' if rate >= FRAME_PASS_RATE/FRAME_BUDGET else 'FAIL'
+    print('split render fps=%.1f simulation ticks/s=%.1f %s' % (fps, rate,
+    status))
+    return rate
+
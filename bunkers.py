@@ -0,0 +1,229 @@
+"""
+Destructible bunkers for Alien Invaders
+
+This module contains the shields that sit just above the defense line. A
+bunker is not a GObject. Its shape is a bitmap of BUNKER_COLS x BUNKER_ROWS
+cells, packed as one Python int per row (bit c set means cell c is solid). A
+bolt hitting a bunker is a lookup in the rows the bolt overlaps, and the damage
+is a precomputed crater stamp cleared out of those rows with a mask.
+
+The bunker is drawn as a single textured rectangle. The texture is rebuilt and
+re-uploaded only on frames where a crater changed the bitmap. Kivy is imported
+the first time a bunker is drawn, so headless runs never load it.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+
+
+# The crater stamp, as (row offset, mask) pairs. Bit BUNKER_CRATER of each mask
+# is the center column of the crater.
+_CRATER = []
+for dy in range(-BUNKER_CRATER, BUNKER_CRATER+1):
+    mask = 0
+    for dx in range(-BUNKER_CRATER, BUNKER_CRATER+1):
+        if dx*dx + dy*dy <= BUNKER_CRATER*BUNKER_CRATER:
+            mask |= 1 << (dx+BUNKER_CRATER)
+    _CRATER.append((dy, mask))
+
+# The RGBA bytes for every possible byte of bitmap (8 cells, lowest bit first),
+# so a texture row is built a byte at a time instead of a cell at a time.
+_SOLID = bytes(int(255*c) for c in BUNKER_COLOR)
+_EMPTY = bytes(4)
+_EXPAND = [b''.join(_SOLID if (byte >> bit) & 1 else _EMPTY
+           for bit in range(8)) for byte in range(256)]
+
+
+class Bunker(object):
+    """
+    A class to represent a single destructible bunker.
+
+    INSTANCE ATTRIBUTES:
+        _x:       [number] horizontal location of the bunker center
+        _y:       [number] vertical location of the bunker center
+        _left:    [number] x-coordinate of the left edge of the bunker
+        _bottom:  [number] y-coordinate of the bottom edge of the bunker
+        _rows:    [list of int] one bitmask per row of cells, bottom row first
+        _full:    [int] the mask with all BUNKER_COLS bits set
+        _dirty:   [bool] True if _rows changed since the texture was built
+        _texture: [Texture or None] the bitmap as an RGBA texture, None until
+                  the first draw
+        _group:   [InstructionGroup or None] the color and rectangle to draw,
+                  None until the first draw
+    """
+
+    def getX(self):
+        """
+        Returns x-coordinate of the bunker center.
+        """
+        return self._x
+
+    def getY(self):
+        """
+        Returns y-coordinate of the bunker center.
+        """
+        return self._y
+
+    def getRows(self):
+        """
+        Returns the bitmask of each row of cells, bottom row first.
+
+        The list is the bunker's own; do not change it (use setRows).
+        """
+        return self._rows
+
+    def setRows(self, rows):
+        """
+        Sets the bitmask of each row of cells, e.g. from another process.
+
+        The texture is only rebuilt if a row changed.
+
+        Parameter rows: the bitmasks, bottom row first
+        Precondition: rows is a sequence of BUNKER_ROWS ints (or whole floats)
+        """
+        for r in range(BUNKER_ROWS):
+            mask = int(rows[r])
+            if mask != self._rows[r]:
+                self._rows[r] = mask
+                self._dirty = True
+
+    def __init__(self, x, y):
+        """
+        Initializes a Bunker with the classic arch shape.
+
+        The top corners are cut off diagonally and there is an arch in the
+        middle third of the bottom.
+
+        Parameter x: horizontal location of the bunker center
+        Precondition: x is a number
+
+        Parameter y: vertical location of the bunker center
+        Precondition: y is a number
+        """
+        self._x = x
+        self._y = y
+        self._left = x - BUNKER_COLS*BUNKER_CELL/2
+        self._bottom = y - BUNKER_ROWS*BUNKER_CELL/2
+        self._full = (1 << BUNKER_COLS) - 1
+        self._rows = []
+        corner = BUNKER_COLS//5
+        arch = BUNKER_ROWS//3
+        for r in range(BUNKER_ROWS):
+            #Each row gets an int of its own, not _full, so a blast that
+            #replaces it frees the old one
+            mask = (1 << BUNKER_COLS) - 1
+            cut = corner - (BUNKER_ROWS-1-r)
+            if cut > 0:
+                mask &= ~((1 << cut) - 1)
+                mask &= ~(((1 << cut) - 1) << (BUNKER_COLS-cut))
+            if r < arch:
+                for c in range(BUNKER_COLS//3, BUNKER_COLS - BUNKER_COLS//3):
+                    mask &= ~(1 << c)
+            self._rows.append(mask)
+        self._dirty = True
+        self._texture = None
+        self._group = None
+
+    def absorbBolt(self, bolt):
+        """
+        Returns True if the bolt hit a solid part of the bunker.
+
+        The hit is the first solid cell the bolt runs into, coming from its
+        direction of travel. A crater is blasted out around that cell.
+
+        Parameter bolt: The laser bolt to check
+        Precondition: bolt is of class Bolt
+        """
+        bottom = int((bolt.y - BOLT_HEIGHT/2 - self._bottom)//BUNKER_CELL)
+        top = int((bolt.y + BOLT_HEIGHT/2 - self._bottom)//BUNKER_CELL)
+        left = int((bolt.x - BOLT_WIDTH/2 - self._left)//BUNKER_CELL)
+        right = int((bolt.x + BOLT_WIDTH/2 - self._left)//BUNKER_CELL)
+        bottom = max(bottom, 0)
+        top = min(top, BUNKER_ROWS-1)
+        left = max(left, 0)
+        right = min(right, BUNKER_COLS-1)
+        if bottom > top or left > right:
+            return False
+        span = ((1 << (right-left+1)) - 1) << left
+        if bolt.isPlayerBolt():
+            rows = range(bottom, top+1)
+        else:
+            rows = range(top, bottom-1, -1)
+        for r in rows:
+            if self._rows[r] & span:
+                self._blast(r, (left+right)//2)
+                return True
+        return False
+
+    def draw(self, view):
+        """
+        Draws the bunker, uploading its texture first if it changed.
+
+        A headless view has nothing to draw to, so there this does nothing
+        (and Kivy is never loaded).
+
+        Parameter view: the game view, used in drawing
+        Precondition: a valid view
+        """
+        if HEADLESS:
+            return
+        if self._group == None:
+            self._makeTexture()
+        if self._dirty:
+            self._texture.blit_buffer(self._pixels(), colorfmt = 'rgba',
+            bufferfmt = 'ubyte')
+            self._dirty = False
+        view.draw(self._group)
+
+    def _makeTexture(self):
+        """
+        Creates the texture and the rectangle it is drawn on.
+        """
+        from kivy.graphics import InstructionGroup, Color, Rectangle
+        from kivy.graphics.texture import Texture
+        self._texture = Texture.create(size = (self._stride()*8,
+        BUNKER_ROWS), colorfmt = 'rgba')
+        self._texture.mag_filter = 'nearest'
+        self._group = InstructionGroup()
+        self._group.add(Color(1, 1, 1, 1))
+        self._group.add(Rectangle(texture = self._texture,
+        pos = (self._left, self._bottom),
+        size = (self._stride()*8*BUNKER_CELL, BUNKER_ROWS*BUNKER_CELL)))
+
+    def _blast(self, row, col):
+        """
+        Clears the crater stamp centered on the given cell.
+
+        Parameter row: the row of the center cell
+        Precondition: row is an int in 0..BUNKER_ROWS-1
+
+        Parameter col: the column of the center cell
+        Precondition: col is an int in 0..BUNKER_COLS-1
+        """
+        shift = col - BUNKER_CRATER
+        for dy, mask in _CRATER:
+            r = row + dy
+            if 0 <= r < BUNKER_ROWS:
+                if shift >= 0:
+                    self._rows[r] &= ~(mask << shift)
+                else:
+                    self._rows[r] &= ~(mask >> -shift)
+        self._dirty = True
+
+    def _stride(self):
+        """
+        Returns the number of bytes in one packed row of the bitmap.
+        """
+        return (BUNKER_COLS+7)//8
+
+    def _pixels(self):
+        """
+        Returns the bitmap as RGBA bytes, bottom row first.
+        """
+        stride = self._stride()
+        rows = []
+        for mask in self._rows:
+            for k in range(stride):
+                rows.append(_EXPAND[(mask >> (8*k)) & 0xFF])
+        return b''.join(rows)
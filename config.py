@@ -0,0 +1,185 @@
+"""
+Configuration for Alien Invaders
+
+This module reads the settings that used to be positional entries in sys.argv.
+Settings come from a JSON config file (invaders.json in the working directory,
+or the file given with --config) and then from the command line, which wins.
+For example
+
+    python invaders --rows 3 --cols 4 --speed 0.5 --mode bullethell
+    python invaders --headless --bench 3000 --mode endless
+
+The old positional form (python invaders 3 4 0.5 bullethell) still works.
+
+This module must stay cheap to import: it is the first thing __main__ imports,
+and it records the time it was imported so the game can report its time to
+first frame. It does not import consts (consts imports it) and it does not
+check ranges. It only reports what was asked for; consts decides what to use.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+#: the perf_counter value when the game started importing its own modules
+STARTED = time.perf_counter()
+
+# the config file read when --config is not given
+DEFAULT_FILE = 'invaders.json'
+
+# the settings a config file may contain, with their types
+_KEYS = {'rows': int, 'cols': int, 'speed': float, 'mode': str,
+         'headless': bool, 'bench': int, 'startup': bool,
+         'gccontrol': bool, 'alloccheck': bool, 'split': bool, 'serve': int,
+         'bots': int, 'spectate': str, 'telemetry': str,
+         'leaderboard': str, 'player': str, 'latency': bool,
+         'record': str, 'governor': bool, 'soak': float,
+         'waves': str, 'autopilot': bool, 'timescale': float,
+         'versus': str, 'lag': float, 'jitter': float, 'diff': str}
+
+
+def load(argv = None):
+    """
+    Returns the settings as an argparse Namespace.
+
+    Every setting in _KEYS is an attribute of the result. A setting that was
+    not given anywhere is None (False for the flags headless, startup,
+    gccontrol, alloccheck, split, latency, governor and autopilot).
+    Unknown command line arguments are ignored, so the game modules can be
+    imported by other programs. A bad config file is reported on stderr and
+    skipped.
+
+    Parameter argv: the command line arguments, or None for sys.argv[1:]
+    Precondition: argv is None or a list of strings
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = _parser()
+    settings, unknown = parser.parse_known_args(argv)
+    merged = _readFile(settings.config)
+    for key in _KEYS:
+        value = getattr(settings, key)
+        if value is not None and value is not False:
+            merged[key] = value
+    #The old positional form: rows cols speed mode
+    legacy = settings.legacy
+    for key, text in zip(('rows', 'cols', 'speed', 'mode'), legacy):
+        if merged.get(key) is None:
+            try:
+                merged[key] = _KEYS[key](text)
+            except ValueError:
+                pass
+    for key in _KEYS:
+        default = False if _KEYS[key] is bool else None
+        setattr(settings, key, merged.get(key, default))
+    return settings
+
+
+def _parser():
+    """
+    Returns the argparse parser for the command line.
+    """
+    parser = argparse.ArgumentParser(prog = 'invaders',
+    description = 'Alien Invaders')
+    parser.add_argument('legacy', nargs = '*', default = [],
+    help = argparse.SUPPRESS)
+    parser.add_argument('--rows', type = int, help = 'rows of aliens')
+    parser.add_argument('--cols', type = int, help = 'aliens per row')
+    parser.add_argument('--speed', type = float,
+    help = 'seconds between alien steps')
+    parser.add_argument('--mode', help = 'classic, bullethell or endless')
+    parser.add_argument('--headless', action = 'store_true',
+    help = 'run without opening a window')
+    parser.add_argument('--bench', type = int, metavar = 'FRAMES',
+    help = 'play FRAMES scripted frames headless and report timings')
+    parser.add_argument('--startup', action = 'store_true',
+    help = 'report the time to the first frame')
+    parser.add_argument('--gc-control', dest = 'gccontrol',
+    action = 'store_true',
+    help = 'pause the garbage collector while a wave is in play')
+    parser.add_argument('--alloc-check', dest = 'alloccheck',
+    action = 'store_true',
+    help = 'play a headless benchmark and fail if a steady frame grows memory')
+    parser.add_argument('--split', action = 'store_true',
+    help = 'run the simulation in its own process')
+    parser.add_argument('--serve', type = int, metavar = 'PORT',
+    help = 'host headless game sessions on PORT (0 for any free port)')
+    parser.add_argument('--bots', type = int, metavar = 'N',
+    help = 'with --serve, play N scripted sessions against the server')
+    parser.add_argument('--spectate', metavar = 'ADDRESS',
+    help = 'stream the game to viewers on a TCP port or Unix socket path')
+    parser.add_argument('--telemetry', metavar = 'FILE',
+    help = 'append gameplay events to FILE as JSON lines')
+    parser.add_argument('--leaderboard', metavar = 'FILE',
+    help = 'the SQLite leaderboard to record finished games in')
+    parser.add_argument('--player', help = 'the name to record scores under')
+    parser.add_argument('--latency', action = 'store_true',
+    help = 'report the time from a key press to the frame that shows it')
+    parser.add_argument('--record', metavar = 'PATH',
+    help = 'render every frame offscreen to PATH: a raw RGB24 stream, - for '
+    'standard output, or an image sequence like frames/%%05d.png')
+    parser.add_argument('--governor', action = 'store_true',
+    help = 'shed optional work (animation, HUD, draws, sounds) when over budget')
+    parser.add_argument('--soak', type = float, metavar = 'MINUTES',
+    help = 'play scripted games headless for MINUTES and fail if memory grows '
+    'from one wave to the next')
+    parser.add_argument('--waves', metavar = 'FILE',
+    help = 'play the waves of a campaign file (see formations.py)')
+    parser.add_argument('--autopilot', action = 'store_true',
+    help = 'let the autopilot fly the ship (in the game and --bench)')
+    parser.add_argument('--timescale', type = float, metavar = 'SCALE',
+    help = 'start the game at SCALE times real time (0.25 to 16); '
+    "'-' and '=' halve and double it while playing")
+    parser.add_argument('--versus', metavar = 'SIDE',
+    help = 'play a versus game headless as ship or aliens against another '
+    'process, or both to start the other side too (see versus.py)')
+    parser.add_argument('--lag', type = float, metavar = 'MS',
+    help = 'with --versus, delay every packet by MS milliseconds')
+    parser.add_argument('--jitter', type = float, metavar = 'MS',
+    help = 'with --versus, add up to MS milliseconds to or from each delay')
+    parser.add_argument('--diff', metavar = 'ENGINE',
+    help = 'play the same seeded script through Wave and ENGINE (wave, '
+    "rollback or module.Class) and report the first tick their state hashes "
+    'differ (see difftest.py)')
+    parser.add_argument('--config', default = DEFAULT_FILE,
+    help = 'JSON config file (default %s)' % DEFAULT_FILE)
+    return parser
+
+
+def _readFile(path):
+    """
+    Returns a dict of the valid settings in the JSON file at path.
+
+    A missing default file is not an error. Settings with the wrong type are
+    reported and dropped.
+
+    Parameter path: the config file
+    Precondition: path is a string
+    """
+    if not os.path.exists(path):
+        if path != DEFAULT_FILE:
+            print('config: no such file %s' % path, file = sys.stderr)
+        return {}
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError) as e:
+        print('config: cannot read %s (%s)' % (path, e), file = sys.stderr)
+        return {}
+    result = {}
+    for key, value in data.items():
+        kind = _KEYS.get(key)
+        if kind is None:
+            print('config: unknown setting %s' % key, file = sys.stderr)
+        elif kind is float and type(value) in (int, float):
+            result[key] = float(value)
+        elif type(value) is kind:
+            result[key] = value
+        else:
+            print('config: %s should be %s' % (key, kind.__name__),
+            file = sys.stderr)
+    return result
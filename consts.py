@@ -8,8 +8,8 @@ we separate the constants into their own module. This allows all modules to acce
 Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
 Date: May 7, 2019
 """
-import introcs
-import sys
+import config
+import os
 
 ### WINDOW CONSTANTS (all coordinates are in pixels) ###
 
@@ -52,7 +52,7 @@ ALIEN_H_WALK  = ALIEN_WIDTH // 4
 ALIEN_V_WALK  = ALIEN_HEIGHT // 2
 # The distance of the top alien from the top of the window
 ALIEN_CEILING = 100
-# the number of rows of aliens, in range 1..10
+# the number of rows of aliens (>= 1)
 ALIEN_ROWS     = 5
 # the number of aliens per row
 ALIENS_IN_ROW  = 12
@@ -60,6 +60,14 @@ ALIENS_IN_ROW  = 12
 ALIEN_IMAGES   = ('alien-strip1.png','alien-strip2.png','alien-strip3.png')
 # the number of seconds (0 < float <= 1) between alien steps
 ALIEN_SPEED = 1.0
+# the number of waves in a game that is not endless (without --waves)
+GAME_WAVES  = 3
+# the widest a formation may be before the aliens are scaled down to fit
+FORMATION_WIDTH  = GAME_WIDTH - 4*ALIEN_H_SEP
+# the tallest a formation may be before the aliens are scaled down to fit (the
+# space between the ceiling and the defense line, less one step down, so even
+# the tallest formation starts a step above the line)
+FORMATION_HEIGHT = GAME_HEIGHT - ALIEN_CEILING - DEFENSE_LINE - ALIEN_V_WALK
 
 
 ### BOLT CONSTANTS ###
@@ -74,6 +82,274 @@ BOLT_SPEED  = 10
 BOLT_RATE   = 5
 
 
+### BUNKER CONSTANTS ###
+
+# the number of bunkers, spread evenly across the screen
+BUNKER_COUNT  = 4
+# the number of columns of cells in a bunker bitmap
+BUNKER_COLS   = 22
+# the number of rows of cells in a bunker bitmap
+BUNKER_ROWS   = 16
+# the width and height of one bunker cell in pixels
+BUNKER_CELL   = 3
+# the y-coordinate of the bunker centers (just above the defense line)
+BUNKER_Y      = DEFENSE_LINE + BUNKER_ROWS*BUNKER_CELL/2 + 12
+# the radius in cells of the crater a bolt leaves in a bunker
+BUNKER_CRATER = 3
+# the color of a bunker
+BUNKER_COLOR  = (0.2, 0.9, 0.2, 1.0)
+
+
+### PARTICLE CONSTANTS ###
+
+# the number of explosion particles that can be live at once (a Kivy mesh
+# holds at most 65535 vertices, so this must stay below 16384)
+PARTICLE_CAPACITY   = 16000
+# the fastest a particle leaves an explosion, in pixels per second
+PARTICLE_SPEED      = 180
+# the longest a particle lives, in seconds
+PARTICLE_LIFE       = 0.8
+# the downward pull on particles, in pixels per second per second
+PARTICLE_GRAVITY    = 120
+# the width of a particle when it is spawned
+PARTICLE_SIZE       = 3
+# the number of particles when an alien dies
+PARTICLES_PER_ALIEN = 48
+# the number of particles when the ship dies
+PARTICLES_PER_SHIP  = 256
+# the particle colors: the ship, then the alien types 1 to 3
+PARTICLE_COLORS     = ([1.0, 0.6, 0.1, 1.0], [0.3, 1.0, 0.3, 1.0],
+                       [0.3, 0.8, 1.0, 1.0], [1.0, 0.3, 1.0, 1.0])
+
+
+### TEXT CONSTANTS ###
+
+# the font size of the state messages
+MESSAGE_SIZE = 48
+# the font size of the score
+SCORE_SIZE   = 36
+# the text in front of the score
+SCORE_PREFIX = 'Score: '
+# the most digits the score display can show
+SCORE_DIGITS = 10
+
+
+### ASSET CONSTANTS ###
+
+# the font used for every message and the score
+GAME_FONT     = 'Arcade.ttf'
+# the sound effects used by the models
+GAME_SOUNDS   = ('pew1.wav', 'blast1.wav', 'pew2.wav', 'pop2.wav')
+# the folder for images decoded by the offscreen renderer (raw pixels) between
+# runs
+CACHE_DIR     = os.path.join(os.path.expanduser('~'), '.cache', 'alieninvaders')
+# the cache format version; bump it to throw away every old cache file
+CACHE_VERSION = 1
+# the leaderboard database the game uses when --leaderboard is not given
+LEADERBOARD_FILE = os.path.join(os.path.expanduser('~'), '.local', 'share',
+                                'alieninvaders', 'scores.db')
+# the most finished games the leaderboard writes in one transaction
+LEADERBOARD_BATCH = 4096
+# the number of games in a top-scores list
+LEADERBOARD_TOP   = 5
+# the most seconds a flush or close waits for the leaderboard writer (a
+# locked database alone can hold up each batch for 30 seconds)
+LEADERBOARD_WAIT  = 120
+
+
+### GAME MODE CONSTANTS ###
+
+# the normal game: one player bolt at a time, one alien bolt every few steps
+MODE_CLASSIC     = 'classic'
+# the stress mode: spread shots, multi-column volleys, thousands of bolts
+MODE_BULLET_HELL = 'bullethell'
+# waves never run out, and every wave has a bigger formation than the last
+MODE_ENDLESS     = 'endless'
+# the active game mode (one of MODE_CLASSIC, MODE_BULLET_HELL, MODE_ENDLESS)
+GAME_MODE = MODE_CLASSIC
+# the number of bolts in a player spread shot (bullet-hell only)
+SPREAD_SHOTS     = 9
+# the horizontal speed difference between neighbouring bolts in a spread
+SPREAD_ANGLE     = 1.5
+# the number of columns that fire a volley each frame (bullet-hell only)
+VOLLEY_COLUMNS   = 8
+# the number of bolts in each alien column's volley (bullet-hell only)
+VOLLEY_SPREAD    = 9
+# the number of pixels to move an alien bolt per update (bullet-hell only)
+HELL_BOLT_SPEED  = 4
+# the points lost when an alien bolt hits the ship (bullet-hell only)
+HELL_HIT_PENALTY = 10
+# the factor rows and columns grow by after every wave (endless only)
+ENDLESS_GROWTH     = 1.5
+# the formation stops growing once it would hold more aliens than this
+ENDLESS_MAX_ALIENS = 65536
+
+
+### PERFORMANCE CONSTANTS ###
+
+# the frames the benchmark script holds left (then right) before switching
+BENCH_SWEEP     = 90
+# the frames at the start of each sweep the script holds the spacebar in
+# bullet-hell mode, so the formation lives long enough to fill the screen
+BENCH_HELL_FIRE = 2
+# the seconds per frame spent building the next wave during a pause screen
+PREBUILD_BUDGET = 0.004
+
+# the frame budget in seconds (update plus draw) to hold 60 fps
+FRAME_BUDGET    = 1/60
+# the fraction of measured frames that must fit in FRAME_BUDGET to pass
+FRAME_PASS_RATE = 0.95
+# the number of bolts on screen at which a frame counts as a stress frame
+STRESS_BOLTS    = 5000
+# the number of frames between frame-time reports
+REPORT_FRAMES   = 600
+# the number of bolts per side made ahead of time for a classic wave
+BOLT_POOL       = 16
+# the number of bolts per side made ahead of time for a bullet-hell wave
+BOLT_POOL_HELL  = 8192
+# the frames after a wave starts (or the ship respawns) before an allocation
+# check counts them (pools and list storage settle in this time)
+ALLOC_WARMUP    = 300
+# the bytes a counted frame may take from the allocator, for the short-lived
+# objects the interpreter makes itself (loop iterators, range and zip objects,
+# ints above 256)
+ALLOC_SCRATCH   = 512
+# the bytes the counted frames may keep between them, as play changes state
+# held in new objects (a bunker row hit for the first time, a score past 256)
+# and the caches of the draw follow it
+ALLOC_KEPT      = 4096
+
+# the keys the game reads, in bit order, when input is a bitmask (see
+# controls.py)
+INPUT_KEYS      = ('left', 'right', 'spacebar', 'm', 'p', 's', '-', '=')
+# the bit of each key in an input bitmask
+KEY_LEFT        = 1
+KEY_RIGHT       = 2
+KEY_FIRE        = 4
+KEY_MUTE        = 8
+KEY_UNMUTE      = 16
+KEY_START       = 32
+KEY_SLOWER      = 64
+KEY_FASTER      = 128
+# the keys a tick of play reads; Invaders reads the rest once a frame
+KEY_PLAY        = KEY_LEFT | KEY_RIGHT | KEY_FIRE | KEY_MUTE | KEY_UNMUTE
+# the most key presses whose latency a LatencyProbe keeps for its report
+LATENCY_SAMPLES = 4096
+# the frames a FrameGovernor averages update and draw times over
+GOVERN_WINDOW   = 30
+# the share of FRAME_BUDGET a frame may cost before a FrameGovernor sheds work
+GOVERN_SHED     = 0.9
+# the share of FRAME_BUDGET a frame must fit in, with the shed work back,
+# before a FrameGovernor restores it
+GOVERN_RESTORE  = 0.6
+# the frames a FrameGovernor waits after a change before it makes another
+GOVERN_HOLD     = 60
+# the frames between score label refreshes while the HUD is shed
+HUD_INTERVAL    = 15
+# the environment variable set for the simulation process of a split run
+SIM_ENV         = 'INVADERS_SIMULATION'
+# the most bolts a split run shares with the render process per tick
+SPLIT_BOLTS     = 16384
+# the number of command slots from the render process to the simulation
+SPLIT_RING      = 64
+# the ticks the simulation may fall behind before it stops catching up
+SPLIT_CATCHUP   = 5
+# the seconds the split benchmark spends on each draw, to stand in for a slow
+# renderer (the simulation must still tick at 60 Hz)
+SPLIT_SLOW_DRAW = 0.05
+# the address the game server listens on (see server.py)
+SERVE_HOST      = '127.0.0.1'
+# the number of worst-lagging sessions named in a server lag report
+SERVE_WORST     = 3
+# the bytes a spectator may fall behind before it is sent a new keyframe
+SPECTATE_BACKLOG = 256*1024
+# the model classes whose live objects a soak run counts at every wave
+# boundary (see soak.py)
+SOAK_TYPES      = ('Wave', 'Ship', 'Alien', 'Bolt', 'ScoreLabel', 'GPath',
+                   'GLabel', 'Sound')
+# the waves a soak run plays before it takes the baseline it checks against
+SOAK_WARMUP     = 3
+# the memory blocks a soak run may gain over its baseline
+SOAK_SLACK      = 2048
+# the bytes of resident memory a soak run may gain over its baseline (the
+# allocator keeps some freed memory, and endless waves keep growing)
+SOAK_RSS_SLACK  = 64*1024*1024
+# the waves between the waves a soak run plays under tracemalloc
+SOAK_TRACE      = 10
+# the bytes a traced wave may leave behind (free lists and caches filling up
+# are not leaks)
+SOAK_TRACED_SLACK = 64*1024
+# the seconds between soak reports
+SOAK_REPORT     = 60
+# the number of allocation sites printed when a traced wave leaves too much
+# behind
+SOAK_TOP        = 5
+# the frames a soak run plays between looks at the clock
+SOAK_CLOCK      = 64
+# the frames a soak run waits on a pause screen before it presses 'S'
+SOAK_PAUSE      = 30
+# the seconds an autopilot may spend deciding the keys of one frame (see
+# autopilot.py)
+AUTOPILOT_BUDGET  = 0.0005
+# the frames ahead an autopilot follows each alien bolt
+AUTOPILOT_HORIZON = 40
+# the alien bolts an autopilot looks at between looks at the clock
+AUTOPILOT_CHECK   = 8
+# the share of AUTOPILOT_BUDGET an autopilot spends picking out the alien bolts
+# that could reach the ship in time (part of AUTOPILOT_SCAN)
+AUTOPILOT_GATHER  = 0.35
+# the share of AUTOPILOT_BUDGET an autopilot spends following bolts; the rest
+# is kept for the last bolts it looks at and for choosing the move
+AUTOPILOT_SCAN    = 0.7
+# the frames an autopilot waits on a pause screen before it presses 'S'
+AUTOPILOT_PAUSE   = 60
+# the slowest and fastest time scale the game may be played at (see TimeScale
+# in perf.py); '-' halves the scale and '=' doubles it
+TIME_SCALE_MIN    = 0.25
+TIME_SCALE_MAX    = 16
+# the time scale from which a TimeScale skips draws: one frame in
+# scale//TIME_SCALE_SKIP + 1 is drawn
+TIME_SCALE_SKIP   = 4
+# the share of FRAME_BUDGET the ticks of one frame may take; the ticks still
+# owed after that are dropped
+TIME_SCALE_SHARE  = 0.75
+# the share of the time scale asked for that must be achieved to keep up
+TIME_SCALE_PASS   = 0.95
+# the UDP port on SERVE_HOST the ship side of a versus game uses; the alien
+# side uses the next one (see versus.py)
+VERSUS_PORT       = 47047
+# the ticks a versus side may play ahead of the other side's input, which is
+# also the furthest back it may have to roll back
+VERSUS_WINDOW     = 15
+# the most inputs sent in one versus packet
+VERSUS_INPUTS     = 64
+# the alien input that holds fire (any other value is the column to fire from)
+AIM_HOLD          = 0xFFFF
+# the chance each tick that the alien bot fires from a random column instead
+# of the one above the ship
+VERSUS_WILD       = 0.05
+# the seed of the random numbers of the first versus wave (each later wave
+# adds one)
+VERSUS_SEED       = 2019
+# the share of FRAME_BUDGET the 95th percentile rollback may take to pass
+VERSUS_ROLLBACK   = 0.5
+# the number of rollback times a versus report keeps
+VERSUS_SAMPLES    = 4096
+# the seconds a versus side waits for the other side to start or to finish
+VERSUS_TIMEOUT    = 15
+# the frames a versus side keeps sending its result after it has the other's
+VERSUS_LINGER     = 30
+# the bits of a state hash (see Wave.stateHash)
+HASH_MASK         = 0xFFFFFFFFFFFFFFFF
+# the seed of the random numbers of the first wave of a differential test (each
+# later wave adds one)
+DIFF_SEED         = 2019
+# the most that hashing the state of a tick may take in a differential test, as
+# a share of the time of the update it follows (a classic update takes only
+# microseconds, so the fixed cost of hashing the counters is most of it)
+DIFF_SHARE        = 0.3
+
+
 ### GAME CONSTANTS ###
 
 # state before the game has started
@@ -90,36 +366,127 @@ STATE_CONTINUE = 4
 STATE_COMPLETE = 5
 
 
-### USE COMMAND LINE ARGUMENTS TO CHANGE NUMBER OF ALIENS IN A ROW"""
+### GOVERNOR CONSTANTS (see perf.py) ###
+
+# the optional work a FrameGovernor sheds, one level at a time in this order;
+# each level also sheds the work of the levels below it
+# nothing is shed
+SHED_NONE      = 0
+# the aliens stop toggling their animation frame
+SHED_ANIMATION = 1
+# the score label is refreshed every HUD_INTERVAL frames
+SHED_HUD       = 2
+# every other frame shows the last frame again instead of drawing
+SHED_DRAW      = 3
+# the alien sounds are muted (the ship's are not)
+SHED_SOUND     = 4
+
+
+### TELEMETRY CONSTANTS (see telemetry.py) ###
+
+# an alien was shot: alien type, row, column
+EVENT_KILL  = 1
+# an alien bolt hit the ship: lives left, score, 1 if the ship was destroyed
+EVENT_HIT   = 2
+# a shot was fired: 0 for the ship or 1 for the aliens, bolts, column (-1 for
+# the ship)
+EVENT_SHOT  = 3
+# the game changed state: old state, new state, level
+EVENT_STATE = 4
+# the number of events the telemetry ring holds before the oldest are lost
+TELEMETRY_CAPACITY = 65536
+# the seconds between telemetry writes
+TELEMETRY_FLUSH    = 0.5
+
+
+### USE THE CONFIGURATION TO CHANGE THE GAME ###
 """
-sys.argv is a list of the command line arguments when you run Python. These
-arguments are everything after the word python. So if you start the game typing
+The settings come from config.py, which reads an optional JSON config file and
+the command line (see that module for the flags). For example
 
-    python invaders 3 4 0.5
+    python invaders --rows 3 --cols 4 --speed 0.5 --mode bullethell
 
-Python puts ['breakout.py', '3', '4', '0.5'] into sys.argv. Below, we take
-advantage of this fact to change the constants ALIEN_ROWS, ALIENS_IN_ROW, and
-ALIEN_SPEED.
+changes the constants ALIEN_ROWS, ALIENS_IN_ROW, ALIEN_SPEED and GAME_MODE.
+Settings that are missing or out of range keep their original values.
 """
-try:
-    rows = int(sys.argv[1])
-    if rows >= 1 and rows <= 10:
-        ALIEN_ROWS = rows
-except:
-    pass # Use original value
-
-try:
-    perrow = int(sys.argv[2])
-    if perrow >= 1 and perrow <= 15:
-        ALIENS_IN_ROW = perrow
-except:
-    pass # Use original value
-
-try:
-    speed = float(sys.argv[3])
-    if speed > 0 and speed <= 3:
-        ALIEN_SPEED = speed
-except:
-    pass # Use original value
+#: the settings from the config file and command line
+CONFIG = config.load()
+
+if CONFIG.rows != None and CONFIG.rows >= 1:
+    ALIEN_ROWS = CONFIG.rows
+
+if CONFIG.cols != None and CONFIG.cols >= 1:
+    ALIENS_IN_ROW = CONFIG.cols
+
+if CONFIG.speed != None and CONFIG.speed > 0 and CONFIG.speed <= 3:
+    ALIEN_SPEED = CONFIG.speed
+
+if CONFIG.mode in (MODE_CLASSIC, MODE_BULLET_HELL, MODE_ENDLESS):
+    GAME_MODE = CONFIG.mode
+
+# True to run without a window (game2d and Kivy are never imported)
+HEADLESS       = CONFIG.headless or CONFIG.bench != None or \
+CONFIG.alloccheck or CONFIG.serve != None or CONFIG.record != None or \
+CONFIG.soak != None or CONFIG.versus != None or CONFIG.diff != None or \
+os.environ.get(SIM_ENV) == '1'
+# the number of frames to play in a headless benchmark, or None
+BENCH_FRAMES   = CONFIG.bench
+# True to print the time from startup to the first frame
+STARTUP_REPORT = CONFIG.startup
+# True to pause the garbage collector while a wave is in play
+GC_CONTROL     = CONFIG.gccontrol
+# True to check a headless benchmark for memory growth (see AllocationCounter)
+ALLOC_CHECK    = CONFIG.alloccheck
+# True to run the simulation in its own process (see simulation.py)
+SPLIT          = CONFIG.split
+# the port to run the game server on (0 for any free port), or None
+SERVE_PORT     = CONFIG.serve
+# the number of bot sessions to play against the game server, or None
+SERVE_BOTS     = CONFIG.bots
+# where to stream the game to spectators: a TCP port on SERVE_HOST, the path
+# of a Unix socket, or None (see spectate.py)
+SPECTATE       = None
+if CONFIG.spectate != None:
+    SPECTATE = int(CONFIG.spectate) if CONFIG.spectate.isdigit() \
+    else CONFIG.spectate
+# the file to append gameplay events to, or None (see telemetry.py)
+TELEMETRY      = CONFIG.telemetry
+# the leaderboard database, or None; the game falls back on LEADERBOARD_FILE,
+# headless runs record nothing without it (see leaderboard.py)
+LEADERBOARD    = CONFIG.leaderboard
+# the name the game records on the leaderboard
+PLAYER         = CONFIG.player
+if PLAYER == None:
+    PLAYER = os.environ.get('USER') or os.environ.get('USERNAME') or 'player'
+# True to measure the time from a key press to the frame that shows it
+LATENCY_REPORT = CONFIG.latency
+# where to write the frames of an offscreen recording, or None (see raster.py)
+RECORD         = CONFIG.record
+# True to shed optional work when frames run over budget (see FrameGovernor)
+GOVERNOR       = CONFIG.governor
+# the minutes to play games in a soak run, or None (see soak.py)
+SOAK           = CONFIG.soak
+# the campaign file the waves come from, or None for the grid of ALIEN_ROWS
+# by ALIENS_IN_ROW (see formations.py)
+WAVES          = CONFIG.waves
+# True to let an Autopilot fly the ship (see autopilot.py)
+AUTOPILOT      = CONFIG.autopilot
+# the side of a versus game to play ('ship', 'aliens', or 'both' to play the
+# aliens in a second process), or None (see versus.py)
+VERSUS         = None
+if CONFIG.versus in ('ship', 'aliens', 'both'):
+    VERSUS = CONFIG.versus
+# the simulated one-way delay and its random spread for versus packets, in
+# seconds
+VERSUS_LAG     = max(CONFIG.lag or 0, 0)/1000
+VERSUS_JITTER  = max(CONFIG.jitter or 0, 0)/1000
+# the engine to test against Wave in a differential test, or None (see
+# difftest.py)
+DIFF           = CONFIG.diff
+# the time scale the game starts at, 1 for real time (see TimeScale)
+TIME_SCALE     = 1
+if CONFIG.timescale != None and \
+TIME_SCALE_MIN <= CONFIG.timescale <= TIME_SCALE_MAX:
+    TIME_SCALE = CONFIG.timescale
 
 ### ADD MORE CONSTANTS (PROPERLY COMMENTED) AS NECESSARY ###
@@ -0,0 +1,196 @@
+"""
+Input snapshots for Alien Invaders
+
+The game used to ask GInput about one key at a time, all through a frame, and
+kept its own "was it down last frame" flags to find key presses. Now Invaders
+reads every key once per frame into an InputSnapshot, and the rest of the game
+reads the snapshot:
+
+    snapshot.isDown(KEY_LEFT)       the key is down this frame
+    snapshot.isPressed(KEY_FIRE)    the key went down since the last frame
+    snapshot.isReleased(KEY_FIRE)   the key came up since the last frame
+
+The keys are the bits of one int (see INPUT_KEYS and the KEY constants in
+consts.py), so a snapshot is three ints and is cheap to send to another
+process or over the network (see simulation.py and server.py).
+
+A snapshot also remembers when each key was last pressed. A snapshot only
+sees the keys when it is sampled, once a frame, but the windowed game also
+passes it the key events themselves (see keyEvent), so the time is when the
+player pressed the key, not when the frame got around to looking. LatencyProbe
+(in perf.py) uses these times to measure input latency.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import array
+import time
+
+
+def packKeys(input):
+    """
+    Returns the keys down in input as a bitmask, one bit per INPUT_KEYS entry.
+
+    Parameter input: the input to read
+    Precondition: input has a method is_key_down (GInput or HeadlessInput)
+    """
+    mask = 0
+    for bit in range(len(INPUT_KEYS)):
+        if input.is_key_down(INPUT_KEYS[bit]):
+            mask |= 1 << bit
+    return mask
+
+
+def unpackKeys(mask):
+    """
+    Returns the names of the keys set in a bitmask from packKeys.
+
+    Parameter mask: the bitmask
+    Precondition: mask is an int >= 0
+    """
+    return [INPUT_KEYS[bit] for bit in range(len(INPUT_KEYS))
+            if mask & (1 << bit)]
+
+
+class InputSnapshot(object):
+    """
+    A class to hold the keys of one frame, with the presses and releases.
+
+    INSTANCE ATTRIBUTES:
+        _down:     [int >= 0] the bitmask of keys down
+        _pressed:  [int >= 0] the keys that went down at the last sample
+        _released: [int >= 0] the keys that came up at the last sample
+        _kept:     [int >= 0] presses and releases no tick has used yet, to
+                   add to the next sample (see keepPresses)
+        _sampled:  [float] the perf_counter value of the last sample
+        _events:   [array of double] for each key, the perf_counter value of
+                   its last key-down event (see keyEvent), 0 if none
+        _times:    [array of double] for each key, the perf_counter value it
+                   was last pressed: the event time if there was an event
+                   since the previous sample, otherwise the sample time
+    """
+
+    def getMask(self):
+        """
+        Returns the bitmask of keys down.
+        """
+        return self._down
+
+    def getPressed(self):
+        """
+        Returns the bitmask of keys that went down at the last sample.
+        """
+        return self._pressed
+
+    def getReleased(self):
+        """
+        Returns the bitmask of keys that came up at the last sample.
+        """
+        return self._released
+
+    def getPressTime(self, key):
+        """
+        Returns the perf_counter value when a key was last pressed.
+
+        Parameter key: the key
+        Precondition: key is one of the KEY constants
+        """
+        return self._times[key.bit_length() - 1]
+
+    def isDown(self, keys):
+        """
+        Returns True if any of the keys is down.
+
+        Parameter keys: the keys
+        Precondition: keys is a bitmask of KEY constants
+        """
+        return self._down & keys != 0
+
+    def isPressed(self, keys):
+        """
+        Returns True if any of the keys went down at the last sample.
+
+        Parameter keys: the keys
+        Precondition: keys is a bitmask of KEY constants
+        """
+        return self._pressed & keys != 0
+
+    def isReleased(self, keys):
+        """
+        Returns True if any of the keys came up at the last sample.
+
+        Parameter keys: the keys
+        Precondition: keys is a bitmask of KEY constants
+        """
+        return self._released & keys != 0
+
+    def __init__(self):
+        """
+        Initializes an InputSnapshot with no keys down.
+        """
+        self._down = 0
+        self._pressed = 0
+        self._released = 0
+        self._kept = 0
+        self._sampled = time.perf_counter()
+        self._events = array.array('d', bytes(8*len(INPUT_KEYS)))
+        self._times = array.array('d', bytes(8*len(INPUT_KEYS)))
+
+    def sample(self, input):
+        """
+        Reads the keys down in input, for the frame about to be played.
+
+        Parameter input: the input to read
+        Precondition: input has a method is_key_down (GInput or HeadlessInput)
+        """
+        self.setMask(packKeys(input))
+
+    def setMask(self, mask):
+        """
+        Sets the keys down for the frame about to be played.
+
+        Parameter mask: the keys down
+        Precondition: mask is a bitmask of KEY constants
+        """
+        now = time.perf_counter()
+        pressed = mask & ~self._down
+        self._pressed = pressed | (self._pressed & self._kept)
+        self._released = (self._down & ~mask) | (self._released & self._kept)
+        self._kept = 0
+        self._down = mask
+        bit = 0
+        while pressed:
+            if pressed & 1:
+                when = self._events[bit]
+                self._times[bit] = when if when > self._sampled else now
+            pressed >>= 1
+            bit += 1
+        self._sampled = now
+
+    def keepPresses(self, keys):
+        """
+        Keeps the presses and releases of some keys for the next sample.
+
+        A frame that plays no tick (slow motion, see TimeScale) calls this, so
+        a tap that lands on it is still seen by the next tick that is played.
+        The next sample reports those keys as pressed (or released) as well as
+        its own.
+
+        Parameter keys: the keys to keep
+        Precondition: keys is a bitmask of KEY constants
+        """
+        self._kept = (self._pressed | self._released) & keys
+
+    def keyEvent(self, name):
+        """
+        Records that a key just went down, as the event arrives.
+
+        The key is not down in the snapshot until the next sample; this only
+        remembers the time, for getPressTime.
+
+        Parameter name: the name of the key (e.g. 'left')
+        Precondition: name is a string
+        """
+        if name in INPUT_KEYS:
+            self._events[INPUT_KEYS.index(name)] = time.perf_counter()
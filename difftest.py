@@ -0,0 +1,372 @@
+"""
+Differential test for Alien Invaders
+
+A faster Wave (a vectorized formation, another bolt pool, a new collision
+path) must play exactly the same games as the one it replaces. This module
+checks that. It plays the same seeded input through Wave and through another
+engine side by side, hashes the state of both after every tick
+(Wave.stateHash) and reports the first tick where the hashes differ, and
+which parts of the state differ there. It is what runs for
+
+    python invaders --diff rollback --bench 6000 --mode endless
+    python invaders --diff mymodule.FastWave --bench 6000
+
+The engine to test is one of
+    wave:          Wave itself, a control run that must always match
+    rollback:      Wave, rolled back VERSUS_WINDOW ticks every VERSUS_WINDOW
+                   ticks and played forward again, as versus.py does; the
+                   ticks played again must hash as they did the first time
+    module.Class:  any class with the constructor of Wave and the methods
+                   listed in EngineRun (stateHash and hashParts must hash the
+                   same parts the same way)
+
+The input is random keys from DIFF_SEED (or the Autopilot, with --autopilot,
+deciding on the Wave side), and each wave's random numbers are seeded with
+DIFF_SEED plus the number of waves before it. Lost ships are replaced and
+finished waves and games start over on the next tick.
+
+Both engines also chain their hashes, tick after tick, into one hash of the
+whole run, which is printed. Only numbers go into it, so the same run gives
+the same hash in every process: running --diff wave before and after a change
+to Wave tells whether the change kept the game the same.
+
+Hashing must stay cheap, or it cannot run every tick. The report gives the
+mean time of an update and of a hash on each side, and the run passes if the
+hashes matched and hashing Wave took at most DIFF_SHARE of the time of its
+updates.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from perf import pauseCollector, resumeCollector
+import importlib
+import random
+import time
+
+
+# The names of the parts of hashParts, in order
+PART_NAMES = ('aliens', 'bolts', 'ship', 'counters', 'bunkers', 'random')
+
+
+def loadEngine(name):
+    """
+    Returns the (class, True if rolled back) of the engine with a name.
+
+    Parameter name: 'wave', 'rollback', or a class as module.Class
+    Precondition: name is a string
+
+    Raises ValueError if there is no such engine.
+    """
+    if name == 'wave':
+        return (Wave, False)
+    if name == 'rollback':
+        return (Wave, True)
+    module, dot, attribute = name.rpartition('.')
+    if dot == '' or module == '':
+        raise ValueError("no engine %r (use wave, rollback or module.Class)"
+        % name)
+    try:
+        return (getattr(importlib.import_module(module), attribute), False)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(str(e))
+
+
+class InputScript(object):
+    """
+    A class to make up seeded random keys, one bitmask per tick.
+
+    The script holds left, right or neither for a random number of ticks, and
+    taps fire (down for a few ticks, then up) at random.
+
+    INSTANCE ATTRIBUTES:
+        _random: [random.Random] the random numbers of the script
+        _move:   [int] the move held, KEY_LEFT, KEY_RIGHT or 0
+        _hold:   [int >= 0] the ticks left before the next move is chosen
+        _fire:   [int >= 0] the ticks fire stays down, 0 if it is up
+    """
+
+    def __init__(self, seed):
+        """
+        Initializes an InputScript.
+
+        Parameter seed: the seed of the script
+        Precondition: seed is an int
+        """
+        self._random = random.Random(seed)
+        self._move = 0
+        self._hold = 0
+        self._fire = 0
+
+    def nextKeys(self):
+        """
+        Returns the keys of the next tick.
+        """
+        rng = self._random
+        if self._hold == 0:
+            self._move = rng.choice((0, KEY_LEFT, KEY_RIGHT))
+            self._hold = rng.randint(5, 60)
+        self._hold -= 1
+        if self._fire > 0:
+            self._fire -= 1
+        elif rng.random() < 0.1:
+            self._fire = rng.randint(1, 8)
+        return self._move | (KEY_FIRE if self._fire > 0 else 0)
+
+
+class EngineRun(object):
+    """
+    A class to play one engine, tick by tick, and hash every tick.
+
+    The engine's waves are used through their constructor and setRandom,
+    update, getResult, getShip, setShip, getLives, getScore, stateHash and
+    hashParts, and with rollback also saveState and loadState.
+
+    INSTANCE ATTRIBUTES:
+        _engine:   [class] the class of the waves
+        _rollback: [bool] True to roll back and play ticks again
+        _keys:     [InputSnapshot] the keys of the tick being played
+        _wave:     [wave of _engine] the wave in play
+        _level:    [int >= 0] the waves completed in this game
+        _waves:    [int >= 0] the waves started, which seeds each wave
+        _games:    [int >= 0] the games finished
+        _tick:     [int >= 0] the ticks played
+        _chain:    [int] the hashes of every tick so far, chained
+        _states:   [list] the state before each of the last VERSUS_WINDOW
+                   ticks, at tick % VERSUS_WINDOW (with rollback)
+        _masks:    [list of int] the keys of each of those ticks
+        _hashes:   [list of int] the hash after each of those ticks
+        _drift:    [int or None] the first tick that hashed differently when
+                   played again, None if none did
+        _replayed: [int >= 0] the ticks played again
+        _updating: [float >= 0] the seconds spent in update
+        _hashing:  [float >= 0] the seconds spent hashing
+    """
+
+    def getWave(self):
+        """
+        Returns the wave in play.
+        """
+        return self._wave
+
+    def getWaves(self):
+        """
+        Returns the number of waves started.
+        """
+        return self._waves
+
+    def getChain(self):
+        """
+        Returns the hashes of every tick so far, chained into one.
+        """
+        return self._chain
+
+    def getDrift(self):
+        """
+        Returns the first tick that hashed differently when played again, or
+        None.
+        """
+        return self._drift
+
+    def getUpdateTime(self):
+        """
+        Returns the mean seconds of an update, 0 before the first.
+        """
+        return self._updating/self._tick if self._tick > 0 else 0
+
+    def getHashTime(self):
+        """
+        Returns the mean seconds of a hash, 0 before the first.
+        """
+        return self._hashing/self._tick if self._tick > 0 else 0
+
+    def __init__(self, engine, rollback = False):
+        """
+        Initializes an EngineRun at the first tick of a new game.
+
+        Parameter engine: the class of the waves
+        Precondition: engine is Wave or a class like it
+
+        Parameter rollback: True to roll back every VERSUS_WINDOW ticks
+        Precondition: rollback is a bool
+        """
+        self._engine = engine
+        self._rollback = rollback
+        self._keys = InputSnapshot()
+        self._level = 0
+        self._waves = 0
+        self._games = 0
+        self._wave = self._newWave(0, 0)
+        self._tick = 0
+        self._chain = 0
+        self._states = [None]*VERSUS_WINDOW
+        self._masks = [0]*VERSUS_WINDOW
+        self._hashes = [0]*VERSUS_WINDOW
+        self._drift = None
+        self._replayed = 0
+        self._updating = 0.0
+        self._hashing = 0.0
+
+    def step(self, mask):
+        """
+        Plays one tick with the given keys and returns the hash after it.
+
+        With rollback, every VERSUS_WINDOW ticks the run then goes back that
+        many ticks and plays them again.
+
+        Parameter mask: the keys of the tick
+        Precondition: mask is a bitmask of KEY constants
+        """
+        result = self._play(self._tick, mask)
+        self._tick += 1
+        self._chain = hash((self._chain, result)) & HASH_MASK
+        if self._rollback and self._tick % VERSUS_WINDOW == 0:
+            self._replay()
+        return result
+
+    def hashParts(self):
+        """
+        Returns the hashes of the parts of the state of the wave in play.
+        """
+        return self._wave.hashParts()
+
+    def _newWave(self, level, score):
+        """
+        Returns a new wave, with random numbers seeded by the wave count.
+
+        Parameter level: the waves completed in this game
+        Precondition: level is an int >= 0
+
+        Parameter score: the score the wave starts with
+        Precondition: score is an int >= 0
+        """
+        wave = self._engine(level, score, waveFormation(level))
+        wave.setRandom(random.Random(DIFF_SEED + self._waves))
+        self._waves += 1
+        return wave
+
+    def _play(self, tick, mask):
+        """
+        Plays a tick and returns the hash after it.
+
+        A ship that was lost is replaced first, and a wave that is over is
+        followed by the next one (or a new game).
+
+        Parameter tick: the tick
+        Precondition: tick is an int >= 0
+
+        Parameter mask: the keys of the tick
+        Precondition: mask is a bitmask of KEY constants
+        """
+        wave = self._wave
+        if self._rollback:
+            self._states[tick % VERSUS_WINDOW] = (wave, wave.saveState(),
+            self._keys.getMask(), self._level, self._waves, self._games)
+            self._masks[tick % VERSUS_WINDOW] = mask
+        if wave.getResult() == 2:
+            self._level += 1
+            self._wave = self._newWave(self._level, wave.getScore())
+        elif wave.getResult() == 1:
+            self._games += 1
+            self._level = 0
+            self._wave = self._newWave(0, 0)
+        elif wave.getShip() == None and wave.getLives() > 0:
+            wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+        self._keys.setMask(mask)
+        start = time.perf_counter()
+        self._wave.update(self._keys, FRAME_BUDGET)
+        middle = time.perf_counter()
+        result = self._wave.stateHash()
+        self._updating += middle - start
+        self._hashing += time.perf_counter() - middle
+        self._hashes[tick % VERSUS_WINDOW] = result
+        return result
+
+    def _replay(self):
+        """
+        Restores the state VERSUS_WINDOW ticks back and plays those ticks
+        again, noting the first one that hashes differently.
+
+        Replayed ticks are not counted in the update and hash times.
+        """
+        first = self._tick - VERSUS_WINDOW
+        (self._wave, state, keys, self._level, self._waves, self._games) = \
+        self._states[first % VERSUS_WINDOW]
+        self._wave.loadState(state)
+        self._keys.setMask(keys)
+        updating = self._updating
+        hashing = self._hashing
+        for tick in range(first, self._tick):
+            expected = self._hashes[tick % VERSUS_WINDOW]
+            if self._play(tick, self._masks[tick % VERSUS_WINDOW]) != \
+            expected and self._drift == None:
+                self._drift = tick
+        self._updating = updating
+        self._hashing = hashing
+        self._replayed += VERSUS_WINDOW
+
+
+def runDiffTest(name, ticks):
+    """
+    Plays ticks ticks through Wave and the named engine and prints the report.
+
+    Returns True if the hashes matched on every tick and hashing was cheap
+    enough.
+
+    Parameter name: the engine to test (see loadEngine)
+    Precondition: name is a string
+
+    Parameter ticks: the ticks to play
+    Precondition: ticks is an int > 0
+
+    Raises ValueError if there is no such engine.
+    """
+    engine, rollback = loadEngine(name)
+    print('difftest engine=%s mode=%s ticks=%d' % (name, GAME_MODE, ticks))
+    reference = EngineRun(Wave)
+    candidate = EngineRun(engine, rollback)
+    script = InputScript(DIFF_SEED)
+    pilot = None
+    if AUTOPILOT:
+        from autopilot import Autopilot
+        pilot = Autopilot()
+    first = None
+    pauseCollector()
+    for tick in range(ticks):
+        if pilot != None:
+            mask = pilot.decide(reference.getWave())
+        else:
+            mask = script.nextKeys()
+        if reference.step(mask) != candidate.step(mask):
+            first = tick
+            break
+        if candidate.getDrift() != None:
+            first = candidate.getDrift()
+            break
+    resumeCollector()
+    share = reference.getHashTime()/max(reference.getUpdateTime(), 1e-9)
+    for label, run in (('wave', reference), (name, candidate)):
+        print('difftest %s waves=%d update=%.1fus hash=%.1fus (%.0f%%) '
+        'chain=%016x' % (label, run.getWaves(), run.getUpdateTime()*1e6,
+        run.getHashTime()*1e6, 100*run.getHashTime()/max(run.getUpdateTime(),
+        1e-9), run.getChain()))
+    cheap = share <= DIFF_SHARE
+    if first == None:
+        print('difftest ticks=%d MATCH hash=%.0f%% of update %s' % (ticks,
+        share*100, 'PASS' if cheap else 'FAIL (hashing too slow)'))
+        return cheap
+    if first == candidate.getDrift():
+        print('difftest FIRST DIFFERENCE at tick %d, when %s played it again '
+        'after a rollback FAIL' % (first, name))
+        return False
+    parts = []
+    for part, a, b in zip(PART_NAMES, reference.hashParts(),
+    candidate.hashParts()):
+        if a != b:
+            parts.append(part)
+    print('difftest FIRST DIFFERENCE at tick %d (wave %d): %s differ FAIL' %
+    (first, reference.getWaves(), ', '.join(parts) or 'hashes'))
+    return False
@@ -0,0 +1,416 @@
+"""
+Wave formations for Alien Invaders
+
+A Formation is the aliens a wave starts with: the size of the grid they sit
+on, and the cell and type of each alien. Only the aliens are stored, so a
+formation with a few aliens spread over a large grid costs no more than a
+small one, and so does a Wave playing it.
+
+Without --waves, every wave is the full grid of waveFormation (see wave.py),
+two rows per alien type. With --waves, the waves come from a campaign file
+instead, one per level:
+
+    python invaders --waves campaign.json
+
+A campaign is JSON. Each wave has a shape, drawn top row first, where '1',
+'2' and '3' are aliens of that type and any other character is an empty cell.
+It can also set its own alien speed (the seconds between steps, instead of
+ALIEN_SPEED divided by the level) and bolt rate (instead of BOLT_RATE). A
+shape of any size can be played: one too wide or too tall for the space
+between the ceiling and the defense line is scaled down by Wave, as a large
+grid is, so every wave starts above the line.
+
+    {"waves": [
+        {"name": "Arrow", "speed": 0.6, "bolt_rate": 3,
+         "shape": ["  3  ",
+                   " 222 ",
+                   "11111"]}
+    ]}
+
+The JSON is only read once. It is compiled to a binary file next to it (the
+same name, ending in .wvc) holding a table of waves and, for each wave, its
+cells as 32-bit ints and its types as bytes. The compiled file is memory
+mapped and the formations are views into it, so opening a campaign reads the
+header and nothing else, however many waves it has; a wave's cells are only
+paged in when it is played. The compiled file records the size and time of
+the JSON it came from, and is remade when they change. It is in the byte
+order of the machine that made it, since it is only a cache.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+
+
+# The start of a compiled campaign: magic, version, waves, the aliens in the
+# largest wave, and the size and modification time of the JSON it came from
+_HEADER = struct.Struct('=4sIIIqq')
+# One wave in the table after the header: rows, columns, aliens, offset of
+# the cells, offset and length of the name, speed (0 for the default) and
+# bolt rate (0 for the default)
+_ENTRY = struct.Struct('=IIIIIIdI4x')
+_MAGIC = b'IVWC'
+_VERSION = 1
+# The extension of a compiled campaign
+_SUFFIX = '.wvc'
+
+# The campaigns opened so far, by path
+_CAMPAIGNS = {}
+
+
+def gridFormation(rows, cols):
+    """
+    Returns the full formation of rows by cols aliens, two rows per type.
+
+    The cells are a range, so even the largest grid is made at once.
+
+    Parameter rows: the number of rows of aliens
+    Precondition: rows is an int >= 1
+
+    Parameter cols: the number of aliens per row
+    Precondition: cols is an int >= 1
+    """
+    types = bytearray()
+    for row in range(rows):
+        types += bytes([(row//2) % len(ALIEN_IMAGES) + 1])*cols
+    return Formation(rows, cols, range(rows*cols), bytes(types))
+
+
+def openCampaign(path):
+    """
+    Returns the Campaign for a campaign file, compiling it if needed.
+
+    A campaign is only opened once per process.
+
+    Parameter path: the campaign JSON file
+    Precondition: path is a string
+
+    Raises OSError if the file cannot be read, or ValueError if it is not a
+    valid campaign.
+    """
+    if not path in _CAMPAIGNS:
+        _CAMPAIGNS[path] = Campaign(path)
+    return _CAMPAIGNS[path]
+
+
+def compileCampaign(source, size = 0, mtime = 0):
+    """
+    Returns the compiled form of a campaign, as bytes.
+
+    Parameter source: the campaign, as read from JSON
+    Precondition: source is any JSON value (it is checked here)
+
+    Parameter size: the size of the JSON file, to record in the header
+    Precondition: size is an int >= 0
+
+    Parameter mtime: the modification time of the JSON file in nanoseconds,
+    to record in the header
+    Precondition: mtime is an int
+
+    Raises ValueError if source is not a valid campaign.
+    """
+    if type(source) != dict or type(source.get('waves')) != list or \
+    len(source['waves']) == 0:
+        raise ValueError('a campaign needs a non-empty list "waves"')
+    waves = [_compileWave(wave, n) for n, wave in enumerate(source['waves'])]
+    out = bytearray(_HEADER.size + _ENTRY.size*len(waves))
+    largest = 0
+    for n in range(len(waves)):
+        name, rows, cols, cells, types, speed, rate = waves[n]
+        largest = max(largest, len(cells))
+        start = len(out)
+        out += cells.tobytes()
+        out += types
+        label = len(out)
+        out += name
+        out += bytes(-len(out) % 4)
+        _ENTRY.pack_into(out, _HEADER.size + n*_ENTRY.size, rows, cols,
+        len(cells), start, label, len(name), speed, rate)
+    _HEADER.pack_into(out, 0, _MAGIC, _VERSION, len(waves), largest, size,
+    mtime)
+    return bytes(out)
+
+
+def _compileWave(wave, number):
+    """
+    Returns (name, rows, cols, cells, types, speed, rate) for one wave.
+
+    The rows are flipped, so row 0 is the bottom row as in Wave, and the cells
+    are in increasing order.
+
+    Parameter wave: the wave, as read from JSON
+    Precondition: wave is any JSON value (it is checked here)
+
+    Parameter number: the position of the wave in the campaign
+    Precondition: number is an int >= 0
+
+    Raises ValueError if wave is not a valid wave.
+    """
+    where = 'wave %d' % (number+1)
+    if type(wave) != dict or type(wave.get('shape')) != list or \
+    not all(type(line) == str for line in wave['shape']):
+        raise ValueError('%s needs a "shape" list of strings' % where)
+    shape = wave['shape']
+    rows = len(shape)
+    cols = max([len(line) for line in shape] + [0])
+    cells = array.array('I')
+    types = bytearray()
+    for row in range(rows):
+        line = shape[rows-1-row]
+        for col in range(len(line)):
+            if line[col] in '123':
+                cells.append(row*cols + col)
+                types.append(int(line[col]))
+    if len(cells) == 0:
+        raise ValueError('%s has no aliens' % where)
+    speed = wave.get('speed', 0)
+    if type(speed) not in (int, float) or speed < 0:
+        raise ValueError('%s: "speed" should be a number > 0' % where)
+    rate = wave.get('bolt_rate', 0)
+    if type(rate) != int or rate < 0:
+        raise ValueError('%s: "bolt_rate" should be an int > 0' % where)
+    name = str(wave.get('name', where)).encode('utf-8')
+    return (name, rows, cols, cells, bytes(types), float(speed), rate)
+
+
+class Formation(object):
+    """
+    A class to represent the aliens a wave starts with.
+
+    The cells are in increasing order: row by row from the bottom row, and
+    left to right in a row. Cell row*cols + col is the alien in that row and
+    column, and the alien types are in the same order as the cells.
+
+    INSTANCE ATTRIBUTES:
+        _rows:     [int >= 1] the number of rows in the grid
+        _cols:     [int >= 1] the number of columns in the grid
+        _cells:    [sequence of int] the cell of each alien, increasing
+        _types:    [bytes-like] the type (1 to 3) of each alien
+        _speed:    [number > 0 or None] the seconds between alien steps, None
+                   for the default
+        _boltRate: [int > 0 or None] the bolt rate, None for BOLT_RATE
+        _name:     [str] the name of the wave ('' for a grid)
+    """
+
+    def getRows(self):
+        """
+        Returns the number of rows in the grid.
+        """
+        return self._rows
+
+    def getCols(self):
+        """
+        Returns the number of columns in the grid.
+        """
+        return self._cols
+
+    def getSize(self):
+        """
+        Returns the number of aliens.
+        """
+        return len(self._cells)
+
+    def getCells(self):
+        """
+        Returns the cell (row*cols + col) of each alien, in increasing order.
+
+        The sequence is the formation's own (it may be a view of a compiled
+        campaign); do not change it.
+        """
+        return self._cells
+
+    def getTypes(self):
+        """
+        Returns the type (1 to 3) of each alien, in the order of getCells.
+        """
+        return self._types
+
+    def getSpeed(self):
+        """
+        Returns the seconds between alien steps, or None for the default.
+        """
+        return self._speed
+
+    def getBoltRate(self):
+        """
+        Returns the bolt rate, or None for BOLT_RATE.
+        """
+        return self._boltRate
+
+    def getName(self):
+        """
+        Returns the name of the wave ('' for a grid).
+        """
+        return self._name
+
+    def __init__(self, rows, cols, cells, types, speed = None,
+    bolt_rate = None, name = ''):
+        """
+        Initializes a Formation.
+
+        Parameter rows: the number of rows in the grid
+        Precondition: rows is an int >= 1
+
+        Parameter cols: the number of columns in the grid
+        Precondition: cols is an int >= 1
+
+        Parameter cells: the cell (row*cols + col) of each alien
+        Precondition: cells is a non-empty sequence of increasing ints in
+        0..rows*cols-1
+
+        Parameter types: the type of each alien
+        Precondition: types is a bytes-like object of values in 1..3, as long
+        as cells
+
+        Parameter speed: the seconds between alien steps, or None
+        Precondition: speed is None or a number > 0
+
+        Parameter bolt_rate: the bolt rate, or None
+        Precondition: bolt_rate is None or an int > 0
+
+        Parameter name: the name of the wave
+        Precondition: name is a string
+        """
+        self._rows = rows
+        self._cols = cols
+        self._cells = cells
+        self._types = types
+        self._speed = speed
+        self._boltRate = bolt_rate
+        self._name = name
+
+    def indexOf(self, row, col):
+        """
+        Returns the index of the alien at (row, col), or -1 if the cell has
+        none.
+
+        This is a binary search of the cells, so it needs no table per wave.
+
+        Parameter row: the row
+        Precondition: row is an int in 0..rows-1
+
+        Parameter col: the column
+        Precondition: col is an int in 0..cols-1
+        """
+        cell = row*self._cols + col
+        index = bisect.bisect_left(self._cells, cell)
+        if index < len(self._cells) and self._cells[index] == cell:
+            return index
+        return -1
+
+
+class Campaign(object):
+    """
+    A class to read the waves of a compiled campaign.
+
+    INSTANCE ATTRIBUTES:
+        _path:     [str] the campaign JSON file
+        _data:     [mmap or bytes] the compiled campaign
+        _view:     [memoryview] a view of _data, which the formations slice
+        _count:    [int > 0] the number of waves
+        _largest:  [int > 0] the number of aliens in the largest wave
+    """
+
+    def getPath(self):
+        """
+        Returns the campaign JSON file.
+        """
+        return self._path
+
+    def getCount(self):
+        """
+        Returns the number of waves.
+        """
+        return self._count
+
+    def getLargest(self):
+        """
+        Returns the number of aliens in the largest wave.
+        """
+        return self._largest
+
+    def __init__(self, path):
+        """
+        Initializes a Campaign, compiling the JSON file if needed.
+
+        The compiled file is mapped, not read. If it cannot be written (a
+        read-only folder), the campaign is compiled again in memory each run.
+
+        Parameter path: the campaign JSON file
+        Precondition: path is a string
+
+        Raises OSError if the file cannot be read, or ValueError if it is not a
+        valid campaign.
+        """
+        self._path = path
+        stat = os.stat(path)
+        compiled = os.path.splitext(path)[0] + _SUFFIX
+        self._data = _mapCompiled(compiled, stat)
+        if self._data == None:
+            with open(path) as file:
+                data = compileCampaign(json.load(file), stat.st_size,
+                stat.st_mtime_ns)
+            try:
+                temporary = '%s.%d' % (compiled, os.getpid())
+                with open(temporary, 'wb') as file:
+                    file.write(data)
+                os.replace(temporary, compiled)
+                self._data = _mapCompiled(compiled, stat)
+            except OSError:
+                pass
+            if self._data == None:
+                self._data = data
+        self._view = memoryview(self._data)
+        header = _HEADER.unpack_from(self._view, 0)
+        self._count = header[2]
+        self._largest = header[3]
+
+    def getFormation(self, number):
+        """
+        Returns the formation of a wave.
+
+        The cells and types are views of the compiled campaign; nothing is
+        copied.
+
+        Parameter number: the wave
+        Precondition: number is an int in 0..getCount()-1
+        """
+        rows, cols, size, start, label, length, speed, rate = \
+        _ENTRY.unpack_from(self._view, _HEADER.size + number*_ENTRY.size)
+        cells = self._view[start:start+4*size].cast('I')
+        types = self._view[start+4*size:start+5*size]
+        name = bytes(self._view[label:label+length]).decode('utf-8')
+        return Formation(rows, cols, cells, types, speed or None, rate or None,
+        name)
+
+
+def _mapCompiled(path, stat):
+    """
+    Returns the compiled campaign at path mapped into memory, or None if it is
+    missing, unreadable or out of date.
+
+    Parameter path: the compiled file
+    Precondition: path is a string
+
+    Parameter stat: the os.stat of the campaign JSON file
+    Precondition: stat is an os.stat_result
+    """
+    try:
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(data) >= _HEADER.size:
+        magic, version, count, largest, size, mtime = \
+        _HEADER.unpack_from(data, 0)
+        if magic == _MAGIC and version == _VERSION and size == stat.st_size \
+        and mtime == stat.st_mtime_ns:
+            return data
+    data.close()
+    return None
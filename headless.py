@@ -0,0 +1,176 @@
+"""
+Headless stand-ins for the game2d classes
+
+This module lets Wave and the models run without a window. It has classes with
+the same names and attributes as the parts of game2d the game uses, but they
+only store their attributes: drawing does nothing and sounds are silent. It
+imports nothing from Kivy, so a headless run starts in a fraction of the time.
+
+The module backend.py picks between this module and game2d, based on the
+HEADLESS setting in consts.py.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+
+
+class GObject(object):
+    """
+    A class to represent a shape with a position and a size.
+
+    INSTANCE ATTRIBUTES:
+        x:      [int or float] horizontal location of the center
+        y:      [int or float] vertical location of the center
+        width:  [int or float >= 0] the width
+        height: [int or float >= 0] the height
+    """
+
+    def __init__(self, **keywords):
+        """
+        Initializes a GObject from keyword arguments, like game2d does.
+
+        Unknown keywords (colors, fonts, ...) are stored as attributes.
+        """
+        self.x = 0
+        self.y = 0
+        self.width = 0
+        self.height = 0
+        for key, value in keywords.items():
+            setattr(self, key, value)
+
+    def contains(self, point):
+        """
+        Returns True if the point is inside this shape.
+
+        Parameter point: the point to check
+        Precondition: point is a pair of numbers
+        """
+        return abs(point[0] - self.x) <= self.width/2 and \
+        abs(point[1] - self.y) <= self.height/2
+
+    def draw(self, view):
+        """
+        Does nothing; there is nothing to draw to.
+
+        Parameter view: the (headless) view
+        Precondition: view is a GView
+        """
+        pass
+
+
+class GRectangle(GObject):
+    """
+    A class to represent a filled rectangle.
+    """
+    pass
+
+
+class GImage(GRectangle):
+    """
+    A class to represent an image. The image file is never opened.
+    """
+    pass
+
+
+class GSprite(GImage):
+    """
+    A class to represent a sprite strip with an animation frame.
+
+    INSTANCE ATTRIBUTES:
+        frame:  [int >= 0] the current animation frame
+    """
+
+    def __init__(self, **keywords):
+        """
+        Initializes a GSprite at frame 0.
+        """
+        self.frame = 0
+        super().__init__(**keywords)
+
+
+class GPath(GObject):
+    """
+    A class to represent a line through a list of points.
+    """
+    pass
+
+
+class GLabel(GRectangle):
+    """
+    A class to represent a text label. Nothing is laid out.
+    """
+    pass
+
+
+class Sound(object):
+    """
+    A class to represent a silent sound effect.
+
+    INSTANCE ATTRIBUTES:
+        source: [str] the sound file
+        volume: [float in 0..1] the volume
+    """
+
+    def __init__(self, source):
+        """
+        Initializes a Sound. The file is never opened.
+
+        Parameter source: the sound file
+        Precondition: source is a string
+        """
+        self.source = source
+        self.volume = 1.0
+
+    def play(self):
+        """
+        Does nothing; headless runs are silent.
+        """
+        pass
+
+
+class GView(object):
+    """
+    A class to represent a view that draws nothing.
+    """
+
+    def draw(self, cmd):
+        """
+        Does nothing.
+
+        Parameter cmd: the graphics to draw
+        Precondition: any value
+        """
+        pass
+
+
+class HeadlessInput(object):
+    """
+    A class to stand in for GInput, with keys set by a script or a program.
+
+    INSTANCE ATTRIBUTES:
+        _keys:  [set of str] the keys that are currently down
+    """
+
+    def __init__(self):
+        """
+        Initializes a HeadlessInput with no keys down.
+        """
+        self._keys = set()
+
+    def setKeys(self, keys):
+        """
+        Sets which keys are down for the next frame.
+
+        Parameter keys: the keys that are down
+        Precondition: keys is an iterable of key names (e.g. 'left')
+        """
+        self._keys = set(keys)
+
+    def is_key_down(self, key):
+        """
+        Returns True if the key is currently down.
+
+        Parameter key: the key to check
+        Precondition: key is a string
+        """
+        return key in self._keys
@@ -0,0 +1,267 @@
+"""
+Cached text for Alien Invaders
+
+This module contains the text on screen: the score and the state messages.
+Laying out text is slow, and the game used to do it far too often: a new
+GLabel for the wave-complete message on every paused frame, and a new layout
+of the whole score string on every kill.
+
+Messages are now made once per distinct text and reused (MessageCache). The
+score is drawn from a glyph atlas: the prefix and the digits 0-9 are rendered
+to textures once per font size, and a score change only swaps the textures of
+the digit rectangles (ScoreLabel).
+
+Like bunkers and particles, ScoreLabel imports Kivy the first time it is drawn,
+so headless runs never load it.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from backend import *
+import os
+
+
+class GlyphAtlas(object):
+    """
+    A class to represent the digits and the score prefix rendered in one font.
+
+    Atlases are shared: use GlyphAtlas.get instead of the initializer.
+
+    INSTANCE ATTRIBUTES:
+        _glyphs:  [dict of str to Texture] one texture per digit, plus one for
+                  the whole SCORE_PREFIX
+    """
+    # CLASS ATTRIBUTE: the atlas for each font size, made on first use
+    _atlases = {}
+
+    @classmethod
+    def get(cls, font_size):
+        """
+        Returns the shared atlas for a font size, rendering it if necessary.
+
+        Parameter font_size: the size of the font in points
+        Precondition: font_size is an int > 0
+        """
+        if not font_size in cls._atlases:
+            cls._atlases[font_size] = cls(font_size)
+        return cls._atlases[font_size]
+
+    def __init__(self, font_size):
+        """
+        Initializes an atlas by rendering each glyph once.
+
+        Parameter font_size: the size of the font in points
+        Precondition: font_size is an int > 0
+        """
+        from kivy.core.text import Label as CoreLabel
+        self._glyphs = {}
+        for digit in '0123456789':
+            self._glyphs[digit] = self._render(CoreLabel, digit, font_size)
+        self._glyphs[SCORE_PREFIX] = self._render(CoreLabel, SCORE_PREFIX,
+        font_size)
+
+    def getGlyph(self, text):
+        """
+        Returns the texture for a digit or for SCORE_PREFIX.
+
+        Parameter text: the glyph to look up
+        Precondition: text is a digit or SCORE_PREFIX
+        """
+        return self._glyphs[text]
+
+    def _render(self, CoreLabel, text, font_size):
+        """
+        Returns the texture of text laid out in GAME_FONT.
+
+        Parameter CoreLabel: the Kivy text renderer class
+        Precondition: CoreLabel is kivy.core.text.Label
+
+        Parameter text: the text to render
+        Precondition: text is a string
+
+        Parameter font_size: the size of the font in points
+        Precondition: font_size is an int > 0
+        """
+        font = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'Fonts', GAME_FONT)
+        if not os.path.exists(font):
+            font = GAME_FONT
+        label = CoreLabel(text = text, font_name = font,
+        font_size = font_size, color = (1, 1, 1, 1))
+        label.refresh()
+        return label.texture
+
+
+class ScoreLabel(object):
+    """
+    A class to represent the score display.
+
+    The display is SCORE_PREFIX followed by up to SCORE_DIGITS digit
+    rectangles. Changing the score only marks the label dirty. On the next
+    draw each digit rectangle is given the texture of its new digit; nothing
+    is laid out again.
+
+    INSTANCE ATTRIBUTES:
+        _value:   [int >= 0] the score shown
+        _left:    [number] x-coordinate of the left edge of the label
+        _y:       [number] vertical location of the center of the label
+        _size:    [int > 0] the font size
+        _dirty:   [bool] True if _value changed since the digits were set
+        _interval: [int > 0] the draws between digit refreshes (see
+                  setInterval)
+        _wait:    [int >= 0] draws left before the digits may be refreshed
+        _digits:  [list of Rectangle] the digit rectangles, most significant
+                  first (empty until the first draw)
+        _group:   [InstructionGroup or None] the prefix and digits to draw,
+                  None until the first draw
+    """
+
+    def getValue(self):
+        """
+        Returns the score shown.
+        """
+        return self._value
+
+    def setValue(self, value):
+        """
+        Sets the score shown. This is cheap; nothing is drawn until draw.
+
+        Parameter value: the new score
+        Precondition: value is an int >= 0
+        """
+        if value != self._value:
+            self._value = value
+            self._dirty = True
+
+    def setInterval(self, interval):
+        """
+        Sets how often the digits may be refreshed, in draws.
+
+        A FrameGovernor raises this when frames run over budget, so the score
+        on screen lags behind a little instead of costing texture swaps
+        every frame.
+
+        Parameter interval: the draws between refreshes (1 for every draw)
+        Precondition: interval is an int > 0
+        """
+        self._interval = interval
+        self._wait = min(self._wait, interval - 1)
+
+    def __init__(self, value, left, y, font_size):
+        """
+        Initializes a ScoreLabel.
+
+        Parameter value: the score shown
+        Precondition: value is an int >= 0
+
+        Parameter left: x-coordinate of the left edge of the label
+        Precondition: left is a number
+
+        Parameter y: vertical location of the center of the label
+        Precondition: y is a number
+
+        Parameter font_size: the font size
+        Precondition: font_size is an int > 0
+        """
+        self._value = value
+        self._left = left
+        self._y = y
+        self._size = font_size
+        self._dirty = True
+        self._interval = 1
+        self._wait = 0
+        self._digits = []
+        self._group = None
+
+    def draw(self, view):
+        """
+        Draws the score, swapping digit textures first if it changed.
+
+        A headless view has nothing to draw to, so there this does nothing
+        (and Kivy is never loaded).
+
+        Parameter view: the game view, used in drawing
+        Precondition: a valid view
+        """
+        if HEADLESS:
+            return
+        if self._group == None:
+            self._makeGroup()
+        if self._wait > 0:
+            self._wait -= 1
+        elif self._dirty:
+            self._setDigits()
+            self._dirty = False
+            self._wait = self._interval - 1
+        view.draw(self._group)
+
+    def _makeGroup(self):
+        """
+        Creates the prefix and digit rectangles.
+        """
+        from kivy.graphics import InstructionGroup, Color, Rectangle
+        atlas = GlyphAtlas.get(self._size)
+        prefix = atlas.getGlyph(SCORE_PREFIX)
+        self._group = InstructionGroup()
+        self._group.add(Color(1, 1, 1, 1))
+        self._group.add(Rectangle(texture = prefix,
+        pos = (self._left, self._y - prefix.height/2), size = prefix.size))
+        for k in range(SCORE_DIGITS):
+            digit = Rectangle(size = (0, 0))
+            self._group.add(digit)
+            self._digits.append(digit)
+
+    def _setDigits(self):
+        """
+        Points each digit rectangle at the texture of its digit.
+
+        Unused rectangles get a size of 0, so they draw nothing.
+        """
+        atlas = GlyphAtlas.get(self._size)
+        x = self._left + atlas.getGlyph(SCORE_PREFIX).width
+        text = str(self._value)[-SCORE_DIGITS:]
+        for k in range(SCORE_DIGITS):
+            digit = self._digits[k]
+            if k < len(text):
+                glyph = atlas.getGlyph(text[k])
+                digit.texture = glyph
+                digit.pos = (x, self._y - glyph.height/2)
+                digit.size = glyph.size
+                x += glyph.width
+            else:
+                digit.size = (0, 0)
+
+
+class MessageCache(object):
+    """
+    A class to hand out one GLabel per distinct message.
+
+    The state messages ("Game Over!", "Press 'S' to Continue", ...) are all
+    centered on the screen in the same font, so a label made once can be shown
+    again any number of times with no new layout and no allocation.
+
+    INSTANCE ATTRIBUTES:
+        _labels: [dict of str to GLabel] the labels made so far, by text
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty MessageCache.
+        """
+        self._labels = {}
+
+    def get(self, text):
+        """
+        Returns the centered message label for text, making it if necessary.
+
+        Parameter text: the message
+        Precondition: text is a string
+        """
+        label = self._labels.get(text)
+        if label == None:
+            label = GLabel(text = text, font_name = GAME_FONT,
+            font_size = MESSAGE_SIZE, linecolor = 'white',
+            x = GAME_WIDTH/2, y = GAME_HEIGHT/2)
+            self._labels[text] = label
+        return label
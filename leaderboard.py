@@ -0,0 +1,302 @@
+"""
+Persistent leaderboard for Alien Invaders
+
+This module keeps every finished game in a local SQLite database, so scores
+outlive the process. The game shows the player's rank when a game ends, and
+the game server (see --serve) can record its sessions by the thousand.
+For example
+
+    python invaders --player ada
+    python invaders --serve 0 --bots 1000 --leaderboard scores.db
+
+The database runs in WAL mode, so the writer never blocks a query. Scores are
+never written on the caller's thread: submit only puts the result on a queue,
+and a background thread inserts whatever has built up in one transaction (at
+most LEADERBOARD_BATCH rows at a time). A batch the database refuses (locked
+past the timeout, a full disk) is dropped, counted and reported; the writer
+carries on, so flush and close never wait on a writer that has died.
+
+The table scores has an index on (mode, score) for the top scores, and one on
+(mode, player, score) for a player's best. Rank needs the number of better
+scores, which would mean counting index entries, so the writer also keeps
+score_counts: the number of games for each distinct score. Scores are
+multiples of 10, so there are far fewer distinct scores than games, and rank
+stays a short index range sum however many games are stored.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import collections
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+
+# The tables and indexes, made if they are missing
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id     INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    mode   TEXT NOT NULL,
+    score  INTEGER NOT NULL,
+    level  INTEGER NOT NULL,
+    played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_top ON scores (mode, score DESC);
+CREATE INDEX IF NOT EXISTS scores_player ON scores (mode, player, score DESC);
+CREATE TABLE IF NOT EXISTS score_counts (
+    mode  TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (mode, score)
+) WITHOUT ROWID;
+"""
+
+_INSERT = 'INSERT INTO scores (player, mode, score, level, played) ' \
+          'VALUES (?, ?, ?, ?, ?)'
+_COUNT = 'INSERT INTO score_counts (mode, score, games) VALUES (?, ?, ?) ' \
+         'ON CONFLICT (mode, score) DO UPDATE SET games = games + excluded.games'
+
+
+def _connect(path):
+    """
+    Returns a connection to the database at path, in WAL mode.
+
+    Parameter path: the database file
+    Precondition: path is a string
+    """
+    connection = sqlite3.connect(path, timeout = 30)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    return connection
+
+
+class Leaderboard(object):
+    """
+    A class to store finished games and answer top and rank queries.
+
+    Queries run on the caller's thread, on their own connection. Writes go
+    through a queue to the writer thread, which has the other connection.
+
+    INSTANCE ATTRIBUTES:
+        _path:     [str] the database file
+        _mode:     [str] the game mode the queries are about (GAME_MODE)
+        _reader:   [sqlite3 Connection] the connection for queries
+        _queue:    [SimpleQueue] results waiting to be written, as tuples for
+                   _INSERT; None stops the writer
+        _submitted: [int >= 0] the results submitted (caller's thread only)
+        _committed: [int >= 0] the results committed (writer thread only)
+        _failed:   [int >= 0] the results that could not be written (writer
+                   thread only)
+        _error:    [str or None] why the last batch could not be written
+        _written:  [Condition] notified whenever the writer is done with a
+                   batch, committed or not
+        _thread:   [Thread] the writer
+    """
+
+    def getPath(self):
+        """
+        Returns the database file.
+        """
+        return self._path
+
+    def getFailed(self):
+        """
+        Returns the number of games that could not be written.
+        """
+        return self._failed
+
+    def getError(self):
+        """
+        Returns why the last batch could not be written, or None.
+        """
+        return self._error
+
+    def __init__(self, path, mode = GAME_MODE):
+        """
+        Initializes a Leaderboard on path, creating the database if needed.
+
+        Parameter path: the database file
+        Precondition: path is a string; its folder is made if it is missing
+
+        Parameter mode: the game mode the queries are about
+        Precondition: mode is a string
+        """
+        folder = os.path.dirname(path)
+        if folder != '':
+            os.makedirs(folder, exist_ok = True)
+        self._path = path
+        self._mode = mode
+        self._reader = _connect(path)
+        self._reader.executescript(_SCHEMA)
+        self._queue = queue.SimpleQueue()
+        self._submitted = 0
+        self._committed = 0
+        self._failed = 0
+        self._error = None
+        self._written = threading.Condition()
+        self._thread = threading.Thread(target = self._run,
+        name = 'leaderboard', daemon = True)
+        self._thread.start()
+
+    def submit(self, player, score, level):
+        """
+        Records a finished game, without waiting for it to be written.
+
+        Parameter player: the name of the player
+        Precondition: player is a string
+
+        Parameter score: the final score
+        Precondition: score is an int >= 0
+
+        Parameter level: the number of waves completed
+        Precondition: level is an int >= 0
+        """
+        self._submitted += 1
+        self._queue.put((player, self._mode, score, level, time.time()))
+
+    def flush(self, timeout = LEADERBOARD_WAIT):
+        """
+        Waits until the writer is done with every submitted game.
+
+        Returns True if it was done in time. Games that could not be written
+        count as done (see getFailed).
+
+        Parameter timeout: the most seconds to wait
+        Precondition: timeout is a number >= 0
+        """
+        submitted = self._submitted
+        with self._written:
+            return self._written.wait_for(lambda: self._committed +
+            self._failed >= submitted, timeout)
+
+    def close(self, timeout = LEADERBOARD_WAIT):
+        """
+        Writes every submitted game and stops the writer.
+
+        A writer still busy after timeout seconds is left to finish on its own
+        (it is a daemon thread).
+
+        Parameter timeout: the most seconds to wait for the writer
+        Precondition: timeout is a number >= 0
+        """
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._reader.close()
+
+    def top(self, k = LEADERBOARD_TOP):
+        """
+        Returns the k best games, best first, as (player, score, level) tuples.
+
+        Parameter k: the number of games
+        Precondition: k is an int > 0
+        """
+        return self._reader.execute('SELECT player, score, level FROM scores '
+        'WHERE mode = ? ORDER BY score DESC LIMIT ?', (self._mode, k)).fetchall()
+
+    def rank(self, score):
+        """
+        Returns the rank a score has: 1 plus the number of better games.
+
+        Parameter score: the score
+        Precondition: score is an int >= 0
+        """
+        better = self._reader.execute('SELECT total(games) FROM score_counts '
+        'WHERE mode = ? AND score > ?', (self._mode, score)).fetchone()[0]
+        return int(better) + 1
+
+    def playerBest(self, player):
+        """
+        Returns the best score of a player, or None if they have no games.
+
+        Parameter player: the name of the player
+        Precondition: player is a string
+        """
+        row = self._reader.execute('SELECT score FROM scores WHERE mode = ? '
+        'AND player = ? ORDER BY score DESC LIMIT 1', (self._mode,
+        player)).fetchone()
+        return None if row == None else row[0]
+
+    def playerRank(self, player):
+        """
+        Returns the rank of a player's best game, or None if they have none.
+
+        Parameter player: the name of the player
+        Precondition: player is a string
+        """
+        best = self.playerBest(player)
+        return None if best == None else self.rank(best)
+
+    def count(self):
+        """
+        Returns the number of games stored.
+        """
+        return int(self._reader.execute('SELECT total(games) FROM '
+        'score_counts WHERE mode = ?', (self._mode,)).fetchone()[0])
+
+    def _run(self):
+        """
+        Writes submitted games in batches until close is called.
+
+        The writer blocks until a game arrives, then takes everything else
+        already waiting (up to LEADERBOARD_BATCH) and commits it at once.
+        If the database cannot be opened, it is opened again for each batch.
+        """
+        connection = None
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            while item != None:
+                batch.append(item)
+                if len(batch) >= LEADERBOARD_BATCH:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = item == None
+            if batch:
+                connection = self._write(connection, batch)
+        if connection != None:
+            connection.close()
+
+    def _write(self, connection, batch):
+        """
+        Inserts a batch of games and their score counts in one transaction.
+
+        Returns the writer's connection, or None if it could not be opened.
+        If the transaction fails, it is rolled back and the batch is counted
+        in _failed.
+
+        Parameter connection: the writer's connection, or None to open one
+        Precondition: connection is a sqlite3 Connection or None
+
+        Parameter batch: the games
+        Precondition: batch is a non-empty list of tuples for _INSERT
+        """
+        counts = collections.Counter((row[1], row[2]) for row in batch)
+        error = None
+        try:
+            if connection == None:
+                connection = _connect(self._path)
+            with connection:
+                connection.executemany(_INSERT, batch)
+                connection.executemany(_COUNT, [(mode, score, games) for
+                (mode, score), games in counts.items()])
+        except sqlite3.Error as e:
+            error = str(e)
+            print('leaderboard: %d games not written (%s)' % (len(batch),
+            error), file = sys.stderr)
+        with self._written:
+            if error == None:
+                self._committed += len(batch)
+            else:
+                self._failed += len(batch)
+                self._error = error
+            self._written.notify_all()
+        return connection
@@ -25,7 +25,7 @@ Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
 Date: May 7, 2019
 """
 from consts import *
-from game2d import *
+from backend import *
 
 # PRIMARY RULE: Models are not allowed to access anything in any module other than
 # consts.py.  If you need extra information from Gameplay, then it should be
@@ -33,6 +33,23 @@ from game2d import *
 # calls the method.
 
 
+# Sound effects shared by every model, loaded the first time they are used
+# (or ahead of time by the preloader). Each Alien used to load its own two
+# Sounds, which dominated the time to build a large formation.
+_SOUNDS = {}
+
+def loadSound(source):
+    """
+    Returns the shared Sound for the given file, loading it if necessary.
+
+    Parameter source: the sound file
+    Precondition: source is the name of a file in the Sounds folder
+    """
+    if not source in _SOUNDS:
+        _SOUNDS[source] = Sound(source)
+    return _SOUNDS[source]
+
+
 class Ship(GImage):
     """
     A class to represent the game ship.
@@ -114,8 +131,8 @@ class Ship(GImage):
         """
         super().__init__(x = ship_x, y = ship_y, width = ship_w,
         height = ship_h, source = ship_img)
-        self._shipBolt = Sound('pew1.wav')
-        self._shipDeath = Sound('blast1.wav')
+        self._shipBolt = loadSound('pew1.wav')
+        self._shipDeath = loadSound('blast1.wav')
 
     # METHODS TO MOVE THE SHIP AND CHECK FOR COLLISIONS
     def moveShip(self, input):
@@ -125,16 +142,16 @@ class Ship(GImage):
         The ship will move left and right according to user input until it hits
         the edge of the screen.
 
-        Parameter input: an input passed down from invaders
-        Precondition: a valid input
+        Parameter input: the keys of this frame, passed down from invaders
+        Precondition: input is an InputSnapshot
         """
         min = SHIP_WIDTH/2
         max = GAME_WIDTH - (SHIP_WIDTH/2)
-        left_pressed = input.is_key_down('left') and self.x >= min
+        left_pressed = input.isDown(KEY_LEFT) and self.x >= min
         if left_pressed:
             self.x -= SHIP_MOVEMENT
 
-        right_pressed = input.is_key_down('right') and self.x <= max
+        right_pressed = input.isDown(KEY_RIGHT) and self.x <= max
         if right_pressed:
             self.x += SHIP_MOVEMENT
 
@@ -146,11 +163,11 @@ class Ship(GImage):
         Parameter bolt: The laser bolt to check
         Precondition: bolt is of class Bolt
         """
+        #Compare the boxes directly; a bolt is smaller than the ship, so any
+        #overlap puts one of its corners inside the ship
         return not bolt.isPlayerBolt() and \
-        (self.contains((bolt.x-BOLT_WIDTH/2, bolt.y+BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x+BOLT_WIDTH/2, bolt.y+BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x-BOLT_WIDTH/2, bolt.y-BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x+BOLT_WIDTH/2, bolt.y-BOLT_HEIGHT/2)))
+        abs(bolt.x - self.x) <= (self.width + BOLT_WIDTH)/2 and \
+        abs(bolt.y - self.y) <= (self.height + BOLT_HEIGHT)/2
 
     # ADD MORE METHODS (PROPERLY SPECIFIED) AS NECESSARY
     def shipBoltPlay(self):
@@ -261,8 +278,8 @@ class Alien(GSprite):
         super().__init__(x = alien_x, y = alien_y, width = alien_w,
         height = alien_h, source = alien_img, format = (3,2))
         self._type = alien_type
-        self._alienBolt = Sound('pew2.wav')
-        self._alienDeath = Sound('pop2.wav')
+        self._alienBolt = loadSound('pew2.wav')
+        self._alienDeath = loadSound('pop2.wav')
 
     # METHOD TO CHECK FOR COLLISION (IF DESIRED)
     def collides(self, bolt):
@@ -273,11 +290,11 @@ class Alien(GSprite):
         Parameter bolt: The laser bolt to check
         Precondition: bolt is of class Bolt
         """
+        #Compare the boxes directly; a bolt is smaller than the alien, so any
+        #overlap puts one of its corners inside the alien
         return bolt.isPlayerBolt() and \
-        (self.contains((bolt.x-BOLT_WIDTH/2,bolt.y+BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x+BOLT_WIDTH/2, bolt.y+BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x-BOLT_WIDTH/2, bolt.y-BOLT_HEIGHT/2)) or \
-        self.contains((bolt.x+BOLT_WIDTH/2, bolt.y-BOLT_HEIGHT/2)))
+        abs(bolt.x - self.x) <= (self.width + BOLT_WIDTH)/2 and \
+        abs(bolt.y - self.y) <= (self.height + BOLT_HEIGHT)/2
 
     # ADD MORE METHODS (PROPERLY SPECIFIED) AS NECESSARY
     def alienBoltPlay(self):
@@ -323,8 +340,16 @@ class Bolt(GRectangle):
         fillcolor: [str] contains the Bolt color
 
     LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
+        _vx:       [int or float] the velocity in x direction (0 unless the
+                   bolt is part of a spread shot)
     """
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
+    def getBoltX(self):
+        """
+        Returns x-coordinate of the current Bolt object.
+        """
+        return self.x
+
     def getBoltY(self):
         """
         Returns y-coordinate of the current Bolt object.
@@ -355,8 +380,15 @@ class Bolt(GRectangle):
         """
         self._velocity = bolt_sp
 
+    def getBoltVX(self):
+        """
+        Returns horizontal velocity of the current Bolt object.
+        """
+        return self._vx
+
     # INITIALIZER TO SET THE VELOCITY
-    def __init__(self, bolt_x, bolt_y, bolt_w, bolt_h, bolt_sp, bolt_color):
+    def __init__(self, bolt_x, bolt_y, bolt_w, bolt_h, bolt_sp, bolt_color,
+    bolt_vx = 0):
         """
         Initializes an Bolt object.
 
@@ -368,10 +400,12 @@ class Bolt(GRectangle):
             bolt_w:     width of bolt
             bolt_h:     height of the bolt
             bolt_sp:    velocity of the bolt
+            bolt_vx:    horizontal velocity of the bolt (default 0)
         """
         super().__init__(x = bolt_x, y = bolt_y, width = bolt_w,
         height = bolt_h, fillcolor = bolt_color)
         self._velocity = bolt_sp
+        self._vx = bolt_vx
 
     # ADD MORE METHODS (PROPERLY SPECIFIED) AS NECESSARY
     def isPlayerBolt(self):
@@ -380,4 +414,46 @@ class Bolt(GRectangle):
         """
         return self._velocity > 0
 
+    def resetBolt(self, bolt_x, bolt_y, bolt_sp, bolt_vx):
+        """
+        Reuses this Bolt for a new shot (see Wave._newBolt).
+
+        Parameter bolt_x: horizontal location of the Bolt
+        Precondition: bolt_x is a number
+
+        Parameter bolt_y: vertical location of the Bolt
+        Precondition: bolt_y is a number
+
+        Parameter bolt_sp: the velocity of the Bolt, with the same sign as
+        before (so the color still matches)
+        Precondition: bolt_sp is a nonzero number
+
+        Parameter bolt_vx: the horizontal velocity of the Bolt
+        Precondition: bolt_vx is a number
+        """
+        self.x = bolt_x
+        self.y = bolt_y
+        self._velocity = bolt_sp
+        self._vx = bolt_vx
+
+    def moveBolt(self):
+        """
+        Moves the bolt one update along its velocity.
+
+        Returns True if any part of the Bolt is still inside the window (see
+        isOnScreen), so Wave moves and culls a bolt with one call.
+        """
+        self.y += self._velocity
+        if self._vx != 0:
+            self.x += self._vx
+        return -BOLT_HEIGHT/2 < self.y < GAME_HEIGHT + BOLT_HEIGHT/2 and \
+        -BOLT_WIDTH/2 < self.x < GAME_WIDTH + BOLT_WIDTH/2
+
+    def isOnScreen(self):
+        """
+        Returns True if any part of the Bolt is still inside the window.
+        """
+        return -BOLT_HEIGHT/2 < self.y < GAME_HEIGHT + BOLT_HEIGHT/2 and \
+        -BOLT_WIDTH/2 < self.x < GAME_WIDTH + BOLT_WIDTH/2
+
 # IF YOU NEED ADDITIONAL MODEL CLASSES, THEY GO HERE
@@ -0,0 +1,176 @@
+"""
+Particle effects for Alien Invaders
+
+This module contains the explosion effect played when an alien or the ship is
+destroyed. Explosions are not made of GObjects. Every particle lives in a slot
+of a few preallocated NumPy arrays (position, velocity, remaining life and
+color), all live particles are moved in one vectorized step per frame, and each
+color is drawn as a single Kivy Mesh of quads. The cost of a frame therefore
+depends on a handful of array operations, not on the number of particles.
+
+NumPy is optional. If it is not installed, ParticleSystem.create() returns
+None and Wave simply plays the game without explosions. NumPy is imported the
+first time a system is created and Kivy the first time one is drawn, so
+importing this module costs nothing and headless runs never load Kivy.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+
+# NumPy, imported by ParticleSystem.create (None until then, or if missing)
+np = None
+
+
+class ParticleSystem(object):
+    """
+    A class to represent every explosion particle on screen.
+
+    Slots are handed out in ring order, so a new burst overwrites the oldest
+    particles once the system is full. A slot is live while its life is > 0.
+
+    INSTANCE ATTRIBUTES:
+        _capacity: [int > 0] the number of particle slots
+        _pos:      [float32 array (_capacity, 2)] particle x, y
+        _vel:      [float32 array (_capacity, 2)] particle velocity in
+                   pixels per second
+        _life:     [float32 array (_capacity,)] seconds each particle has left
+                   to live (<= 0 if the slot is free)
+        _color:    [uint8 array (_capacity,)] index into PARTICLE_COLORS
+        _step:     [float32 array (_capacity, 2)] scratch space for update
+        _next:     [int in 0.._capacity-1] the next slot to hand out
+        _corners:  [float32 array (4, 4)] x, y, u, v offsets of a unit quad
+        _indices:  [uint16 array (_capacity*6,)] triangle indices for
+                   _capacity quads
+        _meshes:   [list of Mesh] one mesh per color in PARTICLE_COLORS
+                   (empty until the first draw)
+        _group:    [InstructionGroup or None] the colors and meshes to draw,
+                   None until the first draw
+    """
+
+    @classmethod
+    def create(cls, capacity = PARTICLE_CAPACITY):
+        """
+        Returns a new ParticleSystem, or None if NumPy is not installed.
+
+        Parameter capacity: the number of particle slots
+        Precondition: capacity is an int > 0
+        """
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                return None
+        return cls(capacity)
+
+    def __init__(self, capacity = PARTICLE_CAPACITY):
+        """
+        Initializes a ParticleSystem with every slot free.
+
+        Parameter capacity: the number of particle slots
+        Precondition: capacity is an int > 0
+        """
+        self._capacity = capacity
+        self._pos = np.zeros((capacity, 2), np.float32)
+        self._vel = np.zeros((capacity, 2), np.float32)
+        self._life = np.zeros(capacity, np.float32)
+        self._color = np.zeros(capacity, np.uint8)
+        self._step = np.zeros((capacity, 2), np.float32)
+        self._next = 0
+        self._corners = np.array([[-1, -1, 0, 0], [1, -1, 1, 0],
+        [1, 1, 1, 1], [-1, 1, 0, 1]], np.float32)
+        quads = np.arange(capacity, dtype=np.int64)[:, None]*4
+        self._indices = (quads + np.array([0, 1, 2, 2, 3, 0])).ravel().astype(
+        np.uint16)
+        self._meshes = []
+        self._group = None
+
+    def getLiveCount(self):
+        """
+        Returns the number of live particles.
+        """
+        return int(np.count_nonzero(self._life > 0))
+
+    def burst(self, x, y, count, color):
+        """
+        Spawns count particles flying outward from (x, y).
+
+        Parameter x: horizontal location of the explosion
+        Precondition: x is a number
+
+        Parameter y: vertical location of the explosion
+        Precondition: y is a number
+
+        Parameter count: the number of particles
+        Precondition: count is an int in 1.._capacity
+
+        Parameter color: the particle color
+        Precondition: color is an index into PARTICLE_COLORS
+        """
+        slots = (self._next + np.arange(count)) % self._capacity
+        self._next = (self._next + count) % self._capacity
+        angle = np.random.uniform(0, 2*np.pi, count)
+        speed = np.random.uniform(0.2, 1.0, count)*PARTICLE_SPEED
+        self._pos[slots, 0] = x
+        self._pos[slots, 1] = y
+        self._vel[slots, 0] = np.cos(angle)*speed
+        self._vel[slots, 1] = np.sin(angle)*speed
+        self._life[slots] = np.random.uniform(0.5, 1.0, count)*PARTICLE_LIFE
+        self._color[slots] = color
+
+    def update(self, dt):
+        """
+        Moves, slows and ages every particle in one vectorized step.
+
+        Free slots are updated too; that is cheaper than selecting the live
+        ones, and their positions are never drawn.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        np.multiply(self._vel, dt, out=self._step)
+        self._pos += self._step
+        self._vel[:, 1] -= PARTICLE_GRAVITY*dt
+        self._life -= dt
+
+    def draw(self, view):
+        """
+        Draws the live particles as one mesh per color.
+
+        Each particle is a square that shrinks as it runs out of life.
+
+        Parameter view: the game view, used in drawing
+        Precondition: a valid view
+        """
+        if self._group == None:
+            self._makeMeshes()
+        live = self._life > 0
+        for c in range(len(self._meshes)):
+            which = np.nonzero(live & (self._color == c))[0]
+            k = len(which)
+            half = np.minimum(self._life[which]/PARTICLE_LIFE, 1)* \
+            (PARTICLE_SIZE/2)
+            quads = np.empty((k, 4, 4), np.float32)
+            quads[:, :, 0] = self._pos[which, 0, None] + \
+            self._corners[:, 0]*half[:, None]
+            quads[:, :, 1] = self._pos[which, 1, None] + \
+            self._corners[:, 1]*half[:, None]
+            quads[:, :, 2:] = self._corners[:, 2:]
+            #Hand the buffers to Kivy directly instead of building lists
+            mesh = self._meshes[c]
+            mesh.vertices = memoryview(quads.ravel())
+            mesh.indices = memoryview(self._indices[:k*6])
+        view.draw(self._group)
+
+    def _makeMeshes(self):
+        """
+        Creates the Kivy meshes, one per color in PARTICLE_COLORS.
+        """
+        from kivy.graphics import InstructionGroup, Color, Mesh
+        self._group = InstructionGroup()
+        for rgba in PARTICLE_COLORS:
+            mesh = Mesh(mode = 'triangles')
+            self._group.add(Color(*rgba))
+            self._group.add(mesh)
+            self._meshes.append(mesh)
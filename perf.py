@@ -0,0 +1,906 @@
+"""
+Performance measurement for Alien Invaders
+
+This module contains the frame timer used to check the game against its frame
+budget. Invaders times its update and draw methods every frame and hands the
+numbers to a FrameTimer, which keeps a window of recent frames and decides if
+the game is holding its target frame rate.
+
+A frame passes if update plus draw together fit inside FRAME_BUDGET. A report
+passes if at least FRAME_PASS_RATE of the frames in the window pass. Frames
+with at least STRESS_BOLTS bolts on screen are also counted separately, since
+that is the load bullet-hell mode is meant to hold at 60 fps.
+
+The timer also keeps running totals for rate reports: how many updates and
+draws per second the game could sustain at the current load, next to the frame
+rate it actually got. Endless mode prints these as the formation grows.
+
+An AllocationCounter checks that steady play allocates nothing: it traces
+every allocation with tracemalloc and fails a frame that takes more than the
+interpreter's own scratch from the allocator, once a wave has warmed up.
+Together with --gc-control, which keeps the garbage collector from running
+during play, this keeps collector pauses out of frames.
+
+A LatencyProbe measures input latency: the time from a key press (see
+InputSnapshot.getPressTime) to the end of the first frame drawn with its
+effect, the ship moving for 'left' and 'right' and a new bolt for 'spacebar'.
+
+A FrameGovernor (--governor) keeps the game at speed on a busy machine. It
+averages recent update and draw times, and when a frame costs more than
+GOVERN_SHED of FRAME_BUDGET it sheds optional work one level at a time (see
+the SHED constants): alien animation, then HUD refreshes, then every other
+draw, then the alien sounds. Once there is headroom again it restores them in
+reverse order. Every change is printed with the times that caused it, so the
+thresholds can be tuned.
+
+A TimeScale plays the game faster or slower than real time, for testing late
+waves by hand. Away from 1x the wave is played in fixed ticks of FRAME_BUDGET,
+as many per frame as the scale asks for, so the alien timing and the per-frame
+motion of the ship and bolts speed up or slow down together. When the ticks of
+a frame take too long the rest are dropped, and the scale actually achieved is
+reported.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import array
+import gc
+import time
+import tracemalloc
+
+
+def pauseCollector():
+    """
+    Turns the cyclic garbage collector off if GC_CONTROL is set.
+
+    Called when a wave goes into play. Nothing in steady play makes cycles, so
+    memory is still freed by reference counting; only the collector pauses stop.
+    """
+    if GC_CONTROL:
+        gc.disable()
+
+
+def resumeCollector():
+    """
+    Turns the cyclic garbage collector back on and runs it if GC_CONTROL is set.
+
+    Called when play stops (a pause or a wave boundary), where a collection
+    cannot be seen.
+    """
+    if GC_CONTROL:
+        gc.enable()
+        gc.collect()
+
+
+class FrameTimer(object):
+    """
+    A class to measure frame times against the frame budget.
+
+    INSTANCE ATTRIBUTES:
+        _size:      [int > 0] the number of frames kept in the window
+        _times:     [array of float] the last _size frame times in seconds
+        _bolts:     [array of int] the bolt count of each frame in _times
+        _next:      [int in 0.._size-1] the slot the next frame is written to
+        _count:     [int >= 0] the total number of frames recorded
+        _update:    [float >= 0] the update time of the frame in progress
+        _stamp:     [float or None] the perf_counter value when the current
+                    measurement started, None if nothing is being timed
+        _updateSum: [float >= 0] total update time since the last resetRates
+        _drawSum:   [float >= 0] total draw time since the last resetRates
+        _frames:    [int >= 0] frames recorded since the last resetRates
+        _wall:      [float] the perf_counter value at the last resetRates
+        _stress:    [int >= 0] the stress frames recorded over the whole run
+        _stressOk:  [int >= 0] the stress frames of the run within budget
+    """
+
+    def __init__(self, size = REPORT_FRAMES):
+        """
+        Initializes a FrameTimer with an empty window.
+
+        Parameter size: the number of frames kept in the window
+        Precondition: size is an int > 0
+        """
+        self._size = size
+        self._times = array.array('d', [0.0]) * size
+        self._bolts = array.array('l', [0]) * size
+        self._next = 0
+        self._count = 0
+        self._update = 0.0
+        self._stamp = None
+        self._stress = 0
+        self._stressOk = 0
+        self.resetRates()
+
+    def getCount(self):
+        """
+        Returns the total number of frames recorded.
+        """
+        return self._count
+
+    def begin(self):
+        """
+        Starts timing update or draw.
+        """
+        self._stamp = time.perf_counter()
+
+    def endUpdate(self):
+        """
+        Stops timing update and remembers how long it took.
+        """
+        self._update = time.perf_counter() - self._stamp
+        self._updateSum += self._update
+        self._stamp = None
+
+    def endDraw(self, bolts):
+        """
+        Stops timing draw and records the whole frame (update plus draw).
+
+        Parameter bolts: the number of bolts on screen this frame
+        Precondition: bolts is an int >= 0
+        """
+        draw = time.perf_counter() - self._stamp
+        frame = self._update + draw
+        self._drawSum += draw
+        self._frames += 1
+        self._stamp = None
+        self._update = 0.0
+        self._times[self._next] = frame
+        self._bolts[self._next] = bolts
+        self._next = (self._next + 1) % self._size
+        self._count += 1
+        if bolts >= STRESS_BOLTS:
+            self._stress += 1
+            if frame <= FRAME_BUDGET:
+                self._stressOk += 1
+
+    def isReportDue(self):
+        """
+        Returns True if a full window has been recorded since the last report.
+        """
+        return self._count > 0 and self._count % self._size == 0
+
+    def report(self):
+        """
+        Returns a one line summary of the window and whether it passed.
+
+        The summary gives the number of frames, the worst bolt count, the 50th
+        and 95th percentile frame times in milliseconds, the share of frames
+        within budget and PASS or FAIL. Stress frames (with STRESS_BOLTS or
+        more bolts) get their own pass rate, or '-' if there were none (a
+        FAIL in bullet-hell mode, where the stress frames are the point).
+        """
+        n = min(self._count, self._size)
+        if n == 0:
+            return 'frames=0'
+        times = sorted(self._times[:n])
+        within = sum(1 for t in self._times[:n] if t <= FRAME_BUDGET)
+        stress = [self._times[i] for i in range(n)
+                  if self._bolts[i] >= STRESS_BOLTS]
+        rate = within/n
+        line = 'frames=%d bolts=%d p50=%.2fms p95=%.2fms ok=%.1f%% %s' % \
+        (n, max(self._bolts[:n]), times[n//2]*1000,
+        times[min(n-1, int(n*0.95))]*1000, rate*100, self._verdict(rate))
+        if stress:
+            srate = sum(1 for t in stress if t <= FRAME_BUDGET)/len(stress)
+            line += ' stress=%d ok=%.1f%% %s' % (len(stress), srate*100,
+            self._verdict(srate))
+        elif GAME_MODE == MODE_BULLET_HELL:
+            line += ' stress=- FAIL'
+        else:
+            line += ' stress=-'
+        return line
+
+    def isStressPassing(self):
+        """
+        Returns True if the run had stress frames and enough of them fit in
+        FRAME_BUDGET.
+        """
+        return self._stress > 0 and \
+        self._stressOk/self._stress >= FRAME_PASS_RATE
+
+    def stressReport(self, covers = 'update+draw'):
+        """
+        Returns a one line summary of the stress frames of the whole run.
+
+        A run without stress frames fails: it never showed that STRESS_BOLTS
+        bolts fit in the frame budget.
+
+        Parameter covers: what the frame times include, for the report
+        Precondition: covers is a string
+        """
+        if self._stress == 0:
+            return 'stress frames=0 (never reached %d bolts) FAIL' % \
+            STRESS_BOLTS
+        rate = self._stressOk/self._stress
+        return 'stress frames=%d of %d bolts or more (%s) ok=%.1f%% %s' % \
+        (self._stress, STRESS_BOLTS, covers, rate*100, self._verdict(rate))
+
+    def _verdict(self, rate):
+        """
+        Returns 'PASS' if rate meets FRAME_PASS_RATE, 'FAIL' otherwise.
+
+        Parameter rate: the fraction of frames within budget
+        Precondition: rate is a float in 0..1
+        """
+        return 'PASS' if rate >= FRAME_PASS_RATE else 'FAIL'
+
+    def resetRates(self):
+        """
+        Restarts the totals used by rateReport, e.g. when the load changes.
+        """
+        self._updateSum = 0.0
+        self._drawSum = 0.0
+        self._frames = 0
+        self._wall = time.perf_counter()
+
+    def rateReport(self, aliens):
+        """
+        Returns a one line summary of sustained rates since resetRates.
+
+        The summary gives the number of aliens, how many updates and draws per
+        second the game could run at the measured cost, the frame rate it
+        actually got, and whether update plus draw still fits in FRAME_BUDGET.
+
+        Parameter aliens: the number of living aliens
+        Precondition: aliens is an int >= 0
+        """
+        if self._frames == 0:
+            return 'aliens=%d frames=0' % aliens
+        update = self._updateSum/self._frames
+        draw = self._drawSum/self._frames
+        elapsed = time.perf_counter() - self._wall
+        ups = 1/update if update > 0 else float('inf')
+        dps = 1/draw if draw > 0 else float('inf')
+        fps = self._frames/elapsed if elapsed > 0 else 0.0
+        status = 'KEEPING UP' if update + draw <= FRAME_BUDGET else 'BEHIND'
+        return 'aliens=%d updates/s=%.0f draws/s=%.0f fps=%.1f %s' % \
+        (aliens, ups, dps, fps, status)
+
+
+class AllocationCounter(object):
+    """
+    A class to check that steady play allocates nothing.
+
+    The counter traces allocations with tracemalloc (starting it if it is not
+    already tracing, which slows every allocation down). For every frame it
+    records the gross bytes the frame took from the allocator: the peak of
+    traced memory during the frame over what was traced as it started. This
+    counts what the frame made and freed again, not only what it kept.
+
+    CPython does not send everything through the allocator. Floats and small
+    tuples that die are kept on free lists and handed out again, so a frame
+    that makes them only shows once those lists are empty. And the
+    interpreter itself makes short-lived objects every frame, whatever the
+    game does: the iterator of every for loop, range and zip objects, and
+    every int above 256. So a frame passes if it takes at most ALLOC_SCRATCH
+    bytes. That leaves room for a single small object made and dropped in a
+    frame, but not for a bolt made for every bolt in play or a list of their
+    positions. Every bolt in play holds its own position and velocity
+    numbers, so a bullet-hell frame that puts more bolts in play than leave
+    it takes more than that, and is counted as over.
+
+    The bytes still held at the end of the last counted frame, over what was
+    held as the first one started, must not come to more than ALLOC_KEPT, so
+    memory kept from frame to frame (a Bolt a frame, say) fails however small
+    each piece is. This spans whatever runs between frames (a
+    draw), as one part of a frame can free what another made. The first
+    ALLOC_WARMUP frames after a restart (a new wave, a respawned ship) fill
+    pools and list storage and are not counted, and a restart ends the
+    stretch of frames whose bytes are compared.
+
+    INSTANCE ATTRIBUTES:
+        _warmup:  [int >= 0] frames left before counting starts again
+        _start:   [int >= 0] the traced bytes at the start of the frame
+        _frames:  [int >= 0] the number of frames counted
+        _over:    [int >= 0] the number of counted frames that took more than
+                  ALLOC_SCRATCH bytes
+        _worst:   [int >= 0] the most bytes a single counted frame took
+        _base:    [int or None] the traced bytes as the first counted frame
+                  since the last restart started, None before it
+        _end:     [int >= 0] the traced bytes at the end of the last frame
+        _kept:    [int] the bytes kept by the stretches of counted frames
+                  before the last restart, added up
+    """
+
+    def __init__(self):
+        """
+        Initializes an AllocationCounter that starts warming up.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._frames = 0
+        self._over = 0
+        self._worst = 0
+        self._kept = 0
+        self._start = tracemalloc.get_traced_memory()[0]
+        self._end = self._start
+        self._base = None
+        self.restart()
+
+    def restart(self):
+        """
+        Starts a new warm-up, e.g. because a new wave was just built.
+
+        Frames counted so far are kept.
+        """
+        self._kept = self.getKept()
+        self._base = None
+        self._warmup = ALLOC_WARMUP
+
+    def beginFrame(self):
+        """
+        Records the traced bytes as a frame starts.
+        """
+        self._start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        if self._warmup == 0 and self._base == None:
+            self._base = self._start
+
+    def endFrame(self):
+        """
+        Records the bytes the frame took, and the traced bytes as it ends.
+        """
+        self._end, peak = tracemalloc.get_traced_memory()
+        if self._warmup > 0:
+            self._warmup -= 1
+        else:
+            taken = peak - self._start
+            self._frames += 1
+            self._worst = max(self._worst, taken)
+            if taken > ALLOC_SCRATCH:
+                self._over += 1
+
+    def getOver(self):
+        """
+        Returns the number of counted frames that took more than ALLOC_SCRATCH
+        bytes.
+        """
+        return self._over
+
+    def getKept(self):
+        """
+        Returns the bytes the counted frames kept, from the start of each
+        stretch of them to its end.
+        """
+        if self._base == None:
+            return self._kept
+        return self._kept + self._end - self._base
+
+    def isPassing(self):
+        """
+        Returns True if no frame took more than ALLOC_SCRATCH bytes after
+        warm-up, and the frames did not keep more than ALLOC_KEPT bytes
+        between them.
+        """
+        return self._over == 0 and self.getKept() <= ALLOC_KEPT
+
+    def report(self):
+        """
+        Returns a one line summary of the bytes the frames took and whether it
+        passed.
+        """
+        return 'alloc frames=%d over=%d worst=%dB/frame scratch=%dB ' \
+        'kept=%dB of %dB %s' % (self._frames, self._over, self._worst,
+        ALLOC_SCRATCH, self.getKept(), ALLOC_KEPT,
+        'PASS' if self.isPassing() else 'FAIL')
+
+
+class LatencyProbe(object):
+    """
+    A class to measure the time from a key press to the frame that shows it.
+
+    Call afterUpdate after every Wave.update, with the snapshot the wave was
+    given, and afterDraw after every draw. A press waits until an update
+    shows its effect; the latency is then counted up to the end of the next
+    draw, when the player can first see it. A press released before it had
+    any effect (moving into the edge of the screen, firing while a bolt is
+    still in the air) is counted as ignored.
+
+    INSTANCE ATTRIBUTES:
+        _moveSince: [float or None] when a move key was pressed that has not
+                    moved the ship yet
+        _fireSince: [float or None] when fire was pressed that has not fired
+                    yet
+        _moveShown: [float or None] the press time of a move the last update
+                    made, waiting for the draw
+        _fireShown: [float or None] the press time of a shot the last update
+                    made, waiting for the draw
+        _lastX:     [float or None] the ship x after the previous update
+        _lastShots: [int >= 0] the wave's shot count after the previous update
+        _moves:     [array of double] move latencies in seconds, a ring of
+                    LATENCY_SAMPLES
+        _fires:     [array of double] fire latencies in seconds, likewise
+        _counts:    [list of int] presses measured: [moves, fires]
+        _ignored:   [int >= 0] presses released with no effect
+        _frames:    [int >= 0] draws since the last report
+    """
+
+    def __init__(self):
+        """
+        Initializes a LatencyProbe with nothing measured.
+        """
+        self._moveSince = None
+        self._fireSince = None
+        self._moveShown = None
+        self._fireShown = None
+        self._lastX = None
+        self._lastShots = 0
+        self._moves = array.array('d', bytes(8*LATENCY_SAMPLES))
+        self._fires = array.array('d', bytes(8*LATENCY_SAMPLES))
+        self._counts = [0, 0]
+        self._ignored = 0
+        self._frames = 0
+
+    def afterUpdate(self, input, wave):
+        """
+        Looks for the effects of pressed keys in the update just played.
+
+        Parameter input: the keys the wave was updated with
+        Precondition: input is an InputSnapshot
+
+        Parameter wave: the wave
+        Precondition: wave is a Wave
+        """
+        if input.isPressed(KEY_LEFT | KEY_RIGHT) and self._moveSince == None:
+            key = KEY_LEFT if input.isPressed(KEY_LEFT) else KEY_RIGHT
+            self._moveSince = input.getPressTime(key)
+        if input.isPressed(KEY_FIRE) and self._fireSince == None:
+            self._fireSince = input.getPressTime(KEY_FIRE)
+        ship = wave.getShip()
+        x = None if ship == None else ship.getShipX()
+        if self._moveSince != None:
+            if x != None and self._lastX != None and x != self._lastX:
+                self._moveShown = self._moveSince
+                self._moveSince = None
+            elif not input.isDown(KEY_LEFT | KEY_RIGHT):
+                self._ignored += 1
+                self._moveSince = None
+        shots = wave.getShotCount()
+        if self._fireSince != None:
+            if shots > self._lastShots:
+                self._fireShown = self._fireSince
+                self._fireSince = None
+            elif not input.isDown(KEY_FIRE):
+                self._ignored += 1
+                self._fireSince = None
+        self._lastX = x
+        self._lastShots = shots
+
+    def afterDraw(self):
+        """
+        Records the latency of every press the frame just drawn shows.
+        """
+        self._frames += 1
+        if self._moveShown == None and self._fireShown == None:
+            return
+        now = time.perf_counter()
+        if self._moveShown != None:
+            self._moves[self._counts[0] % LATENCY_SAMPLES] = \
+            now - self._moveShown
+            self._counts[0] += 1
+            self._moveShown = None
+        if self._fireShown != None:
+            self._fires[self._counts[1] % LATENCY_SAMPLES] = \
+            now - self._fireShown
+            self._counts[1] += 1
+            self._fireShown = None
+
+    def isReportDue(self):
+        """
+        Returns True once REPORT_FRAMES frames were drawn since the last report.
+        """
+        return self._frames >= REPORT_FRAMES
+
+    def report(self):
+        """
+        Returns a one line summary of the latencies measured so far.
+
+        Each kind of press gets its count and the 50th and 95th percentile
+        and the worst of its last LATENCY_SAMPLES latencies.
+        """
+        self._frames = 0
+        line = 'latency'
+        for name, times, count in (('move', self._moves, self._counts[0]),
+        ('fire', self._fires, self._counts[1])):
+            n = min(count, LATENCY_SAMPLES)
+            line += ' %s n=%d' % (name, count)
+            if n > 0:
+                ordered = sorted(times[:n])
+                line += ' p50=%.2fms p95=%.2fms max=%.2fms' % \
+                (ordered[n//2]*1000, ordered[min(n-1, int(n*0.95))]*1000,
+                ordered[-1]*1000)
+        return line + ' ignored=%d' % self._ignored
+
+
+# The name of each governor level in the change log
+SHED_NAMES = {SHED_NONE: 'nothing', SHED_ANIMATION: 'animation',
+              SHED_HUD: 'hud', SHED_DRAW: 'draws', SHED_SOUND: 'sounds'}
+
+
+class FrameGovernor(object):
+    """
+    A class to shed optional work while frames run over budget.
+
+    Update and draw times are kept as moving averages over about
+    GOVERN_WINDOW frames. The draw average only counts real draws, so it
+    stays the cost of a full draw while draws are being skipped. The cost of
+    a frame at the current level is the update time plus the draw time (half
+    of it while every other draw is skipped).
+
+    The governor sheds a level when that cost is over GOVERN_SHED of
+    FRAME_BUDGET, and restores one when the cost with that level restored fits
+    in GOVERN_RESTORE of it. The gap between the two keeps it from flipping
+    back and forth, and so does waiting GOVERN_HOLD frames after every change.
+
+    INSTANCE ATTRIBUTES:
+        _level:   [int] the current level, SHED_NONE to SHED_SOUND
+        _update:  [float >= 0] the average update time in seconds
+        _draw:    [float >= 0] the average time of a real draw in seconds
+        _stamp:   [float or None] the perf_counter value when the current
+                  measurement started, None if nothing is being timed
+        _last:    [float >= 0] the update time of the frame in progress
+        _frames:  [int >= 0] the number of frames recorded
+        _hold:    [int >= 0] frames left before the next change may be made
+        _skip:    [bool] True if the next draw should be skipped
+        _changes: [int >= 0] the number of level changes made
+    """
+
+    def getLevel(self):
+        """
+        Returns the current level (one of the SHED constants).
+        """
+        return self._level
+
+    def getChanges(self):
+        """
+        Returns the number of level changes made so far.
+        """
+        return self._changes
+
+    def __init__(self):
+        """
+        Initializes a FrameGovernor that sheds nothing.
+        """
+        self._level = SHED_NONE
+        self._update = 0.0
+        self._draw = 0.0
+        self._stamp = None
+        self._last = 0.0
+        self._frames = 0
+        self._hold = GOVERN_HOLD
+        self._skip = False
+        self._changes = 0
+
+    def begin(self):
+        """
+        Starts timing update or draw.
+        """
+        self._stamp = time.perf_counter()
+
+    def endUpdate(self):
+        """
+        Stops timing update.
+        """
+        self._last = time.perf_counter() - self._stamp
+        self._stamp = None
+
+    def shouldDraw(self):
+        """
+        Returns True if this frame should be drawn, False to show the last
+        frame again.
+
+        Every other draw is skipped at SHED_DRAW and above.
+        """
+        return not (self._level >= SHED_DRAW and self._skip)
+
+    def endDraw(self, drawn):
+        """
+        Stops timing draw, records the frame and sheds or restores work.
+
+        Parameter drawn: True if the frame was drawn, False if it was skipped
+        Precondition: drawn is a bool
+        """
+        draw = time.perf_counter() - self._stamp
+        self._stamp = None
+        weight = 1/GOVERN_WINDOW
+        if self._frames == 0:
+            self._update = self._last
+        else:
+            self._update += (self._last - self._update)*weight
+        if drawn:
+            if self._draw == 0.0:
+                self._draw = draw
+            else:
+                self._draw += (draw - self._draw)*weight
+        self._skip = drawn
+        self._frames += 1
+        if self._hold > 0:
+            self._hold -= 1
+            return
+        if self._cost(self._level) > GOVERN_SHED*FRAME_BUDGET:
+            if self._level < SHED_SOUND:
+                self._change(self._level + 1, 'shed')
+        elif self._level > SHED_NONE and \
+        self._cost(self._level - 1) <= GOVERN_RESTORE*FRAME_BUDGET:
+            self._change(self._level - 1, 'restored')
+
+    def _cost(self, level):
+        """
+        Returns the average cost of a frame in seconds at a level.
+
+        Parameter level: the level
+        Precondition: level is one of the SHED constants
+        """
+        if level >= SHED_DRAW:
+            return self._update + self._draw/2
+        return self._update + self._draw
+
+    def _change(self, level, verb):
+        """
+        Moves to a new level and prints the change.
+
+        Parameter level: the new level
+        Precondition: level is one of the SHED constants
+
+        Parameter verb: 'shed' or 'restored'
+        Precondition: verb is a string
+        """
+        name = SHED_NAMES[max(level, self._level)]
+        self._level = level
+        self._hold = GOVERN_HOLD
+        self._skip = False
+        self._changes += 1
+        print('governor %s %s level=%d frame=%d update=%.2fms draw=%.2fms '
+        'budget=%.2fms' % (verb, name, level, self._frames,
+        self._update*1000, self._draw*1000, FRAME_BUDGET*1000))
+
+
+class RetainedView(object):
+    """
+    A class to keep a drawn frame so it can be shown again for one call.
+
+    game2d clears the view before every draw, so skipping a draw would leave
+    the screen blank. While a FrameGovernor skips draws, Invaders draws the
+    wave into a RetainedView instead: every object adds its instructions to
+    one InstructionGroup, which is then drawn to the real view. On a skipped
+    frame only that group is drawn again.
+
+    Objects keep their instructions and update them when they move, so a
+    repeated frame shows them where they are now. An object put in play since
+    the last draw shows up at the next one.
+
+    Kivy is imported when the first RetainedView is made.
+
+    INSTANCE ATTRIBUTES:
+        _group: [InstructionGroup] the instructions of the last frame drawn
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty RetainedView.
+        """
+        from kivy.graphics import InstructionGroup
+        self._group = InstructionGroup()
+
+    def draw(self, cmd):
+        """
+        Adds instructions to the frame being drawn (what GObject.draw calls).
+
+        Parameter cmd: the instructions
+        Precondition: cmd is a Kivy Instruction
+        """
+        self._group.add(cmd)
+
+    def isEmpty(self):
+        """
+        Returns True if there is no frame to show again.
+        """
+        return len(self._group.children) == 0
+
+    def clear(self):
+        """
+        Throws away the kept frame.
+        """
+        self._group.clear()
+
+    def show(self, view):
+        """
+        Draws the kept frame to view.
+
+        Parameter view: the game view
+        Precondition: view is a GView
+        """
+        view.draw(self._group)
+
+
+class TimeScale(object):
+    """
+    A class to play the game faster or slower than real time.
+
+    At 1x nothing changes: the wave is updated once a frame with the frame's
+    dt. At any other scale every update is a tick of FRAME_BUDGET seconds,
+    and a frame plays scale*dt/FRAME_BUDGET ticks (carrying fractions to the
+    next frame), so at 0.25x the wave moves on every fourth frame and at 16x
+    it plays sixteen ticks a frame. The ticks of a frame may take
+    TIME_SCALE_SHARE of FRAME_BUDGET; ticks still owed after that are dropped,
+    not carried, so a slow host plays slower instead of falling further and
+    further behind. From TIME_SCALE_SKIP up, draws are skipped as well.
+
+    Call plan at the start of the ticks of a frame, hasTime between ticks, and
+    endTicks with the number played.
+
+    INSTANCE ATTRIBUTES:
+        _scale:   [float] the scale asked for, TIME_SCALE_MIN to TIME_SCALE_MAX
+        _owed:    [float >= 0] the fraction of a tick carried to the next frame
+        _stamp:   [float] the perf_counter value when the ticks of the current
+                  frame started
+        _draws:   [int >= 0] the frames since the last draw
+        _frames:  [int >= 0] the frames played since the last report
+        _ticks:   [int >= 0] the ticks played since the last report
+        _dropped: [int >= 0] the ticks dropped since the last report
+        _played:  [float >= 0] the game seconds played since the last report
+        _elapsed: [float >= 0] the real seconds those frames took (the sum of
+                  their dt)
+    """
+
+    def getScale(self):
+        """
+        Returns the time scale asked for.
+        """
+        return self._scale
+
+    def setScale(self, scale):
+        """
+        Sets the time scale, kept between TIME_SCALE_MIN and TIME_SCALE_MAX.
+
+        The change is printed, and the measurements start over.
+
+        Parameter scale: the new scale
+        Precondition: scale is a number > 0
+        """
+        scale = min(max(scale, TIME_SCALE_MIN), TIME_SCALE_MAX)
+        if scale != self._scale:
+            self._scale = scale
+            print('timescale %gx' % scale)
+        self._owed = 0.0
+        self._restart()
+
+    def isRealTime(self):
+        """
+        Returns True at 1x, where the wave is updated once a frame with dt.
+        """
+        return self._scale == 1
+
+    def isSkipping(self):
+        """
+        Returns True if the scale is high enough to skip draws.
+        """
+        return self._scale >= TIME_SCALE_SKIP
+
+    def __init__(self, scale = 1):
+        """
+        Initializes a TimeScale at the given scale.
+
+        Parameter scale: the scale to start at
+        Precondition: scale is a number in TIME_SCALE_MIN..TIME_SCALE_MAX
+        """
+        self._scale = scale
+        self._owed = 0.0
+        self._stamp = time.perf_counter()
+        self._draws = 0
+        self._restart()
+
+    def faster(self):
+        """
+        Doubles the time scale, up to TIME_SCALE_MAX.
+        """
+        self.setScale(self._scale*2)
+
+    def slower(self):
+        """
+        Halves the time scale, down to TIME_SCALE_MIN.
+        """
+        self.setScale(self._scale/2)
+
+    def plan(self, dt):
+        """
+        Returns the number of ticks to play this frame, away from 1x.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number >= 0
+        """
+        self._stamp = time.perf_counter()
+        self._owed += self._scale*dt/FRAME_BUDGET
+        ticks = int(self._owed)
+        self._owed -= ticks
+        return ticks
+
+    def hasTime(self):
+        """
+        Returns True if the ticks of this frame may go on.
+        """
+        return time.perf_counter() - self._stamp < TIME_SCALE_SHARE*FRAME_BUDGET
+
+    def endTicks(self, planned, played, dt):
+        """
+        Records the ticks of a frame.
+
+        Parameter planned: the ticks plan returned (1 at 1x)
+        Precondition: planned is an int >= 0
+
+        Parameter played: the ticks actually played
+        Precondition: played is an int in 0..planned
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number >= 0
+        """
+        self._frames += 1
+        self._elapsed += dt
+        self._ticks += played
+        self._dropped += planned - played
+        if self.isRealTime():
+            self._played += dt*played
+        else:
+            self._played += FRAME_BUDGET*played
+
+    def shouldDraw(self):
+        """
+        Returns True if this frame should be drawn, False to show the last
+        frame again.
+
+        Below TIME_SCALE_SKIP every frame is drawn. From there one frame in
+        scale//TIME_SCALE_SKIP + 1 is drawn, so the time of the draws goes to
+        the ticks instead.
+        """
+        self._draws += 1
+        if self._draws > self._scale//TIME_SCALE_SKIP:
+            self._draws = 0
+            return True
+        return False
+
+    def getAchieved(self):
+        """
+        Returns the time scale achieved since the last report.
+
+        This is game time over real time, counting only the frames of play.
+        """
+        if self._elapsed == 0:
+            return 0.0
+        return self._played/self._elapsed
+
+    def isKeepingUp(self):
+        """
+        Returns True if the scale achieved is within TIME_SCALE_PASS of the
+        scale asked for.
+        """
+        return self.getAchieved() >= TIME_SCALE_PASS*self._scale
+
+    def isReportDue(self):
+        """
+        Returns True once REPORT_FRAMES frames were played since the last
+        report.
+        """
+        return self._frames >= REPORT_FRAMES
+
+    def report(self):
+        """
+        Returns a one line summary of the scale achieved since the last report.
+        """
+        achieved = self.getAchieved()
+        status = 'KEEPING UP' if self.isKeepingUp() else 'FALLING BEHIND'
+        line = 'timescale asked=%gx achieved=%.2fx ticks/frame=%.1f ' \
+        'dropped=%d %s' % (self._scale, achieved,
+        self._ticks/max(self._frames, 1), self._dropped, status)
+        self._restart()
+        return line
+
+    def _restart(self):
+        """
+        Starts the measurements for the next report.
+        """
+        self._frames = 0
+        self._ticks = 0
+        self._dropped = 0
+        self._played = 0.0
+        self._elapsed = 0.0
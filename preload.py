@@ -0,0 +1,371 @@
+"""
+Asset preloader for Alien Invaders
+
+This module reads the game's images, sounds and font on a background thread
+while the welcome screen is showing, so the first wave does not stall on file
+I/O. Reading a file only brings it into the OS file cache: game2d decodes each
+image itself when a GImage or GSprite is made, and Kivy audio opens and
+decodes each sound itself, so nothing decoded here would ever reach them.
+Sounds are then loaded on the main thread, which is what Preloader.install
+does once the thread is done. Invaders builds the first wave only after that.
+The thread never touches Kivy.
+
+The offscreen renderer (raster.py) draws from pixels rather than textures, and
+decodes its images through Preloader.loadImage. Decoded images are kept in a
+versioned cache on disk (CACHE_DIR). Every cache file records the SHA-1 of the
+source file it was decoded from, so an edited image is decoded again and a
+warm start reads raw pixels without decoding anything. The decoder only
+handles what the game ships: 8-bit, non-interlaced PNG.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from models import loadSound
+import hashlib
+import os
+import struct
+import threading
+import zlib
+
+
+# The header of a cache file: magic, version, source SHA-1, kind ('I' for an
+# image), then width, height and channels
+_HEADER = struct.Struct('<4sI20sc3I')
+_MAGIC = b'AINV'
+
+
+class Asset(object):
+    """
+    A class to represent one decoded image.
+
+    INSTANCE ATTRIBUTES:
+        name:   [str] the file name, e.g. 'ship.png'
+        kind:   [str] 'I', for an image
+        shape:  [tuple of 3 int] (width, height, channels)
+        data:   [bytes] image rows bottom first
+    """
+
+    def __init__(self, name, kind, shape, data):
+        """
+        Initializes a decoded Asset.
+
+        Parameter name: the file name
+        Precondition: name is a string
+
+        Parameter kind: the kind of asset
+        Precondition: kind is 'I'
+
+        Parameter shape: the dimensions of the data (see class docstring)
+        Precondition: shape is a tuple of 3 ints
+
+        Parameter data: the decoded bytes
+        Precondition: data is a bytes object
+        """
+        self.name = name
+        self.kind = kind
+        self.shape = shape
+        self.data = data
+
+
+class Preloader(object):
+    """
+    A class to read the game assets in the background, and to decode images
+    for the offscreen renderer.
+
+    INSTANCE ATTRIBUTES:
+        _cachedir:  [str] the folder of cache files
+        _assets:    [dict of str to Asset] the decoded assets by file name
+        _hits:      [int >= 0] the number of assets read from the cache
+        _errors:    [list of str] assets that could not be decoded, and why
+        _thread:    [Thread or None] the decoding thread, None until start
+        _installed: [bool] True once install has run
+    """
+
+    def getHits(self):
+        """
+        Returns the number of assets read from the cache instead of decoded.
+        """
+        return self._hits
+
+    def getErrors(self):
+        """
+        Returns a list of messages for the assets that could not be decoded.
+        """
+        return self._errors
+
+    def getAsset(self, name):
+        """
+        Returns the decoded Asset for the file name, or None.
+
+        Parameter name: the file name
+        Precondition: name is a string
+        """
+        return self._assets.get(name)
+
+    def loadImage(self, name):
+        """
+        Returns the decoded Asset for an image in Images, or None.
+
+        This decodes on the caller's thread, through the disk cache. If the
+        image cannot be read, the reason is added to getErrors.
+
+        Parameter name: the file name
+        Precondition: name is a string
+        """
+        if not name in self._assets:
+            try:
+                self._load(name)
+            except (OSError, ValueError, zlib.error, struct.error) as e:
+                self._errors.append('%s: %s' % (name, e))
+                return None
+        return self._assets[name]
+
+    def __init__(self, cachedir = CACHE_DIR):
+        """
+        Initializes a Preloader that has not started yet.
+
+        Parameter cachedir: the folder of cache files
+        Precondition: cachedir is a string
+        """
+        self._cachedir = cachedir
+        self._assets = {}
+        self._hits = 0
+        self._errors = []
+        self._thread = None
+        self._installed = False
+
+    def start(self):
+        """
+        Starts reading every image, sound and the font on a background thread.
+        """
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def isDone(self):
+        """
+        Returns True if the background thread has finished.
+        """
+        return self._thread != None and not self._thread.is_alive()
+
+    def finish(self):
+        """
+        Waits for the background thread (if any) and installs the sounds.
+        """
+        if self._thread != None:
+            self._thread.join()
+        self.install()
+
+    def install(self):
+        """
+        Loads the sounds into the shared Sounds used by the models, on the
+        main thread.
+
+        Kivy audio always opens the file itself, but it is in the OS file
+        cache by now. Images need nothing: game2d loads them from the file
+        the thread already read.
+        """
+        if self._installed:
+            return
+        self._installed = True
+        for name in GAME_SOUNDS:
+            loadSound(name)
+
+    def _run(self):
+        """
+        Reads every image and sound and the font, to warm the OS file cache.
+        Runs on the thread.
+        """
+        files = [('Images', name) for name in ('ship.png',)+ALIEN_IMAGES]
+        files += [('Sounds', name) for name in GAME_SOUNDS]
+        for folder, name in files + [('Fonts', GAME_FONT)]:
+            try:
+                with open(os.path.join(os.path.dirname(os.path.abspath(
+                __file__)), folder, name), 'rb') as file:
+                    file.read()
+            except OSError as e:
+                self._errors.append('%s: %s' % (name, e))
+
+    def _load(self, name):
+        """
+        Loads one image from the cache, or decodes it and caches the result.
+
+        Parameter name: the file name
+        Precondition: name is the name of a file in Images
+        """
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        'Images', name)
+        with open(path, 'rb') as file:
+            raw = file.read()
+        digest = hashlib.sha1(raw).digest()
+        cached = os.path.join(self._cachedir, 'v%d' % CACHE_VERSION,
+        name + '.bin')
+        asset = self._readCache(cached, name, digest)
+        if asset != None:
+            self._hits += 1
+        else:
+            shape, data = decodePNG(raw)
+            asset = Asset(name, 'I', shape, data)
+            self._writeCache(cached, asset, digest)
+        self._assets[name] = asset
+
+    def _readCache(self, path, name, digest):
+        """
+        Returns the cached Asset at path, or None if it is missing or stale.
+
+        Parameter path: the cache file
+        Precondition: path is a string
+
+        Parameter name: the file name of the asset
+        Precondition: name is a string
+
+        Parameter digest: the SHA-1 of the current source file
+        Precondition: digest is 20 bytes
+        """
+        try:
+            with open(path, 'rb') as file:
+                blob = file.read()
+        except OSError:
+            return None
+        if len(blob) < _HEADER.size:
+            return None
+        magic, version, source, kind, a, b, c = _HEADER.unpack_from(blob)
+        if magic != _MAGIC or version != CACHE_VERSION or source != digest \
+        or kind != b'I':
+            return None
+        return Asset(name, kind.decode(), (a, b, c), blob[_HEADER.size:])
+
+    def _writeCache(self, path, asset, digest):
+        """
+        Writes asset to the cache file at path (best effort).
+
+        The file is written under a temporary name and renamed, so a crash
+        never leaves half a cache file behind.
+
+        Parameter path: the cache file
+        Precondition: path is a string
+
+        Parameter asset: the decoded asset
+        Precondition: asset is an Asset
+
+        Parameter digest: the SHA-1 of the source file
+        Precondition: digest is 20 bytes
+        """
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            temp = path + '.tmp'
+            with open(temp, 'wb') as file:
+                file.write(_HEADER.pack(_MAGIC, CACHE_VERSION, digest,
+                asset.kind.encode(), *asset.shape))
+                file.write(asset.data)
+            os.replace(temp, path)
+        except OSError as e:
+            self._errors.append('%s: cache not written (%s)' % (asset.name, e))
+
+
+# DECODERS FOR THE FILE FORMATS THE GAME SHIPS
+def decodePNG(raw):
+    """
+    Returns ((width, height, channels), pixels) for an 8-bit PNG.
+
+    The pixels are RGB or RGBA rows, bottom row first (the order Kivy textures
+    use). Palette images are expanded to RGBA.
+
+    Parameter raw: the contents of a PNG file
+    Precondition: raw is a bytes object
+
+    Raises ValueError if raw is not a PNG the decoder handles.
+    """
+    if raw[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError('not a PNG file')
+    pos = 8
+    width = None
+    idat = []
+    palette = None
+    alpha = b''
+    while pos < len(raw):
+        length, tag = struct.unpack_from('>I4s', raw, pos)
+        body = raw[pos+8:pos+8+length]
+        pos += 12 + length
+        if tag == b'IHDR':
+            width, height, depth, ctype, comp, filt, lace = \
+            struct.unpack('>IIBBBBB', body)
+        elif tag == b'PLTE':
+            palette = body
+        elif tag == b'tRNS':
+            alpha = body
+        elif tag == b'IDAT':
+            idat.append(body)
+        elif tag == b'IEND':
+            break
+    if width == None:
+        raise ValueError('no IHDR chunk')
+    if depth != 8 or lace != 0 or not ctype in (2, 3, 6):
+        raise ValueError('unsupported PNG (depth %d, color type %d)' %
+        (depth, ctype))
+    channels = {2: 3, 3: 1, 6: 4}[ctype]
+    stride = width*channels
+    data = zlib.decompress(b''.join(idat))
+    rows = []
+    prior = bytearray(stride)
+    for y in range(height):
+        start = y*(stride+1)
+        row = _unfilter(data[start], bytearray(data[start+1:start+1+stride]),
+        prior, channels)
+        rows.append(row)
+        prior = row
+    if ctype == 3:
+        table = []
+        for i in range(256):
+            rgb = palette[i*3:i*3+3] if i*3 < len(palette) else b'\0\0\0'
+            table.append(rgb + (alpha[i:i+1] if i < len(alpha) else b'\xff'))
+        rows = [b''.join(table[i] for i in row) for row in rows]
+        channels = 4
+    rows.reverse()
+    return ((width, height, channels), b''.join(bytes(r) for r in rows))
+
+
+def _unfilter(kind, row, prior, bpp):
+    """
+    Returns row with PNG filter kind undone (in place).
+
+    Parameter kind: the PNG filter type
+    Precondition: kind is an int in 0..4
+
+    Parameter row: the filtered row
+    Precondition: row is a bytearray
+
+    Parameter prior: the unfiltered row above (all zero for the first row)
+    Precondition: prior is a bytearray the same length as row
+
+    Parameter bpp: the number of bytes per pixel
+    Precondition: bpp is an int >= 1
+    """
+    if kind == 1:
+        for i in range(bpp, len(row)):
+            row[i] = (row[i] + row[i-bpp]) & 0xFF
+    elif kind == 2:
+        for i in range(len(row)):
+            row[i] = (row[i] + prior[i]) & 0xFF
+    elif kind == 3:
+        for i in range(len(row)):
+            left = row[i-bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prior[i]) >> 1)) & 0xFF
+    elif kind == 4:
+        for i in range(len(row)):
+            a = row[i-bpp] if i >= bpp else 0
+            b = prior[i]
+            c = prior[i-bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p-a), abs(p-b), abs(p-c)
+            if pa <= pb and pa <= pc:
+                pred = a
+            elif pb <= pc:
+                pred = b
+            else:
+                pred = c
+            row[i] = (row[i] + pred) & 0xFF
+    elif kind != 0:
+        raise ValueError('bad PNG filter %d' % kind)
+    return row
+
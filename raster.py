@@ -0,0 +1,697 @@
+"""
+Offscreen renderer for Alien Invaders
+
+This module draws what Invaders.draw and Wave.draw show (the background, the
+defense line, the bunkers, the ship, the aliens at their current animation
+frame, the bolts and the score) into a NumPy RGB frame buffer, without a
+window, and writes the frames out as an image sequence or a raw video stream.
+For example
+
+    python invaders --bench 3600 --record clip.rgb
+    python invaders --bench 600 --mode endless --record frames/%05d.png
+    python invaders --bench 3600 --record - | ffmpeg -f rawvideo \\
+        -pix_fmt rgb24 -s 800x700 -r 60 -i - clip.mp4
+
+Every sprite is decoded once (through the Preloader cache), scaled to the size
+it is drawn at and turned into a stamp: the row and column offsets of its
+opaque pixels and their colors. Drawing the whole formation is then one NumPy
+scatter of every living alien of a type times every pixel of its stamp, and
+the same goes for the bolts, so the cost of a frame depends on the pixels
+covered and not on the number of objects. Pixels are either opaque or not
+(alpha is tested against 128, not blended), and the explosions are left out,
+as they are in every headless run.
+
+A recording is one process drawing one game as fast as it can, so a batch of
+sessions is exported in parallel by running one process per session.
+
+NumPy is imported the first time a renderer is made (see FrameRenderer.create),
+so importing this module costs nothing. Kivy is never imported.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from preload import Preloader
+import struct
+import sys
+import time
+import zlib
+
+# NumPy, imported by FrameRenderer.create (None until then, or if missing)
+np = None
+
+# The colors of the game2d color names the models use
+_COLORS = {'black': (0, 0, 0), 'green': (0, 255, 0), 'red': (255, 0, 0)}
+# The color of the defense line
+_LINE_COLOR = (127, 127, 127)
+# The color of the bunkers
+_BUNKER_COLOR = tuple([int(255*c) for c in BUNKER_COLOR[:3]])
+# The colors drawn for an image that could not be loaded, by file name
+_MISSING = {'ship.png': (200, 200, 255), ALIEN_IMAGES[0]: (255, 160, 40),
+            ALIEN_IMAGES[1]: (80, 255, 80), ALIEN_IMAGES[2]: (255, 80, 255)}
+
+# A 5x7 bitmap of each character the score uses, top row first
+_GLYPHS = {
+    '0': ('01110', '10001', '10011', '10101', '11001', '10001', '01110'),
+    '1': ('00100', '01100', '00100', '00100', '00100', '00100', '01110'),
+    '2': ('01110', '10001', '00001', '00010', '00100', '01000', '11111'),
+    '3': ('11110', '00001', '00001', '01110', '00001', '00001', '11110'),
+    '4': ('00010', '00110', '01010', '10010', '11111', '00010', '00010'),
+    '5': ('11111', '10000', '11110', '00001', '00001', '10001', '01110'),
+    '6': ('00110', '01000', '10000', '11110', '10001', '10001', '01110'),
+    '7': ('11111', '00001', '00010', '00100', '01000', '01000', '01000'),
+    '8': ('01110', '10001', '10001', '01110', '10001', '10001', '01110'),
+    '9': ('01110', '10001', '10001', '01111', '00001', '00010', '01100'),
+    'S': ('01111', '10000', '10000', '01110', '00001', '00001', '11110'),
+    'c': ('00000', '00000', '01110', '10000', '10000', '10001', '01110'),
+    'o': ('00000', '00000', '01110', '10001', '10001', '10001', '01110'),
+    'r': ('00000', '00000', '10110', '11001', '10000', '10000', '10000'),
+    'e': ('00000', '00000', '01110', '10001', '11111', '10000', '01110'),
+    ':': ('00000', '01100', '01100', '00000', '01100', '01100', '00000'),
+    ' ': ('00000',)*7,
+}
+
+
+class FrameRenderer(object):
+    """
+    A class to draw a Wave into an RGB frame buffer.
+
+    The renderer is also an observer of the wave it last drew (see
+    Wave.addObserver), so it keeps its own map of the living aliens instead of
+    walking the formation every frame.
+
+    INSTANCE ATTRIBUTES:
+        _width:   [int > 0] the width of a frame in pixels
+        _height:  [int > 0] the height of a frame in pixels
+        _frame:   [uint8 array (_height, _width, 3)] the frame buffer, top row
+                  first
+        _pixels:  [array (_height*_width,) of 3-byte void] _frame, one item
+                  per pixel, so a scatter moves one item and not three bytes
+        _background: [uint8 array like _frame] the background and defense
+                  line, copied into _frame to start every render
+        _images:  [dict of str to list] the frames of each image, as uint8
+                  RGBA arrays top row first (None if the image is missing)
+        _stamps:  [dict of tuple to tuple] the stamp of each image frame at
+                  each size, by (name, frame, width, height)
+        _text:    [dict of str to tuple] the stamp of each score character
+        _glyphSize: [tuple of 2 int] the advance and height of a character
+        _score:   [tuple or None] the score last drawn and the stamp of its
+                  text, None before the first render
+        _bunkers: [dict of Bunker to tuple] the rows of each bunker last drawn
+                  and the centers of its standing cells
+        _wave:    [Wave or None] the wave being watched
+        _alive:   [bool array] for each alien of the formation of _wave, True
+                  if it is alive (False until it is built)
+        _built:   [int >= 0] the number of aliens of _wave built so far
+        _rows:    [int array] the row of each alien of the formation
+        _cols:    [int array] the column of each alien of the formation
+        _kinds:   [list of bool array] for each alien image, which aliens of
+                  the formation have it
+        _loader:  [Preloader] decodes the images
+    """
+
+    @classmethod
+    def create(cls, width = GAME_WIDTH, height = GAME_HEIGHT):
+        """
+        Returns a new FrameRenderer, or None if NumPy is not installed.
+
+        Parameter width: the width of a frame in pixels
+        Precondition: width is an int > 0
+
+        Parameter height: the height of a frame in pixels
+        Precondition: height is an int > 0
+        """
+        global np
+        if np is None:
+            try:
+                import numpy as np
+            except ImportError:
+                return None
+        return cls(width, height)
+
+    def getFrame(self):
+        """
+        Returns the frame buffer: a uint8 array (height, width, 3), top row
+        first. It is drawn over by the next render.
+        """
+        return self._frame
+
+    def getErrors(self):
+        """
+        Returns a list of messages for the images that could not be loaded.
+        """
+        return self._loader.getErrors()
+
+    def __init__(self, width = GAME_WIDTH, height = GAME_HEIGHT):
+        """
+        Initializes a FrameRenderer and decodes the game's images.
+
+        Use create instead, which imports NumPy first.
+
+        Parameter width: the width of a frame in pixels
+        Precondition: width is an int > 0
+
+        Parameter height: the height of a frame in pixels
+        Precondition: height is an int > 0
+        """
+        self._width = width
+        self._height = height
+        self._frame = np.zeros((height, width, 3), np.uint8)
+        self._pixels = self._frame.reshape(-1).view(np.dtype((np.void, 3)))
+        self._background = np.zeros((height, width, 3), np.uint8)
+        self._background[:] = _COLORS['black']
+        line = height - 1 - int(DEFENSE_LINE)
+        if 0 <= line < height:
+            self._background[line] = _LINE_COLOR
+        self._loader = Preloader()
+        self._images = {}
+        self._loadImage('ship.png', 1, 1)
+        for name in ALIEN_IMAGES:
+            self._loadImage(name, 3, 2)
+        self._stamps = {}
+        self._text = {}
+        scale = max(1, SCORE_SIZE//12)
+        for char, bitmap in _GLYPHS.items():
+            cells = np.array([[bit == '1' for bit in row] for row in bitmap])
+            cells = cells.repeat(scale, 0).repeat(scale, 1)
+            dy, dx = np.nonzero(cells)
+            self._text[char] = (dy, dx, _packed(np.full((len(dy), 3), 255)))
+        self._glyphSize = (6*scale, 7*scale)
+        self._score = None
+        self._bunkers = {}
+        self._wave = None
+        self._alive = np.zeros(0, bool)
+        self._built = 0
+        self._rows = self._cols = np.zeros(0, int)
+        self._kinds = []
+
+    def render(self, wave):
+        """
+        Draws wave into the frame buffer and returns the buffer.
+
+        Parameter wave: the wave to draw
+        Precondition: wave is a Wave
+        """
+        if wave is not self._wave:
+            self._watch(wave)
+        np.copyto(self._frame, self._background)
+        for bunker in wave.getBunkers():
+            self._drawBunker(bunker)
+        ship = wave.getShip()
+        if ship != None:
+            self._drawImage('ship.png', 0, SHIP_WIDTH, SHIP_HEIGHT,
+            np.array([ship.getShipX()]), np.array([ship.getShipY()]))
+        self._drawAliens(wave)
+        self._drawBolts(wave.getBolts())
+        self._drawScore(wave.getScore())
+        return self._frame
+
+    # OBSERVER METHODS (see Wave.addObserver)
+    def alienKilled(self, row, col):
+        """
+        Marks an alien of the watched wave as dead.
+
+        Parameter row: the row of the alien
+        Precondition: row is an int >= 0
+
+        Parameter col: the column of the alien
+        Precondition: col is an int >= 0
+        """
+        index = self._wave.getFormation().indexOf(row, col)
+        if index >= 0:
+            self._alive[index] = False
+
+    def boltFired(self, bolt):
+        """
+        Does nothing; the bolts are read from the wave when it is drawn.
+
+        Parameter bolt: the bolt put in play
+        Precondition: bolt is a Bolt
+        """
+        pass
+
+    def boltRemoved(self, bolt):
+        """
+        Does nothing; the bolts are read from the wave when it is drawn.
+
+        Parameter bolt: the bolt taken out of play
+        Precondition: bolt is a Bolt
+        """
+        pass
+
+    # HELPER METHODS
+    def _watch(self, wave):
+        """
+        Stops watching the last wave drawn and starts watching wave.
+
+        The cells of the formation are split into rows and columns once here,
+        so a frame only works on the aliens the formation has.
+
+        Parameter wave: the wave to draw from now on
+        Precondition: wave is a Wave
+        """
+        if self._wave != None:
+            self._wave.removeObserver(self)
+        self._wave = wave
+        formation = wave.getFormation()
+        cells = np.array(formation.getCells(), np.int64)
+        kinds = np.frombuffer(formation.getTypes(), np.uint8)
+        self._rows, self._cols = np.divmod(cells, formation.getCols())
+        self._kinds = [kinds == k+1 for k in range(len(ALIEN_IMAGES))]
+        self._alive = np.zeros(len(cells), bool)
+        self._built = 0
+        self._bunkers = {}
+        wave.addObserver(self)
+
+    def _addAliens(self, wave):
+        """
+        Marks the aliens the wave has built since the last frame as alive.
+
+        A wave builds its formation over several frames (see Wave.buildStep),
+        so new aliens can turn up after the renderer started watching.
+
+        Parameter wave: the watched wave
+        Precondition: wave is a Wave
+        """
+        built = len(wave.getAliens())
+        if built > self._built:
+            self._alive[self._built:built] = True
+            self._built = built
+
+    def _drawAliens(self, wave):
+        """
+        Draws every living alien, one scatter per alien image.
+
+        Parameter wave: the watched wave
+        Precondition: wave is a Wave
+        """
+        self._addAliens(wave)
+        if self._built == 0:
+            return
+        originX, originY = wave.getOrigin()
+        pitchX, pitchY = wave.getPitch()
+        width, height = wave.getAlienSize()
+        frame = wave.getAlienFrame()
+        for k in range(len(ALIEN_IMAGES)):
+            alive = np.nonzero(self._alive & self._kinds[k])[0]
+            if len(alive) > 0:
+                self._drawImage(ALIEN_IMAGES[k], frame, width, height,
+                originX + self._cols[alive]*pitchX,
+                originY + self._rows[alive]*pitchY)
+
+    def _drawBolts(self, bolts):
+        """
+        Draws the bolts, one scatter per color.
+
+        Parameter bolts: the bolts in play
+        Precondition: bolts is a list of Bolt
+        """
+        count = len(bolts)
+        if count == 0:
+            return
+        #One list per column converts far faster than a list of tuples
+        xs = np.fromiter([b.x for b in bolts], float, count)
+        ys = np.fromiter([b.y for b in bolts], float, count)
+        player = np.fromiter([b.isPlayerBolt() for b in bolts], bool, count)
+        for mine, color in ((player, 'green'), (~player, 'red')):
+            if mine.any():
+                stamp = self._solidStamp(BOLT_WIDTH, BOLT_HEIGHT,
+                _COLORS[color])
+                self._stamp(stamp, xs[mine], ys[mine], BOLT_WIDTH,
+                BOLT_HEIGHT)
+
+    def _drawBunker(self, bunker):
+        """
+        Draws the cells of a bunker that are still standing.
+
+        Parameter bunker: the bunker
+        Precondition: bunker is a Bunker
+        """
+        masks = tuple(bunker.getRows())
+        cached = self._bunkers.get(bunker)
+        if cached == None or cached[0] != masks:
+            cells = np.array([[(mask >> c) & 1 for c in range(BUNKER_COLS)]
+            for mask in masks], bool)
+            rows, cols = np.nonzero(cells)
+            left = bunker.getX() - BUNKER_COLS*BUNKER_CELL/2
+            bottom = bunker.getY() - BUNKER_ROWS*BUNKER_CELL/2
+            cached = (masks, left + (cols+0.5)*BUNKER_CELL,
+            bottom + (rows+0.5)*BUNKER_CELL)
+            self._bunkers[bunker] = cached
+        if len(cached[1]) > 0:
+            stamp = self._solidStamp(BUNKER_CELL, BUNKER_CELL, _BUNKER_COLOR)
+            self._stamp(stamp, cached[1], cached[2], BUNKER_CELL, BUNKER_CELL)
+
+    def _drawScore(self, score):
+        """
+        Draws the score where ScoreLabel puts it.
+
+        Parameter score: the score
+        Precondition: score is an int >= 0
+        """
+        if self._score == None or self._score[0] != score:
+            text = SCORE_PREFIX + str(score)[-SCORE_DIGITS:]
+            advance = self._glyphSize[0]
+            stamps = [self._text[char] for char in text if char in self._text]
+            offsets = [advance*k for k in range(len(text)) if text[k] in
+            self._text]
+            self._score = (score, np.concatenate([s[0] for s in stamps]),
+            np.concatenate([s[1] + x for s, x in zip(stamps, offsets)]),
+            np.concatenate([s[2] for s in stamps]))
+        top = self._height - int(GAME_HEIGHT - ALIEN_V_SEP - 25 +
+        self._glyphSize[1]/2)
+        self._scatter(self._score[1:], np.array([ALIEN_H_SEP + 20]),
+        np.array([top]))
+
+    def _drawImage(self, name, frame, width, height, xs, ys):
+        """
+        Draws one frame of an image, centered at each of the points.
+
+        Parameter name: the image file
+        Precondition: name is a string loaded in __init__
+
+        Parameter frame: the frame of the image
+        Precondition: frame is an int >= 0
+
+        Parameter width: the width to draw the image at
+        Precondition: width is a number > 0
+
+        Parameter height: the height to draw the image at
+        Precondition: height is a number > 0
+
+        Parameter xs: the horizontal centers
+        Precondition: xs is a NumPy array of numbers
+
+        Parameter ys: the vertical centers, the same length as xs
+        Precondition: ys is a NumPy array of numbers
+        """
+        w = max(1, int(round(width)))
+        h = max(1, int(round(height)))
+        key = (name, frame, w, h)
+        stamp = self._stamps.get(key)
+        if stamp == None:
+            frames = self._images[name]
+            if frames == None:
+                stamp = self._solidStamp(w, h, _MISSING[name])
+            else:
+                stamp = _imageStamp(frames[frame % len(frames)], w, h)
+            self._stamps[key] = stamp
+        self._stamp(stamp, xs, ys, w, h)
+
+    def _solidStamp(self, width, height, color):
+        """
+        Returns the stamp of a filled rectangle.
+
+        Parameter width: the width in pixels
+        Precondition: width is an int > 0
+
+        Parameter height: the height in pixels
+        Precondition: height is an int > 0
+
+        Parameter color: the color
+        Precondition: color is an (r, g, b) tuple of ints in 0..255
+        """
+        key = ('', color, width, height)
+        stamp = self._stamps.get(key)
+        if stamp == None:
+            dy, dx = np.nonzero(np.ones((height, width), bool))
+            stamp = (dy, dx, _packed(np.tile(color, (len(dy), 1))))
+            self._stamps[key] = stamp
+        return stamp
+
+    def _stamp(self, stamp, xs, ys, width, height):
+        """
+        Draws a stamp of the given size centered at each of the points.
+
+        Parameter stamp: the stamp
+        Precondition: stamp is a (dy, dx, colors) tuple (see _packed)
+
+        Parameter xs: the horizontal centers (game coordinates)
+        Precondition: xs is a NumPy array of numbers
+
+        Parameter ys: the vertical centers (game coordinates), the same
+        length as xs
+        Precondition: ys is a NumPy array of numbers
+
+        Parameter width: the width of the stamp in pixels
+        Precondition: width is an int > 0
+
+        Parameter height: the height of the stamp in pixels
+        Precondition: height is an int > 0
+        """
+        lefts = np.rint(xs - width/2).astype(np.intp)
+        tops = self._height - np.rint(ys + height/2).astype(np.intp)
+        self._scatter(stamp, lefts, tops)
+
+    def _scatter(self, stamp, lefts, tops):
+        """
+        Copies a stamp into the frame with its top left corner at each point.
+
+        Pixels that fall outside the frame are dropped.
+
+        Parameter stamp: the stamp
+        Precondition: stamp is a (dy, dx, colors) tuple
+
+        Parameter lefts: the frame columns of the left edges
+        Precondition: lefts is a NumPy array of ints
+
+        Parameter tops: the frame rows of the top edges, the same length as
+        lefts
+        Precondition: tops is a NumPy array of ints
+        """
+        dy, dx, colors = stamp
+        if len(dy) == 0:
+            return
+        #Stamps wholly inside the frame need no clipping, pixel by pixel
+        inside = (lefts >= 0) & (tops >= 0) & \
+        (lefts + dx.max() < self._width) & (tops + dy.max() < self._height)
+        offsets = dy*self._width + dx
+        if inside.all():
+            starts = tops*self._width + lefts
+        else:
+            starts = tops[inside]*self._width + lefts[inside]
+            rows = tops[~inside, None] + dy
+            cols = lefts[~inside, None] + dx
+            keep = (rows >= 0) & (rows < self._height) & (cols >= 0) & \
+            (cols < self._width)
+            self._pixels[(rows*self._width + cols)[keep]] = \
+            colors[np.nonzero(keep)[1]]
+        self._pixels[starts[:, None] + offsets] = colors
+
+    def _loadImage(self, name, rows, cols):
+        """
+        Decodes an image and cuts it into its frames.
+
+        The frames of a strip are numbered left to right, top to bottom, as
+        GSprite numbers them. If the image cannot be loaded, it is drawn as a
+        filled rectangle instead.
+
+        Parameter name: the image file
+        Precondition: name is a string
+
+        Parameter rows: the rows of frames in the image
+        Precondition: rows is an int > 0
+
+        Parameter cols: the columns of frames in the image
+        Precondition: cols is an int > 0
+        """
+        asset = self._loader.loadImage(name)
+        if asset == None:
+            self._images[name] = None
+            return
+        width, height, channels = asset.shape
+        pixels = np.frombuffer(asset.data, np.uint8).reshape(height, width,
+        channels)[::-1]
+        if channels == 3:
+            opaque = np.full((height, width, 1), 255, np.uint8)
+            pixels = np.concatenate((pixels, opaque), 2)
+        fw = width//cols
+        fh = height//rows
+        self._images[name] = [pixels[r*fh:(r+1)*fh, c*fw:(c+1)*fw]
+        for r in range(rows) for c in range(cols)]
+
+
+def _imageStamp(pixels, width, height):
+    """
+    Returns the stamp of an image scaled to width x height.
+
+    The image is scaled by nearest neighbour and only its opaque pixels go in
+    the stamp.
+
+    Parameter pixels: the image
+    Precondition: pixels is a uint8 RGBA array (rows, cols, 4), top row first
+
+    Parameter width: the width to draw at
+    Precondition: width is an int > 0
+
+    Parameter height: the height to draw at
+    Precondition: height is an int > 0
+    """
+    rows = np.arange(height)*pixels.shape[0]//height
+    cols = np.arange(width)*pixels.shape[1]//width
+    scaled = pixels[rows][:, cols]
+    dy, dx = np.nonzero(scaled[:, :, 3] >= 128)
+    return (dy, dx, _packed(scaled[dy, dx, :3]))
+
+
+def _packed(colors):
+    """
+    Returns colors as a 1-D array of 3-byte items, one per pixel.
+
+    Parameter colors: the colors
+    Precondition: colors is an array (n, 3) of ints in 0..255
+    """
+    colors = np.ascontiguousarray(colors, np.uint8)
+    return colors.view(np.dtype((np.void, 3))).reshape(-1)
+
+
+class FrameRecorder(object):
+    """
+    A class to render a game frame by frame and write the frames out.
+
+    Where the frames go depends on the path:
+
+        -               a raw RGB24 stream on standard output
+        name%05d.png    one PNG file per frame (% is the frame number)
+        name%05d.ppm    one binary PPM file per frame
+        anything else   a raw RGB24 stream in that file
+
+    A raw stream is width x height x 3 bytes per frame, top row first, with no
+    header, which is what ffmpeg reads with -f rawvideo -pix_fmt rgb24.
+
+    INSTANCE ATTRIBUTES:
+        _path:     [str] where the frames go
+        _renderer: [FrameRenderer] draws the frames
+        _stream:   [binary file or None] the raw stream (None for an image
+                   sequence)
+        _frames:   [int >= 0] the frames written
+        _rendered: [int >= 0] the frames rendered (a repeated frame is
+                   written but not rendered)
+        _bytes:    [int >= 0] the bytes written
+        _render:   [float >= 0] the seconds spent drawing
+        _write:    [float >= 0] the seconds spent encoding and writing
+    """
+
+    def getFrames(self):
+        """
+        Returns the number of frames written.
+        """
+        return self._frames
+
+    def __init__(self, path, renderer):
+        """
+        Initializes a FrameRecorder writing to path.
+
+        Parameter path: where the frames go (see the class docstring)
+        Precondition: path is a string
+
+        Parameter renderer: draws the frames
+        Precondition: renderer is a FrameRenderer
+        """
+        self._path = path
+        self._renderer = renderer
+        self._stream = None
+        if path == '-':
+            self._stream = sys.stdout.buffer
+        elif not '%' in path:
+            self._stream = open(path, 'wb')
+        self._frames = 0
+        self._rendered = 0
+        self._bytes = 0
+        self._render = 0.0
+        self._write = 0.0
+
+    def record(self, wave):
+        """
+        Renders wave and writes the frame.
+
+        Parameter wave: the wave to draw
+        Precondition: wave is a Wave
+        """
+        start = time.perf_counter()
+        self._renderer.render(wave)
+        self._render += time.perf_counter() - start
+        self._rendered += 1
+        self._writeFrame()
+
+    def repeat(self):
+        """
+        Writes the last frame rendered again, e.g. for a skipped draw (see
+        FrameGovernor), so the recording keeps one frame per tick.
+        """
+        self._writeFrame()
+
+    def _writeFrame(self):
+        """
+        Writes the frame buffer of the renderer.
+        """
+        start = time.perf_counter()
+        frame = self._renderer.getFrame()
+        if self._stream != None:
+            self._stream.write(frame.data)
+            self._bytes += frame.nbytes
+        else:
+            name = self._path % self._frames
+            if name.lower().endswith('.png'):
+                blob = encodePNG(frame)
+            else:
+                blob = b'P6 %d %d 255\n' % (frame.shape[1], frame.shape[0]) \
+                + frame.tobytes()
+            with open(name, 'wb') as file:
+                file.write(blob)
+            self._bytes += len(blob)
+        self._frames += 1
+        self._write += time.perf_counter() - start
+
+    def close(self):
+        """
+        Flushes the stream, and closes it if it is a file.
+        """
+        if self._stream != None:
+            self._stream.flush()
+            if self._path != '-':
+                self._stream.close()
+            self._stream = None
+
+    def report(self):
+        """
+        Returns a one-line summary of the frames and the rendering speed.
+        """
+        total = self._render + self._write
+        fps = self._frames/total if total > 0 else 0.0
+        render = self._rendered/self._render if self._render > 0 else 0.0
+        return 'record frames=%d fps=%.0f (render %.0f) realtime=%.1fx ' \
+        'MB=%.1f file=%s' % (self._frames, fps, render, fps*FRAME_BUDGET,
+        self._bytes/1e6, self._path)
+
+
+def encodePNG(frame):
+    """
+    Returns the bytes of an 8-bit RGB PNG file of a frame.
+
+    Rows are stored unfiltered and compressed at zlib level 1, which favors
+    speed over size.
+
+    Parameter frame: the frame
+    Precondition: frame is a uint8 array (height, width, 3), top row first
+    """
+    height, width = frame.shape[:2]
+    rows = np.zeros((height, width*3 + 1), np.uint8)
+    rows[:, 1:] = frame.reshape(height, -1)
+    return b'\x89PNG\r\n\x1a\n' + \
+    _chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) + \
+    _chunk(b'IDAT', zlib.compress(rows.tobytes(), 1)) + _chunk(b'IEND', b'')
+
+
+def _chunk(tag, body):
+    """
+    Returns a PNG chunk: length, tag, body and CRC.
+
+    Parameter tag: the chunk type
+    Precondition: tag is 4 bytes
+
+    Parameter body: the chunk data
+    Precondition: body is a bytes object
+    """
+    return struct.pack('>I', len(body)) + tag + body + \
+    struct.pack('>I', zlib.crc32(tag + body))
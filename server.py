@@ -0,0 +1,679 @@
+"""
+Multi-session game server for Alien Invaders
+
+This module hosts many headless Waves in one process, for bots to play
+against. One asyncio event loop does everything: it accepts TCP connections,
+reads input frames and runs a single tick scheduler. For example
+
+    python invaders --serve 5000
+    python invaders --serve 0 --bots 1000 --bench 600
+
+The first runs a server on port 5000. The second runs a server on a free port
+and plays 1000 scripted bot sessions against it over localhost for 600
+frames, as a self-test. With --leaderboard FILE, every session that ends is
+recorded on the leaderboard (see leaderboard.py), in the background.
+
+The protocol is fixed-size little-endian messages. A client sends
+
+    REQUEST = '<BIB'    kind, session id, keys (a packKeys bitmask)
+
+where kind is one of MSG_OPEN, MSG_INPUT, MSG_SHIP or MSG_CLOSE. Session ids
+are chosen by the client and are private to its connection. The server
+answers every OPEN and every tick with
+
+    REPLY = '<BIIiBbBI' kind, session id, tick, score, lives, result,
+                        ship alive, tick lag in microseconds
+
+(kind MSG_STATE, or MSG_ERROR for an unknown session or a bad request).
+
+Every input frame is one tick of its session, so a bot sets its own pace. The
+scheduler runs every FRAME_BUDGET seconds and ticks each session that has an
+input frame waiting, one frame per session per pass. A session with no input
+waiting is idle: it is not in the scheduler's active set, and it costs
+nothing until its next frame arrives. The lag of a tick is the time its input
+frame waited. The server prints a lag report every REPORT_FRAMES passes,
+including the sessions that lag the most.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+import asyncio
+import collections
+import struct
+import time
+
+
+# The kinds of message
+MSG_OPEN  = 1     # request: start a session with this id
+MSG_INPUT = 2     # request: the keys for the next tick of a session
+MSG_SHIP  = 3     # request: give the session a new ship (see Wave.setShip)
+MSG_CLOSE = 4     # request: end the session
+MSG_STATE = 5     # reply: the state of a session after a tick (or an OPEN)
+MSG_ERROR = 6     # reply: the request named an unknown session, or was bad
+
+# The message layouts (see the module docstring)
+REQUEST = struct.Struct('<BIB')
+REPLY = struct.Struct('<BIIiBbBI')
+
+
+class Session(object):
+    """
+    A class to represent one game hosted by the server.
+
+    INSTANCE ATTRIBUTES:
+        _wave:    [Wave] the game
+        _input:   [InputSnapshot] the keys of the tick being played
+        _frames:  [deque of (int, float)] input frames waiting, as (keys,
+                  perf_counter value when the frame arrived)
+        _tick:    [int >= 0] the number of ticks played
+        _lag:     [float >= 0] the lag of the last tick, in seconds
+        _lagSum:  [float >= 0] the total lag of all ticks, in seconds
+        _lagMax:  [float >= 0] the worst lag of any tick, in seconds
+    """
+
+    def getTick(self):
+        """
+        Returns the number of ticks played.
+        """
+        return self._tick
+
+    def getMeanLag(self):
+        """
+        Returns the mean tick lag in seconds, or 0.0 before the first tick.
+        """
+        return self._lagSum/self._tick if self._tick > 0 else 0.0
+
+    def getMaxLag(self):
+        """
+        Returns the worst tick lag in seconds.
+        """
+        return self._lagMax
+
+    def getScore(self):
+        """
+        Returns the score of the game.
+        """
+        return self._wave.getScore()
+
+    def hasFrames(self):
+        """
+        Returns True if an input frame is waiting.
+        """
+        return len(self._frames) > 0
+
+    def __init__(self):
+        """
+        Initializes a Session with a new classic-sized (first level) wave.
+        """
+        self._wave = Wave(0, 0, waveFormation(0))
+        self._input = InputSnapshot()
+        self._frames = collections.deque()
+        self._tick = 0
+        self._lag = 0.0
+        self._lagSum = 0.0
+        self._lagMax = 0.0
+
+    def addFrame(self, keys, arrived):
+        """
+        Queues an input frame for a later tick.
+
+        Parameter keys: the keys down, as a bitmask from packKeys
+        Precondition: keys is an int >= 0
+
+        Parameter arrived: the perf_counter value when the frame arrived
+        Precondition: arrived is a float
+        """
+        self._frames.append((keys, arrived))
+
+    def newShip(self):
+        """
+        Gives the wave a new ship, if it has lost its ship but not the game.
+        """
+        if self._wave.getShip() == None and self._wave.getLives() > 0 and \
+        self._wave.getResult() == 0:
+            self._wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+
+    def tick(self, now):
+        """
+        Plays the oldest waiting input frame.
+
+        A wave with no ship or with a result does not move, as in Invaders;
+        the frame is still used up, so the bot gets an answer.
+
+        Parameter now: the perf_counter value of this scheduler pass
+        Precondition: now is a float
+        """
+        keys, arrived = self._frames.popleft()
+        if self._wave.getShip() != None and self._wave.getResult() == 0:
+            self._input.setMask(keys)
+            self._wave.update(self._input, FRAME_BUDGET)
+        self._tick += 1
+        self._lag = now - arrived
+        self._lagSum += self._lag
+        self._lagMax = max(self._lagMax, self._lag)
+
+    def reply(self, session_id):
+        """
+        Returns the MSG_STATE reply for this session.
+
+        Parameter session_id: the id the client gave this session
+        Precondition: session_id is an int >= 0
+        """
+        wave = self._wave
+        return REPLY.pack(MSG_STATE, session_id, self._tick, wave.getScore(),
+        wave.getLives(), wave.getResult(), 0 if wave.getShip() == None else 1,
+        min(int(self._lag*1e6), 0xFFFFFFFF))
+
+
+class _Connection(asyncio.Protocol):
+    """
+    A class to represent one client connection to a GameServer.
+
+    INSTANCE ATTRIBUTES:
+        _server:    [GameServer] the server
+        _transport: [Transport or None] the socket, None until connected
+        _buffer:    [bytearray] bytes received but not yet a whole request
+        _sessions:  [dict of int to Session] this client's sessions, by id
+    """
+
+    def __init__(self, server):
+        """
+        Initializes a connection to the given server.
+
+        Parameter server: the server
+        Precondition: server is a GameServer
+        """
+        self._server = server
+        self._transport = None
+        self._buffer = bytearray()
+        self._sessions = {}
+
+    def connection_made(self, transport):
+        """
+        Remembers the socket.
+
+        Parameter transport: the socket
+        Precondition: transport is an asyncio Transport
+        """
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        """
+        Ends every session of this client.
+
+        Parameter exc: the error that closed the socket, or None
+        Precondition: exc is an exception or None
+        """
+        for session_id in list(self._sessions):
+            self._server.recordSession(session_id, self._sessions[session_id])
+            self._server.removeSession(self, session_id)
+        self._sessions.clear()
+        self._server.removeConnection(self)
+        self._transport = None
+
+    def data_received(self, data):
+        """
+        Handles every whole request received so far.
+
+        Parameter data: the bytes received
+        Precondition: data is a bytes object
+        """
+        self._buffer += data
+        size = REQUEST.size
+        whole = len(self._buffer) - len(self._buffer) % size
+        now = time.perf_counter()
+        for start in range(0, whole, size):
+            kind, session_id, keys = REQUEST.unpack_from(self._buffer, start)
+            self._handle(kind, session_id, keys, now)
+        del self._buffer[:whole]
+
+    def send(self, data):
+        """
+        Sends a reply, if the client is still connected.
+
+        Parameter data: the reply
+        Precondition: data is a bytes object
+        """
+        if self._transport != None:
+            self._transport.write(data)
+
+    def getSessions(self):
+        """
+        Returns this client's sessions, as a dict of id to Session.
+        """
+        return self._sessions
+
+    def getSession(self, session_id):
+        """
+        Returns the session with the given id, or None.
+
+        Parameter session_id: the id the client gave the session
+        Precondition: session_id is an int >= 0
+        """
+        return self._sessions.get(session_id)
+
+    def _handle(self, kind, session_id, keys, now):
+        """
+        Handles one request.
+
+        Parameter kind: the kind of request
+        Precondition: kind is an int
+
+        Parameter session_id: the session the request is for
+        Precondition: session_id is an int >= 0
+
+        Parameter keys: the keys down (MSG_INPUT only)
+        Precondition: keys is an int >= 0
+
+        Parameter now: the perf_counter value when the request arrived
+        Precondition: now is a float
+        """
+        session = self._sessions.get(session_id)
+        if kind == MSG_OPEN and session == None:
+            session = Session()
+            self._sessions[session_id] = session
+            self.send(session.reply(session_id))
+        elif session == None:
+            self.send(REPLY.pack(MSG_ERROR, session_id, 0, 0, 0, 0, 0, 0))
+        elif kind == MSG_INPUT:
+            session.addFrame(keys, now)
+            self._server.activate(self, session_id)
+        elif kind == MSG_SHIP:
+            session.newShip()
+        elif kind == MSG_CLOSE:
+            self._server.recordSession(session_id, session)
+            del self._sessions[session_id]
+            self._server.removeSession(self, session_id)
+        else:
+            self.send(REPLY.pack(MSG_ERROR, session_id, 0, 0, 0, 0, 0, 0))
+
+
+class GameServer(object):
+    """
+    A class to represent the server and its tick scheduler.
+
+    INSTANCE ATTRIBUTES:
+        _port:     [int >= 0] the port asked for (0 for any free port)
+        _server:   [asyncio Server or None] the listening socket, None until
+                   start
+        _active:   [dict of (_Connection, int) to None] the sessions with
+                   input waiting, in the order they became active
+        _connections: [set of _Connection] the open connections
+        _scheduler: [asyncio Task or None] the tick scheduler, None until start
+        _passes:   [int >= 0] the number of scheduler passes run
+        _ticks:    [int >= 0] the number of session ticks run
+        _late:     [float >= 0] how far behind its clock the scheduler was at
+                   the last pass, in seconds
+        _running:  [bool] True until stop is called
+        _scores:   [Leaderboard or None] where ended sessions are recorded
+    """
+
+    def getPort(self):
+        """
+        Returns the port the server is listening on.
+        """
+        return self._server.sockets[0].getsockname()[1]
+
+    def getTicks(self):
+        """
+        Returns the number of session ticks run.
+        """
+        return self._ticks
+
+    def __init__(self, port, scores = None):
+        """
+        Initializes a GameServer that will listen on localhost.
+
+        Parameter port: the port, or 0 for any free port
+        Precondition: port is an int >= 0
+
+        Parameter scores: the leaderboard to record ended sessions on
+        Precondition: scores is a Leaderboard or None
+        """
+        self._port = port
+        self._server = None
+        self._active = {}
+        self._connections = set()
+        self._scheduler = None
+        self._passes = 0
+        self._ticks = 0
+        self._late = 0.0
+        self._running = True
+        self._scores = scores
+
+    async def start(self):
+        """
+        Starts listening and starts the tick scheduler.
+        """
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(self._connect, SERVE_HOST,
+        self._port)
+        self._scheduler = loop.create_task(self._schedule())
+
+    async def stop(self):
+        """
+        Stops the scheduler and closes the listening socket.
+        """
+        self._running = False
+        await self._scheduler
+        self._server.close()
+        await self._server.wait_closed()
+
+    def activate(self, connection, session_id):
+        """
+        Marks a session as having input waiting.
+
+        Parameter connection: the connection the session belongs to
+        Precondition: connection is a _Connection
+
+        Parameter session_id: the id the client gave the session
+        Precondition: session_id is an int >= 0
+        """
+        self._active[(connection, session_id)] = None
+
+    def removeSession(self, connection, session_id):
+        """
+        Forgets a session that was closed.
+
+        Parameter connection: the connection the session belonged to
+        Precondition: connection is a _Connection
+
+        Parameter session_id: the id the client gave the session
+        Precondition: session_id is an int >= 0
+        """
+        self._active.pop((connection, session_id), None)
+
+    def recordSession(self, session_id, session):
+        """
+        Records a session that is ending on the leaderboard, if there is one.
+
+        This only queues the result (see Leaderboard.submit), so ending many
+        sessions at once never holds up the scheduler.
+
+        Parameter session_id: the id the client gave the session
+        Precondition: session_id is an int >= 0
+
+        Parameter session: the session
+        Precondition: session is a Session
+        """
+        if self._scores != None and session.getTick() > 0:
+            self._scores.submit('session%d' % session_id, session.getScore(), 0)
+
+    def removeConnection(self, connection):
+        """
+        Forgets a connection that was closed.
+
+        Parameter connection: the connection
+        Precondition: connection is a _Connection
+        """
+        self._connections.discard(connection)
+
+    def lagReport(self):
+        """
+        Returns a summary of the tick lag of the open sessions.
+
+        The summary gives the number of sessions, ticks and scheduler passes,
+        how late the scheduler was, the 50th and 95th percentile of the mean
+        session lag, and the SERVE_WORST sessions with the worst lag.
+        """
+        sessions = []
+        for connection in self._connections:
+            for session_id, session in connection.getSessions().items():
+                if session.getTick() > 0:
+                    sessions.append((session.getMeanLag(),
+                    session.getMaxLag(), session_id))
+        line = 'sessions=%d ticks=%d passes=%d late=%.2fms' % (len(sessions),
+        self._ticks, self._passes, self._late*1000)
+        if not sessions:
+            return line
+        sessions.sort()
+        n = len(sessions)
+        line += ' lag p50=%.2fms p95=%.2fms worst:' % (sessions[n//2][0]*1000,
+        sessions[min(n-1, int(n*0.95))][0]*1000)
+        for mean, worst, session_id in sessions[-SERVE_WORST:][::-1]:
+            line += ' #%d mean=%.2fms max=%.2fms' % (session_id, mean*1000,
+            worst*1000)
+        return line
+
+    def _connect(self):
+        """
+        Returns the protocol for a new connection.
+        """
+        connection = _Connection(self)
+        self._connections.add(connection)
+        return connection
+
+    async def _schedule(self):
+        """
+        Runs a scheduler pass every FRAME_BUDGET seconds until stop.
+
+        A pass ticks each active session once. Sessions with more frames
+        waiting stay active for the next pass; the rest go idle. A pass that
+        runs long pushes the next one back rather than making the scheduler
+        burst to catch up.
+        """
+        deadline = time.perf_counter()
+        while self._running:
+            now = time.perf_counter()
+            self._late = max(0.0, now - deadline)
+            active = self._active
+            self._active = {}
+            for connection, session_id in active:
+                session = connection.getSession(session_id)
+                if session == None:
+                    continue
+                session.tick(now)
+                self._ticks += 1
+                connection.send(session.reply(session_id))
+                if session.hasFrames():
+                    self._active[(connection, session_id)] = None
+            self._passes += 1
+            if self._passes % REPORT_FRAMES == 0:
+                print(self.lagReport())
+            deadline = max(deadline + FRAME_BUDGET,
+            time.perf_counter() - FRAME_BUDGET)
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+
+
+class BotClient(asyncio.Protocol):
+    """
+    A class to represent a localhost client that plays scripted sessions.
+
+    Every frame it sends one input frame (from bench.scriptKeys) to each of
+    its sessions, then waits until every session has answered. A session that
+    has lost its ship asks for a new one.
+
+    INSTANCE ATTRIBUTES:
+        _transport: [Transport or None] the socket, None until connected
+        _buffer:    [bytearray] bytes received but not yet a whole reply
+        _states:    [dict of int to tuple] the last reply of each session
+        _waiting:   [int >= 0] replies still expected this frame
+        _done:      [asyncio.Future or None] set when _waiting reaches 0
+        _errors:    [int >= 0] the number of MSG_ERROR replies
+    """
+
+    def getStates(self):
+        """
+        Returns the last reply of each session, as a dict of id to
+        (kind, id, tick, score, lives, result, ship, lag in microseconds).
+        """
+        return self._states
+
+    def getErrors(self):
+        """
+        Returns the number of MSG_ERROR replies received.
+        """
+        return self._errors
+
+    def __init__(self):
+        """
+        Initializes a BotClient with no sessions.
+        """
+        self._transport = None
+        self._buffer = bytearray()
+        self._states = {}
+        self._waiting = 0
+        self._done = None
+        self._errors = 0
+
+    def connection_made(self, transport):
+        """
+        Remembers the socket.
+
+        Parameter transport: the socket
+        Precondition: transport is an asyncio Transport
+        """
+        self._transport = transport
+
+    def data_received(self, data):
+        """
+        Records every whole reply received so far.
+
+        Parameter data: the bytes received
+        Precondition: data is a bytes object
+        """
+        self._buffer += data
+        size = REPLY.size
+        whole = len(self._buffer) - len(self._buffer) % size
+        for start in range(0, whole, size):
+            reply = REPLY.unpack_from(self._buffer, start)
+            if reply[0] == MSG_ERROR:
+                self._errors += 1
+            else:
+                self._states[reply[1]] = reply
+            self._waiting -= 1
+        del self._buffer[:whole]
+        if self._waiting <= 0 and self._done != None and \
+        not self._done.done():
+            self._done.set_result(None)
+
+    async def play(self, sessions, frames):
+        """
+        Opens sessions, plays frames scripted frames on each, then closes them.
+
+        Parameter sessions: the number of sessions
+        Precondition: sessions is an int > 0
+
+        Parameter frames: the number of frames to play
+        Precondition: frames is an int > 0
+        """
+        from bench import scriptKeys
+        from headless import HeadlessInput
+        input = HeadlessInput()
+        data = b''.join(REQUEST.pack(MSG_OPEN, k, 0) for k in range(sessions))
+        await self._exchange(data, sessions)
+        for frame in range(frames):
+            input.setKeys(scriptKeys(frame))
+            keys = packKeys(input)
+            requests = []
+            for k in range(sessions):
+                state = self._states.get(k)
+                if state != None and state[6] == 0 and state[4] > 0:
+                    requests.append(REQUEST.pack(MSG_SHIP, k, 0))
+                requests.append(REQUEST.pack(MSG_INPUT, k, keys))
+            await self._exchange(b''.join(requests), sessions)
+        self._transport.write(b''.join(REQUEST.pack(MSG_CLOSE, k, 0)
+        for k in range(sessions)))
+
+    async def _exchange(self, data, replies):
+        """
+        Sends requests and waits for the given number of replies.
+
+        Parameter data: the requests
+        Precondition: data is a bytes object
+
+        Parameter replies: the number of replies the requests will get
+        Precondition: replies is an int > 0
+        """
+        self._waiting += replies
+        self._done = asyncio.get_running_loop().create_future()
+        self._transport.write(data)
+        await self._done
+
+
+async def _serve(port, bots, frames):
+    """
+    Runs a GameServer, forever or (with bots) until the bots are done.
+
+    Parameter port: the port, or 0 for any free port
+    Precondition: port is an int >= 0
+
+    Parameter bots: the number of bot sessions to play, or None for none
+    Precondition: bots is None or an int > 0
+
+    Parameter frames: the number of frames each bot plays
+    Precondition: frames is an int > 0
+    """
+    scores = None
+    if LEADERBOARD != None:
+        from leaderboard import Leaderboard
+        scores = Leaderboard(LEADERBOARD)
+    server = GameServer(port, scores)
+    await server.start()
+    print('serving on %s:%d' % (SERVE_HOST, server.getPort()))
+    if bots == None:
+        await asyncio.Event().wait()
+        return True
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    transport, client = await loop.create_connection(BotClient, SERVE_HOST,
+    server.getPort())
+    await client.play(bots, frames)
+    elapsed = time.perf_counter() - start
+    print(server.lagReport())
+    transport.close()
+    await server.stop()
+    if scores != None:
+        print(_leaderboardReport(scores))
+        scores.close()
+    states = client.getStates()
+    finished = sum(1 for state in states.values() if state[2] == frames)
+    passed = finished == bots and client.getErrors() == 0
+    print('bots=%d frames=%d finished=%d errors=%d ticks/s=%.0f %s' % (bots,
+    frames, finished, client.getErrors(), server.getTicks()/elapsed,
+    'PASS' if passed else 'FAIL'))
+    return passed
+
+
+def _leaderboardReport(scores):
+    """
+    Returns a line with the size and the best games of a leaderboard.
+
+    Parameter scores: the leaderboard
+    Precondition: scores is a Leaderboard
+    """
+    done = scores.flush()
+    line = 'leaderboard games=%d' % scores.count()
+    if not done:
+        line += ' (still writing)'
+    if scores.getFailed() > 0:
+        line += ' failed=%d (%s)' % (scores.getFailed(), scores.getError())
+    line += ' top:'
+    for player, score, level in scores.top():
+        line += ' %s=%d' % (player, score)
+    return line
+
+
+def runServer(port, bots = None, frames = REPORT_FRAMES):
+    """
+    Runs the server (and, with bots, a localhost bot client) until done.
+
+    Returns True, or with bots, True if every bot session played every frame.
+
+    Parameter port: the port, or 0 for any free port
+    Precondition: port is an int >= 0
+
+    Parameter bots: the number of bot sessions to play, or None for none
+    Precondition: bots is None or an int > 0
+
+    Parameter frames: the number of frames each bot plays
+    Precondition: frames is an int > 0
+    """
+    try:
+        return asyncio.run(_serve(port, bots, frames))
+    except KeyboardInterrupt:
+        return True
@@ -0,0 +1,933 @@
+"""
+Split simulation and rendering for Alien Invaders
+
+In a normal run Wave.update and Wave.draw share one thread, so a slow draw
+holds up input and simulation alike. With --split the simulation runs in its
+own process instead:
+
+    render process (Invaders)              simulation process
+    -------------------------              ------------------
+    RemoteWave.update  -- InputRing -->    runSimulation: a headless Wave,
+                                           ticked every FRAME_BUDGET seconds
+    RemoteWave.draw    <-- StateBuffer --  on its own clock
+
+Both channels are multiprocessing.shared_memory blocks.
+
+The StateBuffer holds two copies of the game state (ship, aliens, bolts,
+bunkers, score). The simulation writes the copy the renderer is not reading
+and then flips an index. Each copy has a sequence number that is odd while it
+is being written (a seqlock). The renderer reads the numbers straight out of
+the shared block into its sprites, with no copy of the state, and reads again
+if the sequence number changed under it.
+
+The InputRing is a small single-producer, single-consumer ring of commands:
+key bitmasks, "start a new wave" and "give the player a new ship".
+
+The simulation only ticks while there is something to play: a wave that has
+had input, with a ship and no result. That is exactly when Invaders would call
+Wave.update, so pauses and the state machine in app.py behave as in a normal
+run. The simulation is headless, so a split run has no sounds or explosions.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from multiprocessing import shared_memory
+import atexit
+import multiprocessing
+import os
+import time
+
+
+# The commands in the first cell of an InputRing slot
+CMD_KEYS = 1    # cell 1: the bitmask of keys down (see controls.py)
+CMD_WAVE = 2    # cells 1-3: wave id, level, score
+CMD_SHIP = 3    # cell 1: the number of ships given so far in this wave
+CMD_STOP = 4    # no arguments: the simulation process exits
+
+# The number of int64 cells in an InputRing slot
+_SLOT = 6
+
+# The header of a StateBuffer: the copy to read, then the sequence number of
+# each copy
+_LATEST = 0
+_SEQ = 1
+_HEADER = 4
+
+# The fields at the start of each copy of the state, as offsets
+F_TICK   = 0    # the number of ticks simulated, over all waves
+F_BUSY   = 1    # the wall-clock seconds charged to those ticks
+F_WAVE   = 2    # the id of the wave (see CMD_WAVE)
+F_SPAWNS = 3    # the number of ships given in this wave (see CMD_SHIP)
+F_SCORE  = 4
+F_LIVES  = 5
+F_RESULT = 6
+F_SHIP   = 7    # 1 if the ship is alive, 0 otherwise
+F_SHIPX  = 8
+F_SHIPY  = 9
+F_ALIENS = 10   # the number of alien records in this wave
+F_ALIENW = 11
+F_ALIENH = 12
+F_ALIVE  = 13   # the number of living aliens
+F_BOLTS  = 14   # the number of bolt records that follow the aliens
+_FIELDS  = 15
+
+# The doubles in one alien record (x, y, type or 0 if dead, frame) and in one
+# bolt record (x, y, 1 if fired by the player)
+_ALIEN = 4
+_BOLT = 3
+
+
+def alienCapacity():
+    """
+    Returns the most aliens a wave in the current GAME_MODE can have.
+    """
+    if WAVES != None:
+        return openCampaign(WAVES).getLargest()
+    if GAME_MODE == MODE_ENDLESS:
+        return max(ENDLESS_MAX_ALIENS, ALIEN_ROWS*ALIENS_IN_ROW)
+    return ALIEN_ROWS*ALIENS_IN_ROW
+
+
+def _attach(name, size):
+    """
+    Returns a shared memory block, creating it if name is None.
+
+    The process that creates a block is the one that removes it. A spawned
+    child shares its parent's resource tracker, so attaching does not make
+    the block look leaked when the child exits.
+
+    Parameter name: the name of an existing block, or None for a new one
+    Precondition: name is None or a string
+
+    Parameter size: the size of a new block in bytes
+    Precondition: size is an int > 0
+    """
+    if name == None:
+        return shared_memory.SharedMemory(create = True, size = size)
+    return shared_memory.SharedMemory(name = name)
+
+
+class InputRing(object):
+    """
+    A class to represent the command ring from the renderer to the simulation.
+
+    The first two cells are the number of commands pushed and the number
+    popped. Only the renderer writes the first and only the simulation writes
+    the second, so no lock is needed.
+
+    INSTANCE ATTRIBUTES:
+        _block:  [SharedMemory] the shared block
+        _cells:  [memoryview of int64] the counters, then SPLIT_RING slots
+    """
+
+    def getName(self):
+        """
+        Returns the name of the shared block, to attach to in another process.
+        """
+        return self._block.name
+
+    def __init__(self, name = None):
+        """
+        Initializes an InputRing, creating a new block if name is None.
+
+        Parameter name: the name of the block to attach to, or None
+        Precondition: name is None or a string
+        """
+        self._block = _attach(name, 8*(2 + SPLIT_RING*_SLOT))
+        self._cells = self._block.buf.cast('q')
+        if name == None:
+            for k in range(len(self._cells)):
+                self._cells[k] = 0
+
+    def push(self, command, a = 0, b = 0, c = 0, d = 0, e = 0):
+        """
+        Returns True if the command was added, False if the ring is full.
+
+        Parameter command: the command
+        Precondition: command is one of CMD_KEYS, CMD_WAVE, CMD_SHIP, CMD_STOP
+
+        Parameters a..e: the arguments of the command
+        Precondition: each is an int
+        """
+        cells = self._cells
+        head = cells[0]
+        if head - cells[1] >= SPLIT_RING:
+            return False
+        slot = 2 + (head % SPLIT_RING)*_SLOT
+        cells[slot] = command
+        cells[slot+1] = a
+        cells[slot+2] = b
+        cells[slot+3] = c
+        cells[slot+4] = d
+        cells[slot+5] = e
+        cells[0] = head + 1
+        return True
+
+    def pop(self):
+        """
+        Returns the oldest command as a tuple (command, a, b, c, d, e), or None
+        if the ring is empty.
+        """
+        cells = self._cells
+        tail = cells[1]
+        if tail == cells[0]:
+            return None
+        slot = 2 + (tail % SPLIT_RING)*_SLOT
+        command = tuple(cells[slot:slot+_SLOT])
+        cells[1] = tail + 1
+        return command
+
+    def close(self, unlink = False):
+        """
+        Detaches from the shared block.
+
+        Parameter unlink: True to also remove the block (only its creator may)
+        Precondition: unlink is a bool
+        """
+        self._cells.release()
+        self._block.close()
+        if unlink:
+            self._block.unlink()
+
+
+class StateBuffer(object):
+    """
+    A class to represent the double-buffered game state in shared memory.
+
+    Every value is a double. A copy of the state is _FIELDS fields, then
+    BUNKER_COUNT*BUNKER_ROWS bunker rows, then one record per alien of the
+    formation (in the order of Formation.getCells), then up to SPLIT_BOLTS
+    bolt records.
+
+    INSTANCE ATTRIBUTES:
+        _block:   [SharedMemory] the shared block
+        _cells:   [memoryview of double] the header, then both copies
+        _aliens:  [int > 0] the number of alien records in a copy
+        _stride:  [int > 0] the number of doubles in a copy
+    """
+
+    def getName(self):
+        """
+        Returns the name of the shared block, to attach to in another process.
+        """
+        return self._block.name
+
+    def getCells(self):
+        """
+        Returns the shared block as a memoryview of doubles.
+
+        Readers index it with getBase and the F_ offsets; nothing is copied.
+        """
+        return self._cells
+
+    def getBase(self, copy):
+        """
+        Returns the index of the first field of a copy of the state.
+
+        Parameter copy: the copy
+        Precondition: copy is 0 or 1
+        """
+        return _HEADER + copy*self._stride
+
+    def getBunkerBase(self, copy):
+        """
+        Returns the index of the first bunker row of a copy of the state.
+
+        Parameter copy: the copy
+        Precondition: copy is 0 or 1
+        """
+        return self.getBase(copy) + _FIELDS
+
+    def getAlienBase(self, copy):
+        """
+        Returns the index of the first alien record of a copy of the state.
+
+        Parameter copy: the copy
+        Precondition: copy is 0 or 1
+        """
+        return self.getBunkerBase(copy) + BUNKER_COUNT*BUNKER_ROWS
+
+    def getBoltBase(self, copy):
+        """
+        Returns the index of the first bolt record of a copy of the state.
+
+        Parameter copy: the copy
+        Precondition: copy is 0 or 1
+        """
+        return self.getAlienBase(copy) + self._aliens*_ALIEN
+
+    def __init__(self, name = None, aliens = None):
+        """
+        Initializes a StateBuffer, creating a new block if name is None.
+
+        Parameter name: the name of the block to attach to, or None
+        Precondition: name is None or a string
+
+        Parameter aliens: the number of alien records, or None for
+        alienCapacity()
+        Precondition: aliens is None or an int > 0, the same in both processes
+        """
+        if aliens == None:
+            aliens = alienCapacity()
+        self._aliens = aliens
+        self._stride = _FIELDS + BUNKER_COUNT*BUNKER_ROWS + aliens*_ALIEN + \
+        SPLIT_BOLTS*_BOLT
+        self._block = _attach(name, 8*(_HEADER + 2*self._stride))
+        self._cells = self._block.buf.cast('d')
+        if name == None:
+            self._cells[_LATEST] = 0
+            self._cells[_SEQ] = 0
+            self._cells[_SEQ+1] = 0
+            for field in range(_FIELDS):
+                self._cells[self.getBase(0)+field] = 0
+                self._cells[self.getBase(1)+field] = 0
+
+    def begin(self):
+        """
+        Returns (copy, sequence) for the copy a reader should use.
+
+        The sequence is odd if the copy is being written; the reader should
+        try again. After reading, the reader checks isSame(copy, sequence).
+        """
+        copy = int(self._cells[_LATEST])
+        return (copy, self._cells[_SEQ+copy])
+
+    def isSame(self, copy, sequence):
+        """
+        Returns True if a copy was not written to since begin returned
+        sequence, so what was read from it is consistent.
+
+        Parameter copy: the copy that was read
+        Precondition: copy is 0 or 1
+
+        Parameter sequence: the sequence number from begin
+        Precondition: sequence is a number
+        """
+        return sequence % 2 == 0 and self._cells[_SEQ+copy] == sequence
+
+    def publish(self, wave, wave_id, spawns, tick, busy):
+        """
+        Writes the state of a wave to the copy not being read, then flips.
+
+        Bolts past SPLIT_BOLTS are simulated but not shared.
+
+        Parameter wave: the wave to publish
+        Precondition: wave is a built Wave
+
+        Parameter wave_id: the id of the wave (see CMD_WAVE)
+        Precondition: wave_id is an int
+
+        Parameter spawns: the number of ships given in this wave
+        Precondition: spawns is an int >= 0
+
+        Parameter tick: the number of ticks simulated
+        Precondition: tick is an int >= 0
+
+        Parameter busy: the wall-clock seconds charged to ticks (the time
+        between a tick and the pass before it)
+        Precondition: busy is a number >= 0
+        """
+        cells = self._cells
+        copy = 1 - int(cells[_LATEST])
+        cells[_SEQ+copy] += 1
+        base = self.getBase(copy)
+        ship = wave.getShip()
+        aliens = wave.getAliens()
+        cells[base+F_TICK] = tick
+        cells[base+F_BUSY] = busy
+        cells[base+F_WAVE] = wave_id
+        cells[base+F_SPAWNS] = spawns
+        cells[base+F_SCORE] = wave.getScore()
+        cells[base+F_LIVES] = wave.getLives()
+        cells[base+F_RESULT] = wave.getResult()
+        cells[base+F_SHIP] = 0 if ship == None else 1
+        if ship != None:
+            cells[base+F_SHIPX] = ship.getShipX()
+            cells[base+F_SHIPY] = ship.getShipY()
+        cells[base+F_ALIENS] = len(aliens)
+        cells[base+F_ALIENW], cells[base+F_ALIENH] = wave.getAlienSize()
+        cells[base+F_ALIVE] = wave.getAlienCount()
+        k = self.getBunkerBase(copy)
+        for bunker in wave.getBunkers():
+            for mask in bunker.getRows():
+                cells[k] = mask
+                k += 1
+        k = self.getAlienBase(copy)
+        for alien in aliens:
+            if alien == None:
+                cells[k+2] = 0
+            else:
+                cells[k] = alien.x
+                cells[k+1] = alien.y
+                cells[k+2] = alien.getType()
+                cells[k+3] = alien.frame
+            k += _ALIEN
+        k = self.getBoltBase(copy)
+        count = 0
+        for bolt in wave.getBolts():
+            if count == SPLIT_BOLTS:
+                break
+            cells[k] = bolt.x
+            cells[k+1] = bolt.y
+            cells[k+2] = 1 if bolt.isPlayerBolt() else 0
+            k += _BOLT
+            count += 1
+        cells[base+F_BOLTS] = count
+        cells[_SEQ+copy] += 1
+        cells[_LATEST] = copy
+
+    def close(self, unlink = False):
+        """
+        Detaches from the shared block.
+
+        Parameter unlink: True to also remove the block (only its creator may)
+        Precondition: unlink is a bool
+        """
+        self._cells.release()
+        self._block.close()
+        if unlink:
+            self._block.unlink()
+
+
+def runSimulation(state_name, input_name, aliens):
+    """
+    Runs the simulation process until it is sent CMD_STOP.
+
+    Every FRAME_BUDGET seconds this applies the pending commands, ticks the
+    wave if it is in play and publishes it. If the process falls more than
+    SPLIT_CATCHUP ticks behind, it drops the backlog instead of bursting.
+
+    Parameter state_name: the name of the StateBuffer block
+    Precondition: state_name is a string
+
+    Parameter input_name: the name of the InputRing block
+    Precondition: input_name is a string
+
+    Parameter aliens: the number of alien records in the StateBuffer
+    Precondition: aliens is an int > 0
+    """
+    state = StateBuffer(state_name, aliens)
+    ring = InputRing(input_name)
+    input = InputSnapshot()
+    keys = 0
+    wave = None
+    wave_id = 0
+    spawns = 0
+    started = False
+    tick = 0
+    busy = 0.0
+    deadline = last = time.perf_counter()
+    while True:
+        #Each tick is charged the wall-clock time since the previous pass
+        now = time.perf_counter()
+        command = ring.pop()
+        while command != None:
+            kind = command[0]
+            if kind == CMD_STOP:
+                state.close()
+                ring.close()
+                return
+            elif kind == CMD_KEYS:
+                keys = command[1]
+                started = True
+            elif kind == CMD_WAVE:
+                wave_id = command[1]
+                wave = Wave(command[2], command[3], waveFormation(command[2]))
+                spawns = 0
+                started = False
+            elif kind == CMD_SHIP and wave != None:
+                wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+                SHIP_HEIGHT, 'ship.png'))
+                spawns = command[1]
+            command = ring.pop()
+        if wave != None and started and wave.getShip() != None and \
+        wave.getResult() == 0:
+            input.setMask(keys)
+            wave.update(input, FRAME_BUDGET)
+            tick += 1
+            busy += now - last
+        last = now
+        if wave != None:
+            state.publish(wave, wave_id, spawns, tick, busy)
+        deadline += FRAME_BUDGET
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elif delay < -SPLIT_CATCHUP*FRAME_BUDGET:
+            deadline = time.perf_counter()
+
+
+class SimulationLink(object):
+    """
+    A class to represent the render side of a split run.
+
+    It owns the shared blocks and the simulation process, and hands out wave
+    ids. Make the waves with RemoteWave.
+
+    INSTANCE ATTRIBUTES:
+        _state:   [StateBuffer, or None once stopped] the state published by
+                  the simulation
+        _ring:    [InputRing, or None once stopped] the commands for the
+                  simulation
+        _process: [Process or None] the simulation, None until start
+        _nextId:  [int > 0] the id of the next wave
+    """
+
+    def getState(self):
+        """
+        Returns the StateBuffer the simulation publishes to.
+        """
+        return self._state
+
+    def __init__(self):
+        """
+        Initializes a SimulationLink and creates its shared blocks.
+        """
+        self._state = StateBuffer()
+        self._ring = InputRing()
+        self._process = None
+        self._nextId = 1
+
+    def start(self):
+        """
+        Starts the simulation process.
+
+        The process is spawned, not forked, so it never inherits the Kivy
+        window. SIM_ENV makes it import the headless backend. The process is
+        stopped, and the shared blocks removed, when this process exits.
+        """
+        context = multiprocessing.get_context('spawn')
+        self._process = context.Process(target = runSimulation,
+        args = (self._state.getName(), self._ring.getName(),
+        alienCapacity()), daemon = True)
+        os.environ[SIM_ENV] = '1'
+        try:
+            self._process.start()
+        finally:
+            del os.environ[SIM_ENV]
+        atexit.register(self.stop)
+
+    def isAlive(self):
+        """
+        Returns True if the simulation process is running.
+        """
+        return self._process != None and self._process.is_alive()
+
+    def send(self, command, a = 0, b = 0, c = 0, d = 0, e = 0):
+        """
+        Sends a command to the simulation, waiting while the ring is full.
+
+        Parameter command: the command
+        Precondition: command is one of CMD_KEYS, CMD_WAVE, CMD_SHIP, CMD_STOP
+
+        Parameters a..e: the arguments of the command
+        Precondition: each is an int
+        """
+        while not self._ring.push(command, a, b, c, d, e):
+            if not self.isAlive():
+                raise RuntimeError('the simulation process has stopped')
+            time.sleep(FRAME_BUDGET/4)
+
+    def newId(self):
+        """
+        Returns a new wave id.
+        """
+        self._nextId += 1
+        return self._nextId - 1
+
+    def newWave(self, num_waves, wave_score):
+        """
+        Returns a RemoteWave for a new wave, which the simulation starts
+        building at once.
+
+        Both processes get the formation from waveFormation(num_waves), so
+        only the level is sent.
+
+        Parameter num_waves: the wave number
+        Precondition: num_waves is an int >= 0
+
+        Parameter wave_score: the player's score
+        Precondition: wave_score is an int >= 0
+        """
+        return RemoteWave(self, num_waves, wave_score)
+
+    def getTickRate(self):
+        """
+        Returns the ticks per second the simulation kept up while in play.
+
+        The rate is 0.0 if it has not ticked yet.
+        """
+        copy, seq = self._state.begin()
+        base = self._state.getBase(copy)
+        cells = self._state.getCells()
+        ticks = cells[base+F_TICK]
+        busy = cells[base+F_BUSY]
+        return ticks/busy if busy > 0 else 0.0
+
+    def stop(self):
+        """
+        Stops the simulation process and removes the shared blocks.
+
+        Stopping twice does nothing.
+        """
+        if self._state == None:
+            return
+        if self.isAlive():
+            self.send(CMD_STOP)
+            self._process.join(1)
+            if self._process.is_alive():
+                self._process.terminate()
+        self._state.close(True)
+        self._ring.close(True)
+        self._state = None
+        self._ring = None
+
+
+class RemoteWave(object):
+    """
+    A class to stand in for Wave in the render process of a split run.
+
+    It has the parts of the Wave interface Invaders uses. update sends the
+    keys to the simulation; draw moves a set of local sprites to the
+    published state and draws them.
+
+    The state only counts once the simulation has published this wave (and,
+    after setShip, the new ship). Until then the getters return what was seen
+    last, so Invaders never acts on the state of another wave.
+
+    INSTANCE ATTRIBUTES:
+        _link:     [SimulationLink] the simulation
+        _id:       [int > 0] the id of this wave
+        _spawns:   [int >= 0] the number of ships given with setShip
+        _mask:     [int or None] the keys last sent, None before any
+        _built:    [bool] True once the sprites below have been made
+        _score:    [int >= 0] the score last seen
+        _lives:    [int >= 0] the lives last seen
+        _result:   [int] the result last seen (see Wave.getResult)
+        _alive:    [int >= 0] the number of living aliens last seen
+        _bolts:    [int >= 0] the number of bolts last seen
+        _shipAlive:[bool] True if the ship was alive when last seen
+        _ship:     [Ship] the ship sprite
+        _formation: [Formation] the aliens the wave started with
+        _aliens:   [list of Alien] one sprite per alien of _formation
+        _shown:    [list of bool] True for each alien that is alive
+        _players:  [list of Bolt] player bolt sprites, grown as needed
+        _enemies:  [list of Bolt] alien bolt sprites, grown as needed
+        _bunkers:  [list of Bunker] the bunkers, rows copied from the state
+        _dline:    [GPath] the defense line
+        _scoreLabel: [ScoreLabel] the score display
+        _detail:   [int] the optional work shed, one of the SHED constants
+                   (see setDetail)
+    """
+
+    def getShip(self):
+        """
+        Returns the ship sprite if the ship is alive, None otherwise.
+        """
+        self._sync()
+        return self._ship if self._shipAlive else None
+
+    def setShip(self, new_ship):
+        """
+        Asks the simulation for a new ship.
+
+        Parameter new_ship: the new ship (only its existence matters)
+        Precondition: new_ship is a Ship
+        """
+        self._spawns += 1
+        self._shipAlive = True
+        self._link.send(CMD_SHIP, self._spawns)
+
+    def getLives(self):
+        """
+        Returns the number of lives left.
+        """
+        self._sync()
+        return self._lives
+
+    def getResult(self):
+        """
+        Returns 0 while playing, 1 if the player lost and 2 if they won.
+        """
+        self._sync()
+        return self._result
+
+    def getScore(self):
+        """
+        Returns the score.
+        """
+        self._sync()
+        return self._score
+
+    def getAlienCount(self):
+        """
+        Returns the number of living aliens.
+        """
+        self._sync()
+        return self._alive
+
+    def getBoltCount(self):
+        """
+        Returns the number of bolts on screen.
+        """
+        self._sync()
+        return self._bolts
+
+    def setDetail(self, level):
+        """
+        Sets how much optional drawing work is shed (see Wave.setDetail).
+
+        The simulation plays on unchanged; only the sprites here stop
+        changing frame (SHED_ANIMATION) and the score label is refreshed
+        less often (SHED_HUD). The sounds play in the simulation process,
+        which has none.
+
+        Parameter level: the governor level
+        Precondition: level is one of the SHED constants
+        """
+        if level != self._detail:
+            self._detail = level
+            self._scoreLabel.setInterval(HUD_INTERVAL if level >= SHED_HUD
+            else 1)
+
+    def isBuilt(self):
+        """
+        Returns True if the simulation has published this wave.
+        """
+        return self.buildStep(0)
+
+    def __init__(self, link, num_waves, wave_score):
+        """
+        Initializes a RemoteWave and asks the simulation to build it.
+
+        Parameter link: the simulation
+        Precondition: link is a started SimulationLink
+
+        Parameter num_waves: the wave number
+        Precondition: num_waves is an int >= 0
+
+        Parameter wave_score: the player's score
+        Precondition: wave_score is an int >= 0
+        """
+        self._link = link
+        self._formation = waveFormation(num_waves)
+        self._id = link.newId()
+        self._spawns = 0
+        self._mask = None
+        self._built = False
+        self._score = wave_score
+        self._lives = SHIP_LIVES
+        self._result = 0
+        self._alive = self._formation.getSize()
+        self._bolts = 0
+        self._shipAlive = True
+        self._ship = Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH, SHIP_HEIGHT,
+        'ship.png')
+        self._aliens = []
+        self._shown = []
+        self._players = []
+        self._enemies = []
+        self._bunkers = []
+        for k in range(BUNKER_COUNT):
+            self._bunkers.append(Bunker(GAME_WIDTH*(k+1)/(BUNKER_COUNT+1),
+            BUNKER_Y))
+        self._dline = GPath(points=[0, DEFENSE_LINE, GAME_WIDTH, DEFENSE_LINE],
+        linewidth = 1, linecolor = [0.5, 0.5, 0.5, 1.0])
+        self._scoreLabel = ScoreLabel(wave_score, ALIEN_H_SEP+20,
+        GAME_HEIGHT-ALIEN_V_SEP-25, SCORE_SIZE)
+        self._detail = SHED_NONE
+        link.send(CMD_WAVE, self._id, num_waves, wave_score)
+
+    def buildStep(self, budget):
+        """
+        Returns True once the simulation has published this wave.
+
+        The first time it has, the alien sprites are made to match. With a
+        budget of None this waits for the simulation.
+
+        Parameter budget: the time to wait in seconds, or None to wait until
+        the wave is published
+        Precondition: budget is None or a number >= 0
+        """
+        if self._built:
+            return True
+        start = time.perf_counter()
+        state = self._link.getState()
+        cells = state.getCells()
+        while True:
+            copy, seq = state.begin()
+            base = state.getBase(copy)
+            if cells[base+F_WAVE] == self._id:
+                width = cells[base+F_ALIENW]
+                height = cells[base+F_ALIENH]
+                if state.isSame(copy, seq):
+                    break
+            if budget != None and time.perf_counter() - start >= budget:
+                return False
+            if not self._link.isAlive():
+                raise RuntimeError('the simulation process has stopped')
+            time.sleep(FRAME_BUDGET/8)
+        for kind in self._formation.getTypes():
+            self._aliens.append(Alien(0, 0, width, height,
+            ALIEN_IMAGES[kind-1], kind))
+            self._shown.append(False)
+        self._built = True
+        self._sync()
+        return True
+
+    def update(self, input, dt):
+        """
+        Sends the keys down to the simulation if they changed.
+
+        The first call also starts the simulation ticking this wave.
+
+        Parameter input: the keys of this frame, passed down from invaders
+        Precondition: input is an InputSnapshot
+
+        Parameter dt: The time in seconds since last update (the simulation
+        keeps its own clock)
+        Precondition: dt is a number (int or float)
+        """
+        mask = input.getMask()
+        if mask != self._mask:
+            self._link.send(CMD_KEYS, mask)
+            self._mask = mask
+
+    def updateEffects(self, dt):
+        """
+        Does nothing: a split run draws no explosions.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        pass
+
+    def draw(self, view):
+        """
+        Draws the published state of this wave.
+
+        The sprites are moved to the state straight from shared memory. If
+        the simulation wrote the copy while it was being read, it is read
+        again.
+
+        Parameter view: the game view, used in drawing
+        Precondition: a valid view
+        """
+        if not self._built:
+            return
+        state = self._link.getState()
+        cells = state.getCells()
+        for attempt in range(3):
+            copy, seq = state.begin()
+            if cells[state.getBase(copy)+F_WAVE] != self._id:
+                return
+            players, enemies = self._place(state, copy)
+            if state.isSame(copy, seq):
+                break
+        self._sync()
+        if self._shipAlive:
+            self._ship.draw(view)
+        for k in range(len(self._aliens)):
+            if self._shown[k]:
+                self._aliens[k].draw(view)
+        self._dline.draw(view)
+        #Bunkers and the score draw with Kivy directly
+        if not HEADLESS:
+            for bunker in self._bunkers:
+                bunker.draw(view)
+        for k in range(players):
+            self._players[k].draw(view)
+        for k in range(enemies):
+            self._enemies[k].draw(view)
+        self._scoreLabel.setValue(self._score)
+        if not HEADLESS:
+            self._scoreLabel.draw(view)
+
+    def _sync(self):
+        """
+        Copies the score, lives, result and counts from the latest state, if
+        it is the state of this wave.
+
+        The ship is only believed once the simulation has seen every setShip.
+        """
+        state = self._link.getState()
+        cells = state.getCells()
+        copy, seq = state.begin()
+        base = state.getBase(copy)
+        if cells[base+F_WAVE] != self._id:
+            return
+        score = int(cells[base+F_SCORE])
+        lives = int(cells[base+F_LIVES])
+        result = int(cells[base+F_RESULT])
+        alive = int(cells[base+F_ALIVE])
+        bolts = int(cells[base+F_BOLTS])
+        spawns = cells[base+F_SPAWNS]
+        ship = cells[base+F_SHIP] == 1
+        if not state.isSame(copy, seq):
+            return
+        self._score = score
+        self._lives = lives
+        self._result = result
+        self._alive = alive
+        self._bolts = bolts
+        if spawns == self._spawns:
+            self._shipAlive = ship
+
+    def _place(self, state, copy):
+        """
+        Moves every sprite to a copy of the state.
+
+        Returns (players, enemies), the number of player and alien bolt
+        sprites in use.
+
+        Parameter state: the published state
+        Precondition: state is a StateBuffer
+
+        Parameter copy: the copy to read
+        Precondition: copy is 0 or 1
+        """
+        cells = state.getCells()
+        base = state.getBase(copy)
+        self._ship.x = cells[base+F_SHIPX]
+        self._ship.y = cells[base+F_SHIPY]
+        k = state.getBunkerBase(copy)
+        for bunker in self._bunkers:
+            bunker.setRows(cells[k:k+BUNKER_ROWS])
+            k += BUNKER_ROWS
+        k = state.getAlienBase(copy)
+        for n in range(len(self._aliens)):
+            alien = self._aliens[n]
+            kind = int(cells[k+2])
+            self._shown[n] = kind != 0
+            if kind != 0:
+                alien.x = cells[k]
+                alien.y = cells[k+1]
+                if self._detail < SHED_ANIMATION:
+                    alien.frame = int(cells[k+3])
+                if kind != alien.getType():
+                    alien.setType(kind)
+                    alien.source = ALIEN_IMAGES[kind-1]
+            k += _ALIEN
+        k = state.getBoltBase(copy)
+        players = 0
+        enemies = 0
+        for n in range(int(cells[base+F_BOLTS])):
+            if cells[k+2] == 1:
+                if players == len(self._players):
+                    self._players.append(Bolt(0, 0, BOLT_WIDTH, BOLT_HEIGHT,
+                    BOLT_SPEED, 'green'))
+                bolt = self._players[players]
+                players += 1
+            else:
+                if enemies == len(self._enemies):
+                    self._enemies.append(Bolt(0, 0, BOLT_WIDTH, BOLT_HEIGHT,
+                    -BOLT_SPEED, 'red'))
+                bolt = self._enemies[enemies]
+                enemies += 1
+            bolt.x = cells[k]
+            bolt.y = cells[k+1]
+            k += _BOLT
+        return (players, enemies)
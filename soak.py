@@ -0,0 +1,329 @@
+"""
+Soak test for Alien Invaders
+
+This module plays games headless for as long as it is asked to, and checks
+that nothing is left behind from one wave to the next. It is what runs
+for
+
+    python invaders --soak 120 --mode endless
+
+A SoakRun steps through the same states as Invaders: STATE_NEWWAVE builds a
+new Wave (a few rows a frame, as the pause screens do), STATE_ACTIVE plays it
+with an Autopilot (see autopilot.py), STATE_PAUSED waits for 'S' and gives the
+wave a new Ship after a lost life, and STATE_COMPLETE ends the game and starts
+another. The autopilot wins waves, so games go through level changes as well
+as lost games; the benchmark script loses every wave it plays.
+The frames are played as fast as they can be, with FRAME_BUDGET as the time
+step, so an hour of soak plays many hours of game.
+
+Only Wave and the models are soaked. The SoakRun plays the states of Invaders
+itself, around a bare Wave, as Invaders needs game2d and Kivy (and a finished
+game never leaves STATE_COMPLETE). Nothing Invaders owns is covered: the Ship
+it makes after a lost life, its message labels, time scale and governor, the
+telemetry log and the leaderboard. Explosion particles are not made headless,
+so they are not covered either.
+
+At every wave boundary, after the old wave is dropped and the collector has
+run, the soak counts the live objects of each model class (SOAK_TYPES), the
+memory blocks Python holds and the resident memory of the process. None of
+these may grow past the first boundary after SOAK_WARMUP waves: the counts
+not at all, the blocks by SOAK_SLACK and the resident memory by
+SOAK_RSS_SLACK.
+
+Every SOAK_TRACE waves, one wave is played under tracemalloc. Tracing starts
+at the boundary before it and stops at the boundary after it, so whatever it
+traced that is still alive was left behind by that wave. If that is more than
+SOAK_TRACED_SLACK the run fails, and the places that allocated it are
+printed. (tracemalloc slows play down many times over, which is why only some
+waves are traced.)
+
+A report line is printed at the first boundary after every SOAK_REPORT
+seconds. The run stops at the first failure; the process then exits with
+status 1.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from backend import *
+from wave import *
+from controls import *
+from autopilot import Autopilot
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+
+def residentBytes():
+    """
+    Returns the resident memory of this process in bytes.
+
+    This reads /proc/self/statm where there is one. Elsewhere it falls back on
+    the peak resident memory from the resource module, which can only grow, so
+    a leak still shows.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak*1024
+
+
+def countModels():
+    """
+    Returns a dict of the number of live objects of each class in SOAK_TYPES.
+    """
+    counts = dict.fromkeys(SOAK_TYPES, 0)
+    for item in gc.get_objects():
+        name = type(item).__name__
+        if name in counts:
+            counts[name] += 1
+    return counts
+
+
+class SoakRun(object):
+    """
+    A class to play games headless and check memory between waves.
+
+    It plays Wave and the models only, stepping through the states of
+    Invaders without Invaders itself (see the module docstring).
+
+    INSTANCE ATTRIBUTES:
+        _input:    [HeadlessInput] the keys held down
+        _pilot:    [Autopilot] flies the ship
+        _keys:     [InputSnapshot] the keys of the current frame
+        _state:    [one of STATE_NEWWAVE ... STATE_COMPLETE] the game state
+        _wave:     [Wave or None] the wave in play, None between waves
+        _level:    [int >= 0] the number of waves completed in this game
+        _score:    [int >= 0] the score the next wave starts with
+        _frame:    [int >= 0] the frames played
+        _script:   [int >= 0] the frames played in the current state, for the
+                   pause screens
+        _waves:    [int >= 0] the waves started
+        _games:    [int >= 0] the games finished
+        _respawns: [int >= 0] the ships replaced after a lost life
+        _base:     [tuple or None] the (model counts, blocks, resident bytes)
+                   to check against, None until SOAK_WARMUP waves are played
+        _last:     [tuple or None] the same numbers at the latest boundary
+        _traced:   [int] the bytes the latest traced wave left behind, -1 if
+                   no wave has been traced
+        _failure:  [str or None] why the run failed, None while it passes
+        _start:    [float] the perf_counter value when the run started
+        _report:   [float] the perf_counter value when the next report is due
+    """
+
+    def getFailure(self):
+        """
+        Returns why the run failed, or None if it has not.
+        """
+        return self._failure
+
+    def isPassing(self):
+        """
+        Returns True if no wave boundary has failed.
+        """
+        return self._failure == None
+
+    def __init__(self):
+        """
+        Initializes a SoakRun about to start its first game.
+        """
+        self._input = HeadlessInput()
+        self._pilot = Autopilot()
+        self._keys = InputSnapshot()
+        self._state = STATE_NEWWAVE
+        self._wave = None
+        self._level = 0
+        self._score = 0
+        self._frame = 0
+        self._script = 0
+        self._waves = 0
+        self._games = 0
+        self._respawns = 0
+        self._base = None
+        self._last = None
+        self._traced = -1
+        self._failure = None
+        self._start = time.perf_counter()
+        self._report = self._start + SOAK_REPORT
+
+    def run(self, seconds):
+        """
+        Plays games for the given time, or until a wave boundary fails.
+
+        Prints a report every SOAK_REPORT seconds and a summary at the end, and
+        returns True if the run passed.
+
+        Parameter seconds: how long to play
+        Precondition: seconds is a number > 0
+        """
+        self._start = time.perf_counter()
+        self._report = self._start + SOAK_REPORT
+        stop = self._start + seconds
+        while self._failure == None and (self._frame % SOAK_CLOCK != 0 or
+        time.perf_counter() < stop):
+            self._step()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        print(self.report())
+        print(self._pilot.report())
+        if self._failure != None:
+            print('soak failed: %s' % self._failure)
+        return self._failure == None
+
+    def report(self):
+        """
+        Returns a one line summary of the run and the latest wave boundary.
+        """
+        line = 'soak t=%.0fs frames=%d waves=%d games=%d respawns=%d' % \
+        (time.perf_counter() - self._start, self._frame, self._waves,
+        self._games, self._respawns)
+        if self._last != None:
+            counts, blocks, resident = self._last
+            line += ' blocks=%d rss=%.1fMB' % (blocks, resident/2**20)
+            if self._traced >= 0:
+                line += ' traced=%.1fKB' % (self._traced/1024)
+            for name in SOAK_TYPES:
+                line += ' %s=%d' % (name, counts[name])
+        return line + (' PASS' if self._failure == None else ' FAIL')
+
+    def _step(self):
+        """
+        Plays one frame of the current state.
+        """
+        if self._state == STATE_ACTIVE:
+            self._input.setKeys(unpackKeys(self._pilot.decide(self._wave)))
+        elif self._script == SOAK_PAUSE:
+            self._input.setKeys(('s',))
+        else:
+            self._input.setKeys(())
+        self._keys.sample(self._input)
+        state = self._state
+        if state == STATE_NEWWAVE:
+            self._buildWave()
+        elif state == STATE_ACTIVE:
+            self._wave.update(self._keys, FRAME_BUDGET)
+            if self._wave.getResult() != 0 or (self._wave.getShip() == None
+            and self._wave.getLives() > 0):
+                self._state = STATE_PAUSED
+        elif state == STATE_PAUSED:
+            self._paused()
+        elif state == STATE_COMPLETE:
+            self._games += 1
+            self._level = 0
+            self._score = 0
+            self._state = STATE_NEWWAVE
+        self._script = 0 if self._state != state else self._script + 1
+        self._frame += 1
+
+    def _buildWave(self):
+        """
+        Starts a new wave, checking memory first, then builds it a few rows a
+        frame until it is ready to play.
+        """
+        if self._wave == None or self._wave.getResult() != 0:
+            self._wave = None
+            self._check()
+            self._waves += 1
+            self._wave = Wave(self._level, self._score,
+            waveFormation(self._level), True)
+        self._wave.buildStep(PREBUILD_BUDGET)
+        if self._wave.isBuilt():
+            self._state = STATE_ACTIVE
+
+    def _paused(self):
+        """
+        Waits for 'S', then ends the game, starts the next wave or gives the
+        wave a new ship, as Invaders does.
+        """
+        if not self._keys.isPressed(KEY_START):
+            return
+        result = self._wave.getResult()
+        if result == 1 or (result == 2 and self._level >= finalLevel() and
+        GAME_MODE != MODE_ENDLESS):
+            self._state = STATE_COMPLETE
+        elif result == 2:
+            self._level += 1
+            self._score = self._wave.getScore()
+            self._state = STATE_NEWWAVE
+        else:
+            self._respawns += 1
+            self._wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+            self._state = STATE_ACTIVE
+
+    def _check(self):
+        """
+        Measures memory at a wave boundary and compares it with the baseline.
+
+        Nothing of the old wave should be alive here. The baseline is taken at
+        the first boundary after SOAK_WARMUP waves, once pools and caches have
+        filled up. This also stops tracing the wave just played, if it was
+        traced, and starts tracing the next one if it is due.
+        """
+        gc.collect()
+        sites = None
+        if tracemalloc.is_tracing():
+            self._traced = tracemalloc.get_traced_memory()[0]
+            sites = tracemalloc.take_snapshot().statistics('lineno')
+            tracemalloc.stop()
+        self._last = (countModels(), sys.getallocatedblocks(), residentBytes())
+        if self._base == None:
+            if self._waves >= SOAK_WARMUP:
+                self._base = self._last
+        else:
+            self._failure = self._compare(self._last, self._base)
+            if self._failure == None and sites != None and \
+            self._traced > SOAK_TRACED_SLACK:
+                self._failure = 'wave %d left %.1f KB behind' % (self._waves,
+                self._traced/1024)
+            if self._failure != None and sites != None:
+                for stat in sites[:SOAK_TOP]:
+                    print('  %s' % stat)
+        if self._failure == None and self._base != None and \
+        self._waves % SOAK_TRACE == 0:
+            tracemalloc.start()
+        if time.perf_counter() >= self._report:
+            print(self.report())
+            self._report = time.perf_counter() + SOAK_REPORT
+
+    def _compare(self, numbers, base):
+        """
+        Returns why numbers grew too much over base, or None if they did not.
+
+        Parameter numbers: the (model counts, blocks, resident bytes) now
+        Precondition: numbers is a tuple as in _last
+
+        Parameter base: the same numbers at the baseline
+        Precondition: base is a tuple as in _base
+        """
+        counts, blocks, resident = numbers
+        base_counts, base_blocks, base_resident = base
+        for name in SOAK_TYPES:
+            if counts[name] > base_counts[name]:
+                return 'live %s grew from %d to %d after wave %d' % (name,
+                base_counts[name], counts[name], self._waves)
+        if blocks - base_blocks > SOAK_SLACK:
+            return 'memory blocks grew by %d after wave %d' % (blocks -
+            base_blocks, self._waves)
+        if resident - base_resident > SOAK_RSS_SLACK:
+            return 'resident memory grew %.1f MB after wave %d' % \
+            ((resident - base_resident)/2**20, self._waves)
+        return None
+
+
+def runSoak(minutes):
+    """
+    Plays games headless for the given time and prints the results.
+
+    Returns True if memory and the live model counts held steady.
+
+    Parameter minutes: how long to play
+    Precondition: minutes is a number > 0
+    """
+    print('soak mode=%s for %.1f minutes' % (GAME_MODE, minutes))
+    return SoakRun().run(minutes*60)
@@ -0,0 +1,1002 @@
+"""
+Spectator feed for Alien Invaders
+
+This module streams a running game to any number of viewers over a local TCP
+or Unix socket. For example
+
+    python invaders --spectate 6000
+    python invaders --spectate /tmp/invaders.sock
+
+A viewer first gets a keyframe: the whole formation (the cell and type of
+each alien, and which are alive), the ship and every bolt.
+After that it gets one delta per tick, holding only what changed:
+
+    - the cells of the aliens that died
+    - the formation origin and animation frame, when the formation steps
+    - the ship and the score, lives and result, when they change
+    - the bolts that were fired, and the ids of bolts that left play
+
+Bolts only ever move along their velocity, so a bolt costs bytes when it is
+fired (with its velocity) and when it leaves, never for moving. A viewer moves
+every bolt it knows by its velocity at the start of each delta. A quiet tick
+is a few bytes however big the formation is.
+
+Messages are a 4-byte little-endian length and then a body. Integers in
+bodies are mostly varints (LEB128), and lists of kills and removed bolts are
+sorted and sent as gaps, so they stay one or two bytes per entry. Bolt
+positions and velocities are in quarter pixels.
+
+The game thread only encodes (SpectatorFeed.publish); the bytes are handed to
+a SpectatorServer thread, which does all the socket work. A viewer too slow to
+keep up is dropped back to waiting for a keyframe instead of making anyone
+wait. SpectatorView decodes the stream, and SpectatorClient is a viewer that
+the benchmark uses to check the stream against the game.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import bisect
+import os
+import queue
+import selectors
+import socket
+import struct
+import threading
+
+
+# The first byte of a message body
+MSG_KEY = ord('K')
+MSG_DELTA = ord('D')
+
+# The flags byte of a delta: which optional sections follow
+_FORMATION = 1
+_SHIP = 2
+_STATUS = 4
+
+_LENGTH = struct.Struct('<I')
+_HEAD = struct.Struct('<BIB')           # kind, tick, flags (or 0)
+_ORIGIN = struct.Struct('<ffB')         # origin x, origin y, frame
+_SHIPPOS = struct.Struct('<Bhh')        # alive, x, y
+_BOLT = struct.Struct('<hhbb')          # x, y, vx, vy
+_GRID = struct.Struct('<IIIffff')       # rows, cols, aliens, pitch x, pitch y,
+                                        # w, h
+
+
+def _varint(out, value):
+    """
+    Appends a non-negative int to out as a varint (7 bits per byte).
+
+    Parameter out: the message being built
+    Precondition: out is a bytearray
+
+    Parameter value: the value
+    Precondition: value is an int >= 0
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _readVarint(data, pos):
+    """
+    Returns (value, next position) of the varint at data[pos].
+
+    Parameter data: the message
+    Precondition: data is a bytes-like object
+
+    Parameter pos: the position of the varint
+    Precondition: pos is an int >= 0
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, pos)
+        shift += 7
+
+
+def _gaps(out, values):
+    """
+    Appends a list of distinct ints to out as a count and sorted gaps.
+
+    Parameter out: the message being built
+    Precondition: out is a bytearray
+
+    Parameter values: the values (sorted in place)
+    Precondition: values is a list of distinct ints >= 0
+    """
+    values.sort()
+    _varint(out, len(values))
+    last = -1
+    for value in values:
+        _varint(out, value - last - 1)
+        last = value
+
+
+def _readGaps(data, pos):
+    """
+    Returns (list of ints, next position) of a list written by _gaps.
+
+    Parameter data: the message
+    Precondition: data is a bytes-like object
+
+    Parameter pos: the position of the list
+    Precondition: pos is an int >= 0
+    """
+    count, pos = _readVarint(data, pos)
+    values = []
+    last = -1
+    for k in range(count):
+        gap, pos = _readVarint(data, pos)
+        last += gap + 1
+        values.append(last)
+    return (values, pos)
+
+
+def _quarter(value):
+    """
+    Returns a coordinate in quarter pixels, clamped to an int16.
+
+    Parameter value: the coordinate in pixels
+    Precondition: value is a number
+    """
+    return max(-32768, min(32767, round(value*4)))
+
+
+def _packBolt(out, bolt):
+    """
+    Appends the position and velocity of a bolt to out.
+
+    Parameter out: the message being built
+    Precondition: out is a bytearray
+
+    Parameter bolt: the bolt
+    Precondition: bolt is a Bolt
+    """
+    out += _BOLT.pack(_quarter(bolt.x), _quarter(bolt.y),
+    max(-128, min(127, round(bolt.getBoltVX()*4))),
+    max(-128, min(127, round(bolt.getBoltVelocity()*4))))
+
+
+class SpectatorFeed(object):
+    """
+    A class to encode a game for spectators, one tick at a time.
+
+    The feed observes the wave being played (see Wave.addObserver) to learn
+    which aliens died and which bolts came and went. publish turns that into a
+    delta and hands it, with a keyframe when needed, to the server thread.
+
+    INSTANCE ATTRIBUTES:
+        _server:   [SpectatorServer] the thread that sends to viewers
+        _wave:     [Wave or None] the wave being observed
+        _tick:     [int >= 0] the number of ticks published
+        _ids:      [dict of Bolt to int] the id of every bolt in play
+        _nextId:   [int >= 0] the id of the next bolt fired
+        _firstId:  [int >= 0] the id of the first bolt fired this tick
+        _fired:    [list of Bolt] the bolts fired this tick, in id order
+        _removed:  [list of int] the ids of bolts that left play this tick
+        _kills:    [list of int] the cells (row*cols + col) of aliens killed
+                   this tick
+        _last:     [tuple or None] (origin, frame, ship, status) as last sent,
+                   None to send them all
+        _sent:     [int >= 0] the bytes of deltas published, for reports
+    """
+
+    def getServer(self):
+        """
+        Returns the SpectatorServer thread.
+        """
+        return self._server
+
+    def getTick(self):
+        """
+        Returns the number of ticks published.
+        """
+        return self._tick
+
+    def getSent(self):
+        """
+        Returns the total bytes of deltas published.
+        """
+        return self._sent
+
+    def __init__(self, address):
+        """
+        Initializes a SpectatorFeed and starts its server thread.
+
+        Parameter address: a TCP port on SERVE_HOST (0 for any free port),
+        or the path of a Unix socket
+        Precondition: address is an int >= 0 or a string
+        """
+        self._server = SpectatorServer(address)
+        self._server.start()
+        self._wave = None
+        self._tick = 0
+        self._ids = {}
+        self._nextId = 0
+        self._firstId = 0
+        self._fired = []
+        self._removed = []
+        self._kills = []
+        self._last = None
+        self._sent = 0
+
+    def close(self):
+        """
+        Stops observing and stops the server thread.
+        """
+        if self._wave != None:
+            self._wave.removeObserver(self)
+            self._wave = None
+        self._server.stop()
+
+    # OBSERVER METHODS (see Wave.addObserver)
+    def alienKilled(self, row, col):
+        """
+        Records that an alien was shot.
+
+        Parameter row: the row of the alien
+        Precondition: row is an int >= 0
+
+        Parameter col: the column of the alien
+        Precondition: col is an int >= 0
+        """
+        self._kills.append(row*self._cols + col)
+
+    def boltFired(self, bolt):
+        """
+        Records that a bolt was put in play, giving it the next id.
+
+        Parameter bolt: the bolt
+        Precondition: bolt is a Bolt
+        """
+        self._ids[bolt] = self._nextId
+        self._nextId += 1
+        self._fired.append(bolt)
+
+    def boltRemoved(self, bolt):
+        """
+        Records that a bolt left play.
+
+        Parameter bolt: the bolt
+        Precondition: bolt is a Bolt that was fired
+        """
+        self._removed.append(self._ids.pop(bolt))
+
+    def publish(self, wave):
+        """
+        Sends the tick just played to the viewers.
+
+        Call this once after every Wave.update. A new wave (or a viewer that
+        just joined) gets a keyframe; everyone else gets a delta.
+
+        Parameter wave: the wave being played
+        Precondition: wave is a built Wave
+        """
+        self._tick += 1
+        if wave is not self._wave:
+            self._watch(wave)
+            self._server.send(self._keyframe(), True, True)
+            return
+        delta = self._delta()
+        self._sent += len(delta)
+        if self._server.wantsKeyframe():
+            self._server.send(delta, False, False)
+            self._server.send(self._keyframe(), True, False)
+        else:
+            self._server.send(delta, False, False)
+
+    def _watch(self, wave):
+        """
+        Starts observing a new wave, giving every bolt in play an id.
+
+        Parameter wave: the wave
+        Precondition: wave is a built Wave
+        """
+        if self._wave != None:
+            self._wave.removeObserver(self)
+        self._wave = wave
+        self._cols = wave.getFormation().getCols()
+        self._ids = {}
+        for bolt in wave.getBolts():
+            self._ids[bolt] = self._nextId
+            self._nextId += 1
+        self._firstId = self._nextId
+        self._fired = []
+        self._removed = []
+        self._kills = []
+        self._last = None
+        wave.addObserver(self)
+
+    def _state(self):
+        """
+        Returns (origin, frame, ship, status) for the wave, the values that
+        a delta sends only when they change.
+        """
+        wave = self._wave
+        ship = wave.getShip()
+        if ship == None:
+            ship = (0, 0, 0)
+        else:
+            ship = (1, _quarter(ship.getShipX()), _quarter(ship.getShipY()))
+        return (wave.getOrigin(), wave.getAlienFrame(), ship,
+        (wave.getScore(), wave.getLives(), wave.getResult()))
+
+    def _delta(self):
+        """
+        Returns the delta message for this tick and clears the tick's events.
+        """
+        state = self._state()
+        last = self._last
+        flags = 0
+        if last == None or state[0] != last[0] or state[1] != last[1]:
+            flags |= _FORMATION
+        if last == None or state[2] != last[2]:
+            flags |= _SHIP
+        if last == None or state[3] != last[3]:
+            flags |= _STATUS
+        self._last = state
+        out = bytearray(_LENGTH.size)
+        out += _HEAD.pack(MSG_DELTA, self._tick, flags)
+        if flags & _FORMATION:
+            out += _ORIGIN.pack(state[0][0], state[0][1], state[1])
+        if flags & _SHIP:
+            out += _SHIPPOS.pack(*state[2])
+        if flags & _STATUS:
+            _varint(out, state[3][0])
+            out.append(state[3][1])
+            out.append(state[3][2] & 0xFF)
+        _gaps(out, self._kills)
+        _varint(out, self._firstId)
+        _varint(out, len(self._fired))
+        for bolt in self._fired:
+            _packBolt(out, bolt)
+        _gaps(out, self._removed)
+        self._kills.clear()
+        self._fired.clear()
+        self._removed.clear()
+        self._firstId = self._nextId
+        _LENGTH.pack_into(out, 0, len(out) - _LENGTH.size)
+        return bytes(out)
+
+    def _keyframe(self):
+        """
+        Returns the keyframe message for the wave as it is now.
+
+        This looks at every alien and every bolt, so it is only made for a new
+        wave or a new viewer. The cells of the formation are sent as gaps, so
+        a full grid is a byte per alien.
+        """
+        wave = self._wave
+        aliens = wave.getAliens()
+        formation = wave.getFormation()
+        cells = formation.getCells()
+        out = bytearray(_LENGTH.size)
+        out += _HEAD.pack(MSG_KEY, self._tick, 0)
+        pitch = wave.getPitch()
+        size = wave.getAlienSize()
+        out += _GRID.pack(formation.getRows(), self._cols, len(cells),
+        pitch[0], pitch[1], size[0], size[1])
+        state = self._state()
+        out += _ORIGIN.pack(state[0][0], state[0][1], state[1])
+        last = -1
+        for cell in cells:
+            _varint(out, cell - last - 1)
+            last = cell
+        out += bytes(formation.getTypes())
+        alive = bytearray((len(cells) + 7)//8)
+        for k in range(len(aliens)):
+            if aliens[k] != None:
+                alive[k >> 3] |= 1 << (k & 7)
+        out += alive
+        out += _SHIPPOS.pack(*state[2])
+        _varint(out, state[3][0])
+        out.append(state[3][1])
+        out.append(state[3][2] & 0xFF)
+        ids = sorted((number, bolt) for bolt, number in self._ids.items())
+        _varint(out, len(ids))
+        for number, bolt in ids:
+            _varint(out, number)
+            _packBolt(out, bolt)
+        _LENGTH.pack_into(out, 0, len(out) - _LENGTH.size)
+        return bytes(out)
+
+
+class _Viewer(object):
+    """
+    A class to represent one connected viewer (server thread only).
+
+    INSTANCE ATTRIBUTES:
+        sock:     [socket] the connection
+        pending:  [list of bytes] messages not yet fully sent
+        offset:   [int >= 0] how much of pending[0] has been sent
+        size:     [int >= 0] the bytes in pending, less offset
+        synced:   [bool] True once the viewer has been sent a keyframe
+    """
+
+    def __init__(self, sock):
+        """
+        Initializes a viewer waiting for its keyframe.
+
+        Parameter sock: the connection
+        Precondition: sock is a non-blocking socket
+        """
+        self.sock = sock
+        self.pending = []
+        self.offset = 0
+        self.size = 0
+        self.synced = False
+
+
+class SpectatorServer(threading.Thread):
+    """
+    A class to represent the thread that sends the feed to every viewer.
+
+    The game thread calls send, which only puts the message on a queue. This
+    thread accepts viewers, copies each message to the viewers it is for and
+    writes as much as each socket will take.
+
+    INSTANCE ATTRIBUTES:
+        _listener: [socket] the listening socket
+        _path:     [str or None] the Unix socket path, None for TCP
+        _queue:    [SimpleQueue] (message, is keyframe, for everyone) tuples
+                   from the game thread, or None to stop
+        _viewers:  [list of _Viewer] the connected viewers
+        _want:     [bool] True while a viewer is waiting for a keyframe
+        _selector: [DefaultSelector] the sockets being watched
+        _wake:     [tuple of socket] a connected pair; send writes a byte to
+                   the second so the thread wakes up for every message
+    """
+
+    def getAddress(self):
+        """
+        Returns the address viewers connect to: a (host, port) pair for TCP,
+        or the socket path.
+        """
+        if self._path != None:
+            return self._path
+        return self._listener.getsockname()
+
+    def getViewerCount(self):
+        """
+        Returns the number of connected viewers.
+        """
+        return len(self._viewers)
+
+    def wantsKeyframe(self):
+        """
+        Returns True if a viewer is waiting for a keyframe.
+        """
+        return self._want
+
+    def __init__(self, address):
+        """
+        Initializes a SpectatorServer listening on address.
+
+        Parameter address: a TCP port on SERVE_HOST (0 for any free port),
+        or the path of a Unix socket
+        Precondition: address is an int >= 0 or a string
+        """
+        super().__init__(name = 'spectators', daemon = True)
+        if type(address) == int:
+            self._path = None
+            self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR,
+            1)
+            self._listener.bind((SERVE_HOST, address))
+        else:
+            self._path = address
+            if os.path.exists(address):
+                os.unlink(address)
+            self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._listener.bind(address)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._queue = queue.SimpleQueue()
+        self._viewers = []
+        self._want = False
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ)
+        self._wake = socket.socketpair()
+        self._wake[0].setblocking(False)
+        self._wake[1].setblocking(False)
+        self._selector.register(self._wake[0], selectors.EVENT_READ)
+
+    def send(self, message, keyframe, everyone):
+        """
+        Queues a message for the viewers (game thread).
+
+        A delta goes to the viewers that have had a keyframe. A keyframe goes
+        to the viewers waiting for one, or to everyone if it starts a new
+        wave.
+
+        Parameter message: the message
+        Precondition: message is a bytes object
+
+        Parameter keyframe: True if the message is a keyframe
+        Precondition: keyframe is a bool
+
+        Parameter everyone: True if every viewer needs this keyframe
+        Precondition: everyone is a bool
+        """
+        self._queue.put((message, keyframe, everyone))
+        self._signal()
+
+    def stop(self):
+        """
+        Stops the thread and closes every socket.
+        """
+        self._queue.put(None)
+        self._signal()
+        self.join(1)
+
+    def _signal(self):
+        """
+        Wakes the thread up (any thread).
+        """
+        try:
+            self._wake[1].send(b'\0')
+        except BlockingIOError:
+            pass
+
+    def run(self):
+        """
+        Serves viewers until stop is called.
+        """
+        while True:
+            for key, events in self._selector.select(FRAME_BUDGET):
+                if key.fileobj is self._listener:
+                    self._accept()
+                elif key.fileobj is self._wake[0]:
+                    self._wake[0].recv(4096)
+                else:
+                    self._read(key.data)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item == None:
+                    self._close()
+                    return
+                self._route(*item)
+            for viewer in list(self._viewers):
+                self._write(viewer)
+
+    def _accept(self):
+        """
+        Accepts a new viewer, which waits for the next keyframe.
+        """
+        try:
+            sock, address = self._listener.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        viewer = _Viewer(sock)
+        self._viewers.append(viewer)
+        self._selector.register(sock, selectors.EVENT_READ, viewer)
+        self._want = True
+
+    def _read(self, viewer):
+        """
+        Reads (and ignores) what a viewer sent, dropping it if it hung up.
+
+        Parameter viewer: the viewer
+        Precondition: viewer is a _Viewer
+        """
+        try:
+            data = viewer.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._drop(viewer)
+
+    def _route(self, message, keyframe, everyone):
+        """
+        Adds a message to the queue of every viewer it is for.
+
+        Parameter message: the message
+        Precondition: message is a bytes object
+
+        Parameter keyframe: True if the message is a keyframe
+        Precondition: keyframe is a bool
+
+        Parameter everyone: True if every viewer needs this keyframe
+        Precondition: everyone is a bool
+        """
+        for viewer in self._viewers:
+            if keyframe and (everyone or not viewer.synced):
+                self._trim(viewer)
+                viewer.synced = True
+            elif keyframe or not viewer.synced:
+                continue
+            elif viewer.size > SPECTATE_BACKLOG:
+                self._trim(viewer)
+                viewer.synced = False
+                continue
+            viewer.pending.append(message)
+            viewer.size += len(message)
+        self._want = any(not viewer.synced for viewer in self._viewers)
+
+    def _trim(self, viewer):
+        """
+        Drops the queued messages of a viewer, except one already started.
+
+        Parameter viewer: the viewer
+        Precondition: viewer is a _Viewer
+        """
+        if viewer.offset > 0:
+            del viewer.pending[1:]
+            viewer.size = len(viewer.pending[0]) - viewer.offset
+        else:
+            viewer.pending.clear()
+            viewer.size = 0
+
+    def _write(self, viewer):
+        """
+        Writes as much of a viewer's queue as its socket will take.
+
+        Parameter viewer: the viewer
+        Precondition: viewer is a _Viewer
+        """
+        while viewer.pending:
+            data = viewer.pending[0]
+            try:
+                sent = viewer.sock.send(memoryview(data)[viewer.offset:])
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                self._drop(viewer)
+                return
+            viewer.offset += sent
+            viewer.size -= sent
+            if viewer.offset < len(data):
+                return
+            viewer.pending.pop(0)
+            viewer.offset = 0
+
+    def _drop(self, viewer):
+        """
+        Disconnects a viewer.
+
+        Parameter viewer: the viewer
+        Precondition: viewer is a connected _Viewer
+        """
+        self._selector.unregister(viewer.sock)
+        viewer.sock.close()
+        self._viewers.remove(viewer)
+
+    def _close(self):
+        """
+        Disconnects every viewer and stops listening.
+        """
+        for viewer in list(self._viewers):
+            self._drop(viewer)
+        self._selector.unregister(self._listener)
+        self._listener.close()
+        self._selector.close()
+        self._wake[0].close()
+        self._wake[1].close()
+        if self._path != None and os.path.exists(self._path):
+            os.unlink(self._path)
+
+
+class SpectatorView(object):
+    """
+    A class to rebuild the game from a spectator stream.
+
+    Feed it the bytes as they arrive. Until the first keyframe it ignores
+    everything.
+
+    INSTANCE ATTRIBUTES:
+        tick:     [int >= 0] the tick of the last message applied
+        rows:     [int >= 0] the rows of the alien grid
+        cols:     [int >= 0] the columns of the alien grid
+        cells:    [list of int] the cell (row*cols + col) of each alien of the
+                  formation, increasing
+        pitch:    [tuple] (x, y) distance between columns and rows
+        size:     [tuple] (width, height) of an alien
+        origin:   [tuple] (x, y) of the alien cell at row 0, column 0
+        frame:    [0 or 1] the alien animation frame
+        types:    [list of int] the type of each alien, in the order of cells
+        alive:    [bytearray] one bit per alien, in the order of cells
+        count:    [int >= 0] the number of living aliens
+        ship:     [tuple] (alive, x, y), with x and y in pixels
+        score:    [int >= 0] the score
+        lives:    [int >= 0] the lives left
+        result:   [int] the result (see Wave.getResult)
+        bolts:    [dict of int to list] [x, y, vx, vy] of each bolt, by id,
+                  in pixels
+        synced:   [bool] True once a keyframe has been applied
+        _buffer:  [bytearray] bytes received but not yet a whole message
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty SpectatorView.
+        """
+        self.tick = 0
+        self.rows = 0
+        self.cols = 0
+        self.cells = []
+        self.pitch = (0, 0)
+        self.size = (0, 0)
+        self.origin = (0, 0)
+        self.frame = 0
+        self.types = []
+        self.alive = bytearray()
+        self.count = 0
+        self.ship = (0, 0, 0)
+        self.score = 0
+        self.lives = 0
+        self.result = 0
+        self.bolts = {}
+        self.synced = False
+        self._buffer = bytearray()
+
+    def isAlive(self, row, col):
+        """
+        Returns True if there is an alien at (row, col) and it is alive.
+
+        Parameter row: the row
+        Precondition: row is an int in 0..rows-1
+
+        Parameter col: the column
+        Precondition: col is an int in 0..cols-1
+        """
+        index = self._indexOf(row*self.cols + col)
+        return index >= 0 and (self.alive[index >> 3] >> (index & 7)) & 1 == 1
+
+    def feed(self, data):
+        """
+        Applies every whole message in the bytes received so far.
+
+        Parameter data: the bytes received
+        Precondition: data is a bytes-like object
+        """
+        self._buffer += data
+        pos = 0
+        while len(self._buffer) - pos >= _LENGTH.size:
+            length = _LENGTH.unpack_from(self._buffer, pos)[0]
+            end = pos + _LENGTH.size + length
+            if end > len(self._buffer):
+                break
+            body = memoryview(self._buffer)[pos+_LENGTH.size:end]
+            if body[0] == MSG_KEY:
+                self._applyKey(body)
+            elif self.synced:
+                self._applyDelta(body)
+            body.release()
+            pos = end
+        del self._buffer[:pos]
+
+    def _applyKey(self, body):
+        """
+        Replaces the whole state with a keyframe.
+
+        Parameter body: the message body
+        Precondition: body is a keyframe body
+        """
+        kind, self.tick, flags = _HEAD.unpack_from(body, 0)
+        pos = _HEAD.size
+        rows, cols, aliens, px, py, w, h = _GRID.unpack_from(body, pos)
+        pos += _GRID.size
+        self.rows, self.cols = rows, cols
+        self.pitch = (px, py)
+        self.size = (w, h)
+        ox, oy, self.frame = _ORIGIN.unpack_from(body, pos)
+        self.origin = (ox, oy)
+        pos += _ORIGIN.size
+        self.cells = []
+        last = -1
+        for k in range(aliens):
+            gap, pos = _readVarint(body, pos)
+            last += gap + 1
+            self.cells.append(last)
+        self.types = list(body[pos:pos+aliens])
+        pos += aliens
+        length = (aliens + 7)//8
+        self.alive = bytearray(body[pos:pos+length])
+        self.count = sum(bin(byte).count('1') for byte in self.alive)
+        pos += length
+        alive, x, y = _SHIPPOS.unpack_from(body, pos)
+        self.ship = (alive, x/4, y/4)
+        pos += _SHIPPOS.size
+        pos = self._readStatus(body, pos)
+        count, pos = _readVarint(body, pos)
+        self.bolts = {}
+        for k in range(count):
+            number, pos = _readVarint(body, pos)
+            pos = self._readBolt(body, pos, number)
+        self.synced = True
+
+    def _applyDelta(self, body):
+        """
+        Applies one tick of changes.
+
+        Parameter body: the message body
+        Precondition: body is a delta body
+        """
+        kind, self.tick, flags = _HEAD.unpack_from(body, 0)
+        pos = _HEAD.size
+        for bolt in self.bolts.values():
+            bolt[0] += bolt[2]
+            bolt[1] += bolt[3]
+        if flags & _FORMATION:
+            ox, oy, self.frame = _ORIGIN.unpack_from(body, pos)
+            self.origin = (ox, oy)
+            pos += _ORIGIN.size
+        if flags & _SHIP:
+            alive, x, y = _SHIPPOS.unpack_from(body, pos)
+            self.ship = (alive, x/4, y/4)
+            pos += _SHIPPOS.size
+        if flags & _STATUS:
+            pos = self._readStatus(body, pos)
+        kills, pos = _readGaps(body, pos)
+        for cell in kills:
+            index = self._indexOf(cell)
+            self.alive[index >> 3] &= ~(1 << (index & 7))
+        self.count -= len(kills)
+        first, pos = _readVarint(body, pos)
+        count, pos = _readVarint(body, pos)
+        for k in range(count):
+            pos = self._readBolt(body, pos, first + k)
+        removed, pos = _readGaps(body, pos)
+        for number in removed:
+            self.bolts.pop(number, None)
+
+    def _indexOf(self, cell):
+        """
+        Returns the index of the alien in a cell, or -1 if the cell has none.
+
+        Parameter cell: the cell
+        Precondition: cell is an int >= 0
+        """
+        index = bisect.bisect_left(self.cells, cell)
+        if index < len(self.cells) and self.cells[index] == cell:
+            return index
+        return -1
+
+    def _readStatus(self, body, pos):
+        """
+        Reads the score, lives and result; returns the next position.
+
+        Parameter body: the message body
+        Precondition: body is a message body
+
+        Parameter pos: the position of the status
+        Precondition: pos is an int >= 0
+        """
+        self.score, pos = _readVarint(body, pos)
+        self.lives = body[pos]
+        self.result = body[pos+1] if body[pos+1] < 128 else body[pos+1] - 256
+        return pos + 2
+
+    def _readBolt(self, body, pos, number):
+        """
+        Reads one bolt into bolts; returns the next position.
+
+        Parameter body: the message body
+        Precondition: body is a message body
+
+        Parameter pos: the position of the bolt
+        Precondition: pos is an int >= 0
+
+        Parameter number: the id of the bolt
+        Precondition: number is an int >= 0
+        """
+        x, y, vx, vy = _BOLT.unpack_from(body, pos)
+        self.bolts[number] = [x/4, y/4, vx/4, vy/4]
+        return pos + _BOLT.size
+
+
+class SpectatorClient(threading.Thread):
+    """
+    A class to watch a feed over a socket and check it against the game.
+
+    The client reads the stream on its own thread, like a real viewer, so a
+    slow check never holds up the game.
+
+    INSTANCE ATTRIBUTES:
+        _sock:     [socket] the connection to the SpectatorServer
+        _view:     [SpectatorView] the game as rebuilt from the stream
+        _received: [int >= 0] the bytes received
+        _ready:    [Condition] notified whenever the view changes
+    """
+
+    def getView(self):
+        """
+        Returns the SpectatorView.
+        """
+        return self._view
+
+    def __init__(self, address):
+        """
+        Initializes a SpectatorClient connected to address and starts it.
+
+        Parameter address: the address of a SpectatorServer
+        Precondition: address is the result of SpectatorServer.getAddress()
+        """
+        super().__init__(name = 'spectator-client', daemon = True)
+        family = socket.AF_UNIX if type(address) == str else socket.AF_INET
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.connect(address)
+        self._view = SpectatorView()
+        self._received = 0
+        self._ready = threading.Condition()
+        self.start()
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.join(1)
+
+    def run(self):
+        """
+        Reads the stream into the view until the connection closes.
+        """
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except OSError:
+                data = b''
+            with self._ready:
+                if data:
+                    self._received += len(data)
+                    self._view.feed(data)
+                self._ready.notify_all()
+            if not data:
+                return
+
+    def check(self, wave, tick):
+        """
+        Returns a report comparing the view with the wave at tick.
+
+        The report names every value that does not match. It waits at most a
+        second for the view to reach tick; a viewer that fell too far behind
+        is only sent a keyframe at the next tick, so it reports as behind.
+
+        Parameter wave: the wave being played
+        Precondition: wave is a built Wave
+
+        Parameter tick: the number of ticks published
+        Precondition: tick is an int >= 0
+        """
+        view = self._view
+        with self._ready:
+            self._ready.wait_for(lambda: view.synced and view.tick >= tick, 1)
+            if not view.synced or view.tick < tick:
+                return 'spectator tick %d: BEHIND at tick %d' % (tick,
+                view.tick)
+            wrong = []
+            if view.count != wave.getAlienCount():
+                wrong.append('aliens %d/%d' % (view.count,
+                wave.getAlienCount()))
+            if len(view.bolts) != wave.getBoltCount():
+                wrong.append('bolts %d/%d' % (len(view.bolts),
+                wave.getBoltCount()))
+            if view.score != wave.getScore() or view.lives != wave.getLives():
+                wrong.append('score %d/%d' % (view.score, wave.getScore()))
+            drift = 0
+            positions = sorted((b.x, b.y) for b in wave.getBolts())
+            rebuilt = sorted((b[0], b[1]) for b in view.bolts.values())
+            for mine, theirs in zip(positions, rebuilt):
+                drift = max(drift, abs(mine[0]-theirs[0]),
+                abs(mine[1]-theirs[1]))
+            received = self._received
+        result = 'OK' if not wrong else 'MISMATCH ' + ', '.join(wrong)
+        return ('spectator tick %d: %s, %.1f bytes per tick, bolt drift '
+        '%.2f px' % (tick, result, received/max(tick, 1), drift))
@@ -0,0 +1,228 @@
+"""
+Gameplay telemetry for Alien Invaders
+
+This module records what happens in a session (kills, ship hits, shots and
+state changes) and writes it to a file as JSON lines, one event per line,
+ending with a summary line for the session. For example
+
+    python invaders --telemetry session.jsonl
+
+The game thread never formats or writes anything. EventLog.emit stores five
+numbers in a ring of doubles made once, up front, and a background thread
+copies out whatever has built up every TELEMETRY_FLUSH seconds and writes it
+as one batch. If the game gets more than TELEMETRY_CAPACITY events ahead of
+the writer, the oldest are lost (and counted) instead of making the game wait.
+
+Code that can emit events keeps an EventLog, or None when nobody asked for
+telemetry (see Wave.setTelemetry). Without a log, an emit site costs one
+comparison with None.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+import array
+import json
+import os
+import threading
+import time
+
+
+# The name of each kind of event in the file
+EVENT_NAMES = {EVENT_KILL: 'kill', EVENT_HIT: 'hit', EVENT_SHOT: 'shot',
+               EVENT_STATE: 'state'}
+
+# The fields of each kind of event in the file
+EVENT_FIELDS = {EVENT_KILL: ('type', 'row', 'col'),
+                EVENT_HIT: ('lives', 'score', 'destroyed'),
+                EVENT_SHOT: ('side', 'bolts', 'col'),
+                EVENT_STATE: ('old', 'new', 'level')}
+
+# The doubles in one event: time, kind and three values
+_RECORD = 5
+# The events the writer copies and formats at a time
+_CHUNK  = 32
+
+
+class EventLog(object):
+    """
+    A class to collect gameplay events and write them out in the background.
+
+    Events go in a ring of TELEMETRY_CAPACITY records. Only the game thread
+    writes to the ring and only the writer thread reads it. The writer copies
+    a batch and then checks that the game did not lap it while copying,
+    throwing away any record that was overwritten.
+
+    INSTANCE ATTRIBUTES:
+        _ring:     [array of double] _RECORD doubles per event
+        _capacity: [int > 0] the number of events the ring holds
+        _head:     [int >= 0] the number of events ever emitted
+        _tail:     [int >= 0] the number of events the writer has taken
+        _start:    [float] the perf_counter value when the session started
+        _session:  [str] the name of the session in every line
+        _path:     [str] the file the events are appended to
+        _counts:   [dict] the events written, by name (and kills by alien
+                   type), for the summary line
+        _dropped:  [int >= 0] the events lost because the ring was full
+        _written:  [int >= 0] the events written to the file
+        _stopping: [Event] set to stop the writer
+        _thread:   [Thread] the writer
+    """
+
+    def getDropped(self):
+        """
+        Returns the number of events lost because the ring was full.
+        """
+        return self._dropped
+
+    def getWritten(self):
+        """
+        Returns the number of events written to the file.
+        """
+        return self._written
+
+    def __init__(self, path, capacity = None):
+        """
+        Initializes an EventLog appending to path, and starts its writer.
+
+        Parameter path: the file to append the events to
+        Precondition: path is a string
+
+        Parameter capacity: the events the ring holds (TELEMETRY_CAPACITY if
+        None)
+        Precondition: capacity is None or an int > 0
+        """
+        self._capacity = capacity or TELEMETRY_CAPACITY
+        self._ring = array.array('d', bytes(8*_RECORD*self._capacity))
+        self._head = 0
+        self._tail = 0
+        self._start = time.perf_counter()
+        self._session = '%d-%d' % (os.getpid(), int(time.time()))
+        self._path = path
+        self._counts = {}
+        self._dropped = 0
+        self._written = 0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target = self._run,
+        name = 'telemetry', daemon = True)
+        self._thread.start()
+
+    def emit(self, kind, a, b, c):
+        """
+        Records an event (game thread).
+
+        This only stores five numbers in the ring; it never allocates, locks
+        or waits for the writer.
+
+        Parameter kind: the kind of event
+        Precondition: kind is one of the EVENT constants
+
+        Parameter a: the first value (see the EVENT constants)
+        Precondition: a is a number
+
+        Parameter b: the second value
+        Precondition: b is a number
+
+        Parameter c: the third value
+        Precondition: c is a number
+        """
+        ring = self._ring
+        at = (self._head % self._capacity)*_RECORD
+        ring[at] = time.perf_counter() - self._start
+        ring[at+1] = kind
+        ring[at+2] = a
+        ring[at+3] = b
+        ring[at+4] = c
+        self._head += 1
+
+    def close(self):
+        """
+        Writes out every event left, then the summary line, and stops the
+        writer.
+        """
+        self._stopping.set()
+        self._thread.join()
+
+    def report(self):
+        """
+        Returns a one-line summary of the events written and lost.
+        """
+        return 'telemetry events=%d dropped=%d file=%s' % (self._written,
+        self._dropped, self._path)
+
+    def _run(self):
+        """
+        Writes a batch every TELEMETRY_FLUSH seconds until close is called.
+        """
+        with open(self._path, 'a') as file:
+            while not self._stopping.wait(TELEMETRY_FLUSH):
+                self._flush(file)
+            self._flush(file)
+            summary = {'session': self._session, 'event': 'summary',
+            't': round(time.perf_counter() - self._start, 4),
+            'written': self._written, 'dropped': self._dropped}
+            summary.update(self._counts)
+            file.write(json.dumps(summary) + '\n')
+
+    def _flush(self, file):
+        """
+        Writes every event emitted since the last batch to file.
+
+        Events are copied and formatted _CHUNK at a time, so the writer never
+        holds much memory (a long batch would otherwise show up as growth in
+        an allocation check).
+
+        Parameter file: the file to write to
+        Precondition: file is a text file open for writing
+        """
+        head = self._head
+        tail = self._tail
+        if head - tail > self._capacity:
+            self._dropped += head - tail - self._capacity
+            tail = head - self._capacity
+        while tail < head:
+            end = min(head, tail + _CHUNK)
+            chunk = []
+            for n in range(tail, end):
+                at = (n % self._capacity)*_RECORD
+                chunk.append(self._ring[at:at+_RECORD])
+            #Anything the game wrote over while we copied is no longer ours,
+            #nor is the slot it may be writing now (event _head, before the
+            #count moves on)
+            lapped = self._head - self._capacity + 1
+            if lapped > tail:
+                lost = min(lapped, end) - tail
+                self._dropped += lost
+                chunk = chunk[lost:]
+            self._write(file, chunk)
+            tail = end
+        self._tail = head
+        file.flush()
+
+    def _write(self, file, chunk):
+        """
+        Writes copied events to file as JSON lines.
+
+        Parameter file: the file to write to
+        Precondition: file is a text file open for writing
+
+        Parameter chunk: the events
+        Precondition: chunk is a list of arrays of _RECORD doubles
+        """
+        lines = []
+        for record in chunk:
+            kind = int(record[1])
+            name = EVENT_NAMES.get(kind)
+            if name == None:
+                continue
+            event = {'session': self._session, 'event': name,
+            't': round(record[0], 4)}
+            for field, value in zip(EVENT_FIELDS[kind], record[2:]):
+                event[field] = int(value)
+            lines.append(json.dumps(event) + '\n')
+            self._counts[name] = self._counts.get(name, 0) + 1
+            if kind == EVENT_KILL:
+                key = 'kills_type%d' % event['type']
+                self._counts[key] = self._counts.get(key, 0) + 1
+        self._written += len(lines)
+        file.write(''.join(lines))
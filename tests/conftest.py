@@ -0,0 +1,15 @@
+"""
+Test setup for Alien Invaders
+
+The game is a folder of flat modules, so the tests put that folder on the path.
+They also run every module headless (see SIM_ENV in config.py), so no test
+needs Kivy or a window.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+import os
+import sys
+
+os.environ['INVADERS_SIMULATION'] = '1'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,55 @@
+"""
+Tests for the input snapshots of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from perf import TimeScale
+import pytest
+
+
+def _playerBolts(wave):
+    """
+    Returns the number of player bolts in play in a wave.
+    """
+    return sum(1 for b in wave.getBolts() if b.isPlayerBolt())
+
+
+@pytest.mark.parametrize('keep', [True, False])
+def test_fire_tap_in_slow_motion(keep):
+    """
+    A fire tap on a frame that plays no tick fires on the next tick, as
+    Invaders._playActive plays the frames at 0.25x, and only with keepPresses.
+    """
+    wave = Wave(0, 0, waveFormation(0))
+    keys = InputSnapshot()
+    scale = TimeScale(0.25)
+    for frame in range(8):
+        #Fire is down for the first frame only, which plays no tick
+        keys.setMask(KEY_FIRE if frame == 0 else 0)
+        planned = scale.plan(FRAME_BUDGET)
+        for tick in range(planned):
+            if tick > 0:
+                keys.setMask(keys.getMask())
+            wave.update(keys, FRAME_BUDGET)
+        if planned == 0 and keep:
+            keys.keepPresses(KEY_PLAY)
+        scale.endTicks(planned, planned, FRAME_BUDGET)
+    assert _playerBolts(wave) == (1 if keep else 0)
+
+
+def test_kept_presses_are_reported_once():
+    """
+    Kept presses and releases join the next sample, and then are gone.
+    """
+    keys = InputSnapshot()
+    keys.setMask(KEY_FIRE | KEY_SLOWER)
+    keys.keepPresses(KEY_PLAY)
+    keys.setMask(KEY_LEFT)
+    assert keys.getPressed() == KEY_FIRE | KEY_LEFT
+    assert keys.getReleased() == KEY_FIRE | KEY_SLOWER
+    keys.setMask(KEY_LEFT)
+    assert keys.getPressed() == 0 and keys.getReleased() == 0
@@ -0,0 +1,113 @@
+"""
+Tests for the differential test and the state hash of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from difftest import EngineRun, InputScript, PART_NAMES
+import random
+
+
+class StrayWave(Wave):
+    """
+    A Wave that puts its first living alien a pixel out of place whenever the
+    formation steps, but keeps the origin and alive count right.
+    """
+
+    def _alienMove(self, dt):
+        """
+        Moves the aliens, then moves the first living alien a pixel right.
+        """
+        origin = self._originX
+        super()._alienMove(dt)
+        if self._originX != origin:
+            for a in self._aliens:
+                if a != None:
+                    a.setAlienX(a.getAlienX() + 1)
+                    break
+
+
+class FastBoltWave(Wave):
+    """
+    A Wave whose alien bolts fall a quarter pixel per tick too fast.
+    """
+
+    def _newBolt(self, bolt_x, bolt_y, speed, color, vx):
+        """
+        Puts a bolt in play, a little faster if it is an alien bolt.
+        """
+        if speed < 0:
+            speed -= 0.25
+        super()._newBolt(bolt_x, bolt_y, speed, color, vx)
+
+
+def _play(engine, rollback, ticks):
+    """
+    Returns (first tick whose hashes differ or None, Wave run, engine run)
+    after playing ticks seeded ticks through Wave and engine.
+    """
+    reference = EngineRun(Wave)
+    candidate = EngineRun(engine, rollback)
+    script = InputScript(DIFF_SEED)
+    for tick in range(ticks):
+        mask = script.nextKeys()
+        if reference.step(mask) != candidate.step(mask):
+            return (tick, reference, candidate)
+    return (None, reference, candidate)
+
+
+def test_rollback_plays_the_same():
+    """
+    Rolling back and playing ticks again hashes as the first time.
+    """
+    first, reference, candidate = _play(Wave, True, 1200)
+    assert first == None
+    assert candidate.getDrift() == None
+    assert reference.getChain() == candidate.getChain()
+
+
+def test_misplaced_alien_is_found():
+    """
+    One alien out of place is a difference in the aliens, at the first step.
+    """
+    first, reference, candidate = _play(StrayWave, False, 1200)
+    assert first != None
+    parts = [name for name, a, b in zip(PART_NAMES, reference.hashParts(),
+    candidate.hashParts()) if a != b]
+    assert parts == ['aliens']
+
+
+def test_fast_bolt_is_found_on_its_first_move():
+    """
+    An alien bolt that moves wrongly is a difference in the bolts, on the
+    first tick it moves.
+    """
+    run = EngineRun(Wave)
+    script = InputScript(DIFF_SEED)
+    moved = 0
+    while not any(not b.isPlayerBolt() for b in run.getWave().getBolts()):
+        run.step(script.nextKeys())
+        moved += 1
+    first, reference, candidate = _play(FastBoltWave, False, moved+1)
+    assert first == moved
+    parts = [name for name, a, b in zip(PART_NAMES, reference.hashParts(),
+    candidate.hashParts()) if a != b]
+    assert parts == ['bolts']
+
+
+def test_random_state_is_hashed():
+    """
+    The hash is of the state of the generator, so it also tells apart
+    numbers drawn from it outside the wave.
+    """
+    waves = []
+    for extra in (False, True):
+        wave = Wave(0, 0, waveFormation(0))
+        rng = random.Random(DIFF_SEED)
+        wave.setRandom(rng)
+        if extra:
+            rng.random()
+        waves.append(wave)
+    assert waves[0].stateHash() != waves[1].stateHash()
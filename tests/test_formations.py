@@ -0,0 +1,25 @@
+"""
+Tests for the wave formations of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from formations import Campaign
+import json
+
+
+def test_tall_campaign_shape_starts_playing(tmp_path):
+    """
+    A campaign shape taller than the playing field is scaled like a grid.
+    """
+    path = tmp_path / 'tall.json'
+    path.write_text(json.dumps({'waves': [{'shape': ['1        1']*10}]}))
+    formation = Campaign(str(path)).getFormation(0)
+    assert formation.getRows() == 10
+    wave = Wave(0, 0, formation)
+    wave.update(InputSnapshot(), FRAME_BUDGET)
+    assert wave.getResult() == 0
+    assert wave.getAlienCount() == 20
@@ -0,0 +1,36 @@
+"""
+Tests for the leaderboard of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from leaderboard import Leaderboard
+import sqlite3
+
+
+def test_writer_survives_a_failed_batch(tmp_path):
+    """
+    A batch the database refuses is counted, and later games are still written.
+    """
+    path = str(tmp_path / 'scores.db')
+    scores = Leaderboard(path)
+    scores.submit('ada', 10, 1)
+    assert scores.flush()
+    #Make every insert fail, as a full disk would
+    other = sqlite3.connect(path)
+    other.execute("CREATE TRIGGER full BEFORE INSERT ON scores "
+    "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    other.commit()
+    scores.submit('bob', 20, 1)
+    assert scores.flush(5)
+    assert scores.getFailed() == 1
+    assert scores.getError() == 'disk full'
+    other.execute('DROP TRIGGER full')
+    other.commit()
+    other.close()
+    scores.submit('cy', 30, 1)
+    assert scores.flush(5)
+    assert scores.top() == [('cy', 30, 1), ('ada', 10, 1)]
+    assert scores.rank(20) == 2
+    scores.close()
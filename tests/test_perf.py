@@ -0,0 +1,96 @@
+"""
+Tests for the performance checks of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from perf import AllocationCounter
+import gc
+import random
+import tracemalloc
+
+
+# The frames counted after warm-up
+FRAMES = 240
+
+
+class _BoltLeaker(Wave):
+    """
+    A wave that makes one new Bolt every frame and keeps them all.
+    """
+
+    def update(self, input, dt):
+        """
+        Plays a frame, and then makes a Bolt.
+        """
+        if not hasattr(self, '_spare'):
+            self._spare = []
+        Wave.update(self, input, dt)
+        self._spare.append(Bolt(-BOLT_WIDTH, -BOLT_HEIGHT, BOLT_WIDTH, BOLT_HEIGHT,
+        -BOLT_SPEED, 'red'))
+
+
+def _steer(keys, frame):
+    """
+    Sets the keys of a frame: the ship sweeps left and right, firing now and
+    then.
+
+    Parameter keys: the keys to set
+    Precondition: keys is an InputSnapshot
+
+    Parameter frame: the frame
+    Precondition: frame is an int >= 0
+    """
+    keys.setMask((KEY_FIRE if frame % 40 == 0 else 0) |
+    (KEY_LEFT if frame//90 % 2 else KEY_RIGHT))
+
+
+def _count(kind):
+    """
+    Returns an AllocationCounter that watched ALLOC_WARMUP + FRAMES frames of
+    a wave of class kind, while the ship sweeps the screen and fires now and
+    then.
+
+    Parameter kind: the class of the wave
+    Precondition: kind is Wave or a subclass of it
+    """
+    gc.disable()
+    try:
+        counter = AllocationCounter()
+        wave = kind(0, 0, waveFormation(0))
+        wave.setRandom(random.Random(DIFF_SEED))
+        wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH, SHIP_HEIGHT,
+        'ship.png'))
+        keys = InputSnapshot()
+        counter.restart()
+        for frame in range(ALLOC_WARMUP + FRAMES):
+            _steer(keys, frame)
+            counter.beginFrame()
+            wave.update(keys, FRAME_BUDGET)
+            counter.endFrame()
+        assert wave.getResult() == 0
+        assert wave.getShip() != None
+        return counter
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+
+
+def test_steady_frames_allocate_nothing():
+    """
+    Once a wave has warmed up, no frame takes more than the interpreter's
+    scratch from the allocator.
+    """
+    counter = _count(Wave)
+    assert counter.isPassing(), counter.report()
+
+
+def test_a_bolt_a_frame_is_caught():
+    """
+    A wave that keeps a new Bolt every frame fails, on the bytes it kept.
+    """
+    counter = _count(_BoltLeaker)
+    assert not counter.isPassing(), counter.report()
@@ -0,0 +1,29 @@
+"""
+Tests for the asset preloader of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from preload import *
+import pytest
+import struct
+import zlib
+
+
+def _chunk(tag, body):
+    """
+    Returns a PNG chunk (the CRC is not checked by the decoder).
+    """
+    return struct.pack('>I4s', len(body), tag) + body + b'\0\0\0\0'
+
+
+def test_png_without_header_is_a_value_error():
+    """
+    A PNG with no IHDR chunk is reported like any other bad image.
+    """
+    raw = b'\x89PNG\r\n\x1a\n' + _chunk(b'IDAT', zlib.compress(b'\0')) + \
+    _chunk(b'IEND', b'')
+    with pytest.raises(ValueError):
+        decodePNG(raw)
+
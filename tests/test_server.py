@@ -0,0 +1,102 @@
+"""
+Tests for the game server of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from server import *
+import asyncio
+
+
+async def _replies(reader, count):
+    """
+    Returns the next count replies from the server, unpacked.
+
+    Parameter reader: the client side of the connection
+    Precondition: reader is an asyncio StreamReader
+
+    Parameter count: the number of replies to read
+    Precondition: count is an int > 0
+    """
+    data = await asyncio.wait_for(reader.readexactly(REPLY.size*count), 5)
+    return [REPLY.unpack_from(data, k*REPLY.size) for k in range(count)]
+
+
+def test_bots_play_every_frame():
+    """
+    Scripted bot sessions on localhost are each ticked once per frame.
+    """
+    async def play():
+        server = GameServer(0)
+        await server.start()
+        loop = asyncio.get_running_loop()
+        transport, client = await loop.create_connection(BotClient,
+        SERVE_HOST, server.getPort())
+        await client.play(4, 30)
+        report = server.lagReport()
+        transport.close()
+        await server.stop()
+        return server, client, report
+
+    server, client, report = asyncio.run(play())
+    assert client.getErrors() == 0
+    assert server.getTicks() == 4*30
+    states = client.getStates()
+    assert sorted(states) == [0, 1, 2, 3]
+    for session_id, state in states.items():
+        kind, reply_id, tick, score, lives, result, ship, lag = state
+        assert (kind, reply_id, tick) == (MSG_STATE, session_id, 30)
+        assert score >= 0 and 0 <= lives <= SHIP_LIVES
+        assert result in (0, 1, 2) and ship in (0, 1)
+        assert lag < 1e6
+    assert report.startswith('sessions=4 ticks=120 ')
+    assert ' lag p50=' in report
+
+
+def test_idle_sessions_errors_and_lag():
+    """
+    Idle sessions are not ticked, unknown ids get MSG_ERROR, and each tick
+    reports how long its input frame waited.
+    """
+    async def play():
+        server = GameServer(0)
+        await server.start()
+        reader, writer = await asyncio.open_connection(SERVE_HOST,
+        server.getPort())
+        writer.write(REQUEST.pack(MSG_OPEN, 1, 0) + REQUEST.pack(MSG_OPEN, 2, 0))
+        opened = await _replies(reader, 2)
+        #Unknown sessions, and a second OPEN of a session that is open
+        writer.write(REQUEST.pack(MSG_INPUT, 9, 0) +
+        REQUEST.pack(MSG_SHIP, 9, 0) + REQUEST.pack(MSG_OPEN, 1, 0))
+        errors = await _replies(reader, 3)
+        #Three frames at once for session 1; session 2 stays idle
+        writer.write(REQUEST.pack(MSG_INPUT, 1, 0)*3)
+        ticked = await _replies(reader, 3)
+        idle_ticks = server.getTicks()
+        idle_report = server.lagReport()
+        writer.write(REQUEST.pack(MSG_INPUT, 2, 0))
+        woken = await _replies(reader, 1)
+        writer.write(REQUEST.pack(MSG_CLOSE, 1, 0) +
+        REQUEST.pack(MSG_INPUT, 1, 0))
+        closed = await _replies(reader, 1)
+        writer.close()
+        await server.stop()
+        return opened, errors, ticked, idle_ticks, idle_report, woken, closed
+
+    opened, errors, ticked, idle_ticks, idle_report, woken, closed = \
+    asyncio.run(play())
+    for session_id, state in zip((1, 2), opened):
+        assert state == (MSG_STATE, session_id, 0, 0, SHIP_LIVES, 0, 1, 0)
+    assert [(e[0], e[1]) for e in errors] == [(MSG_ERROR, 9), (MSG_ERROR, 9),
+    (MSG_ERROR, 1)]
+    assert [(t[0], t[1], t[2]) for t in ticked] == [(MSG_STATE, 1, 1),
+    (MSG_STATE, 1, 2), (MSG_STATE, 1, 3)]
+    #One frame per session per pass, so the last frame waited two passes
+    lags = [t[7] for t in ticked]
+    assert lags[0] < lags[1] < lags[2]
+    assert lags[2] >= FRAME_BUDGET*1e6
+    assert idle_ticks == 3
+    assert idle_report.startswith('sessions=1 ticks=3 ')
+    assert (woken[0][0], woken[0][1], woken[0][2]) == (MSG_STATE, 2, 1)
+    assert (closed[0][0], closed[0][1]) == (MSG_ERROR, 1)
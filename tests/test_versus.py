@@ -0,0 +1,44 @@
+"""
+Tests for the rollback versus mode of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from versus import RollbackSession
+import threading
+
+# The ticks of the test game (five seconds at 60 per second)
+TICKS = 300
+
+
+def test_sides_agree_through_lag_and_jitter():
+    """
+    Both sides, over loopback with 50 ms of lag give or take 20 ms, end in the
+    same state, and their rollbacks fit in the budget.
+    """
+    sides = [RollbackSession(side, 0.05, 0.02) for side in ('ship', 'aliens')]
+    passed = [None, None]
+
+    def play(k):
+        """
+        Plays side k and records whether it passed.
+        """
+        passed[k] = sides[k].play(TICKS)
+
+    threads = [threading.Thread(target = play, args = (k,)) for k in (0, 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(VERSUS_TIMEOUT*3)
+    for side in sides:
+        side.close()
+    ship, aliens = sides
+    assert ship.getTick() == aliens.getTick() == TICKS
+    assert ship.getResult() != None
+    assert ship.getResult() == aliens.getResult()
+    for side in sides:
+        #The lag is three frames, so predictions must have been corrected
+        assert side.getRollbacks() > 0
+        assert side.getRollbackTime(0.95) <= VERSUS_ROLLBACK*FRAME_BUDGET
+    assert passed == [True, True]
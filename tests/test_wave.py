@@ -0,0 +1,117 @@
+"""
+Tests for the Wave of Alien Invaders
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from formations import gridFormation
+import pytest
+
+
+@pytest.mark.parametrize('rows', [5, 10, 11, 12, 20, 40])
+def test_tall_grid_starts_playing(rows):
+    """
+    A grid of any height is scaled to start above the defense line.
+    """
+    wave = Wave(0, 0, gridFormation(rows, 15))
+    wave.update(InputSnapshot(), FRAME_BUDGET)
+    assert wave.getResult() == 0
+    origin = wave.getOrigin()[1]
+    assert origin - wave.getPitch()[1]/2 > DEFENSE_LINE
+
+
+class KillLog(object):
+    """
+    An observer of a Wave that notes the cell of every alien killed.
+
+    INSTANCE ATTRIBUTES:
+        kills: [list of (int, int)] the (row, col) of each kill, in order
+    """
+
+    def __init__(self):
+        """
+        Initializes a KillLog with no kills.
+        """
+        self.kills = []
+
+    def alienKilled(self, row, col):
+        """
+        Notes the kill of the alien at (row, col).
+        """
+        self.kills.append((row, col))
+
+    def boltFired(self, bolt):
+        """
+        Ignores a bolt put in play.
+        """
+        pass
+
+    def boltRemoved(self, bolt):
+        """
+        Ignores a bolt leaving play.
+        """
+        pass
+
+
+def _shootMiddle(wave, shots):
+    """
+    Fires shots bolts, one at a time, straight up through the column in the
+    middle of the screen, and returns that column.
+
+    Each bolt is moved from the ship up to the defense line, between the
+    middle two bunkers, and aimed at the middle of the column. A ship shot
+    down by the aliens is replaced before the next bolt.
+
+    Parameter wave: the wave to shoot at
+    Precondition: wave is a classic Wave
+
+    Parameter shots: the number of bolts
+    Precondition: shots is an int >= 0
+    """
+    col = round((GAME_WIDTH/2 - wave.getOrigin()[0])/wave.getPitch()[0])
+    keys = InputSnapshot()
+    for shot in range(shots):
+        if wave.getShip() == None:
+            wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+        keys.setMask(KEY_FIRE)
+        wave.update(keys, FRAME_BUDGET)
+        keys.setMask(0)
+        bolt = [b for b in wave.getBolts() if b.isPlayerBolt()][0]
+        bolt.x = wave.getOrigin()[0] + col*wave.getPitch()[0]
+        bolt.setBoltY(DEFENSE_LINE)
+        while bolt in wave.getBolts() and wave.getResult() == 0:
+            wave.update(keys, FRAME_BUDGET)
+    return col
+
+
+@pytest.mark.parametrize('rows', [5, 40, 140])
+def test_bolt_hits_lowest_alien_in_its_path(rows):
+    """
+    A bolt kills the lowest living alien of its column, even when it moves
+    further than a row in one update. (The bolt can be wider than a column
+    of a big formation, and the formation walks, so the column may vary.)
+    """
+    wave = Wave(0, 0, gridFormation(rows, 4*rows))
+    log = KillLog()
+    wave.addObserver(log)
+    _shootMiddle(wave, 4)
+    assert len(log.kills) == 4
+    for n in range(len(log.kills)):
+        row, killed = log.kills[n]
+        assert row == sum(1 for k in log.kills[:n] if k[1] == killed)
+
+
+def test_update_without_ship_after_the_wave_is_lost():
+    """
+    Alien bolts far below the screen are never compared with a missing ship.
+    """
+    wave = Wave(0, 0, gridFormation(5, 12))
+    keys = InputSnapshot()
+    while wave.getOrigin()[1] > -2*GAME_HEIGHT:
+        wave.update(keys, ALIEN_SPEED)
+    assert wave.getShip() == None
+    assert wave.getResult() == 1
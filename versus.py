@@ -0,0 +1,609 @@
+"""
+Two-player versus mode for Alien Invaders
+
+In a versus game a second player, in another process, controls the aliens:
+every tick they choose the column the aliens fire from, instead of the random
+pick in Wave._alienBolts. It is what runs for
+
+    python invaders --versus both --lag 40 --jitter 15 --bench 1800
+
+which plays the ship side here and starts the alien side in a second process,
+with every packet between them delayed by 40 ms, give or take 15 ms. The two
+sides can also be started on their own, with --versus ship and --versus
+aliens. Both sides are headless and scripted: the ship is flown by the
+benchmark script (or the Autopilot, with --autopilot), and the aliens by a bot
+that fires from the column above the ship and now and then from a random one.
+
+The game uses rollback networking. Both sides play the same deterministic
+Wave, each with its own input and the other's. A side never waits for the
+other's input: it predicts that the other side still holds what it last
+sent, and plays on. Each side saves the state of play before every tick
+(Wave.saveState). When an input arrives that differs from what was
+predicted, the side restores the state before that tick and plays the ticks
+since then again with the right input. A side may run VERSUS_WINDOW ticks
+ahead of the other's input at most; beyond that it stalls until input
+arrives, so it never has to roll back further than it has saved.
+
+Inputs go over UDP on SERVE_HOST, one packet per tick. A packet carries every
+input the other side has not yet confirmed (up to VERSUS_INPUTS), so lost and
+reordered packets only cost time. The ship input is its key bitmask, and the
+alien input is a column, or AIM_HOLD to hold fire. Lost lives are replaced on
+the next tick and finished waves and games start over at once, inside the
+tick, so rollbacks can cross them.
+
+A rollback only works if saving and replaying several ticks fits well inside
+one frame, so every rollback is timed. At the end each side reports the
+rollbacks, the ticks played again and the 95th percentile and worst rollback
+times, and passes if that percentile fits in VERSUS_ROLLBACK of FRAME_BUDGET.
+The sides also swap a CRC of their final state, which must match.
+
+Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
+Date: May 7, 2019
+"""
+from consts import *
+from wave import *
+from controls import *
+from perf import pauseCollector, resumeCollector
+from bench import scriptKeys
+import array
+import heapq
+import multiprocessing
+import random
+import socket
+import struct
+import sys
+import time
+import zlib
+
+
+# The header of a versus packet: the kind and two numbers
+_PACKET = struct.Struct('<BII')
+
+# The kinds of versus packet
+PACKET_INPUTS = 1   # the tick of the first input that follows, and the
+                    # number of the receiver's inputs the sender has
+PACKET_DONE   = 2   # the ticks played, and the CRC-32 of the final state
+
+
+def aimColumn(wave, rng):
+    """
+    Returns the alien input the bot chooses: a column, or AIM_HOLD.
+
+    The bot fires from the column nearest the ship, except on a VERSUS_WILD
+    share of the ticks, when it picks any column. It holds fire while the
+    ship is gone.
+
+    Parameter wave: the wave in play
+    Precondition: wave is a Wave
+
+    Parameter rng: the bot's random numbers (not the wave's)
+    Precondition: rng is a random.Random
+    """
+    ship = wave.getShip()
+    if ship == None:
+        return AIM_HOLD
+    cols = wave.getFormation().getCols()
+    if rng.random() < VERSUS_WILD:
+        return rng.randint(0, cols-1)
+    col = round((ship.getShipX() - wave.getOrigin()[0])/wave.getPitch()[0])
+    return min(max(col, 0), cols-1)
+
+
+class RollbackSession(object):
+    """
+    A class to play one side of a versus game against another process.
+
+    Inputs are kept for every tick, as array('H'). The remote inputs below
+    _confirmed arrived from the other side; the ones from there up to _tick
+    were predicted. _states is a ring of VERSUS_WINDOW saved states: slot
+    t % VERSUS_WINDOW holds the state before tick t.
+
+    INSTANCE ATTRIBUTES:
+        _side:      [str] 'ship' or 'aliens', the side played here
+        _socket:    [socket] the UDP socket of this side
+        _peer:      [tuple] the address of the other side
+        _lag:       [float >= 0] the simulated one-way delay in seconds
+        _jitter:    [float >= 0] the most the delay varies either way
+        _outbox:    [list] a heap of (due time, number, packet) waiting out
+                    the simulated delay
+        _posted:    [int >= 0] the packets put in the outbox
+        _noise:     [random.Random] the bot's and the jitter's random numbers
+        _pilot:     [Autopilot or None] flies the ship (ship side, with
+                    AUTOPILOT)
+        _input:     [HeadlessInput] the keys of the ship script
+        _keys:      [InputSnapshot] the ship keys of the tick being played
+        _wave:      [Wave] the wave in play
+        _level:     [int >= 0] the waves completed in this game
+        _waves:     [int >= 0] the waves started, which seeds each wave
+        _games:     [int >= 0] the games finished
+        _tick:      [int >= 0] the ticks played
+        _local:     [array of unsigned short] this side's input per tick
+        _remote:    [array of unsigned short] the other side's input per tick
+        _confirmed: [int >= 0] the remote inputs that have arrived
+        _acked:     [int >= 0] the local inputs the other side has
+        _states:    [list] the saved states, VERSUS_WINDOW of them
+        _rollback:  [int or None] the first tick that was played with a wrong
+                    prediction, None if there is none
+        _times:     [array of double] rollback times in seconds, a ring of
+                    VERSUS_SAMPLES
+        _rollbacks: [int >= 0] the rollbacks made
+        _replayed:  [int >= 0] the ticks played again by rollbacks
+        _deepest:   [int >= 0] the most ticks one rollback played again
+        _saving:    [float >= 0] the seconds spent saving states
+        _saves:     [int >= 0] the states saved
+        _stalls:    [int >= 0] the frames that waited for remote input
+        _result:    [int or None] the CRC of the final state, None until the
+                    last tick is confirmed
+        _peerResult: [tuple or None] the (ticks, CRC) the other side sent
+    """
+
+    def getTick(self):
+        """
+        Returns the number of ticks played.
+        """
+        return self._tick
+
+    def getWave(self):
+        """
+        Returns the wave in play.
+        """
+        return self._wave
+
+    def getResult(self):
+        """
+        Returns the CRC of the final state, or None until the last tick is
+        confirmed.
+        """
+        return self._result
+
+    def getRollbacks(self):
+        """
+        Returns the number of rollbacks made.
+        """
+        return self._rollbacks
+
+    def getRollbackTime(self, share):
+        """
+        Returns a percentile of the kept rollback times in seconds, 0 if there
+        are none.
+
+        Parameter share: the percentile, 1 for the worst
+        Precondition: share is a number in 0..1
+        """
+        n = min(self._rollbacks, VERSUS_SAMPLES)
+        if n == 0:
+            return 0.0
+        ordered = sorted(self._times[:n])
+        return ordered[min(int(share*n), n-1)]
+
+    def __init__(self, side, lag = 0, jitter = 0):
+        """
+        Initializes a RollbackSession at the first tick of a new game.
+
+        Parameter side: the side to play
+        Precondition: side is 'ship' or 'aliens'
+
+        Parameter lag: the simulated one-way delay in seconds
+        Precondition: lag is a number >= 0
+
+        Parameter jitter: the most the delay varies either way, in seconds
+        Precondition: jitter is a number >= 0
+        """
+        self._side = side
+        ports = (VERSUS_PORT, VERSUS_PORT+1)
+        if side == 'aliens':
+            ports = (VERSUS_PORT+1, VERSUS_PORT)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((SERVE_HOST, ports[0]))
+        self._socket.setblocking(False)
+        self._peer = (SERVE_HOST, ports[1])
+        self._lag = lag
+        self._jitter = jitter
+        self._outbox = []
+        self._posted = 0
+        self._noise = random.Random()
+        self._pilot = None
+        if AUTOPILOT and side == 'ship':
+            from autopilot import Autopilot
+            self._pilot = Autopilot()
+        self._input = HeadlessInput()
+        self._keys = InputSnapshot()
+        self._level = 0
+        self._waves = 0
+        self._games = 0
+        self._wave = self._newWave(0, 0)
+        self._tick = 0
+        self._local = array.array('H')
+        self._remote = array.array('H')
+        self._confirmed = 0
+        self._acked = 0
+        self._states = [None]*VERSUS_WINDOW
+        self._rollback = None
+        self._times = array.array('d', bytes(8*VERSUS_SAMPLES))
+        self._rollbacks = 0
+        self._replayed = 0
+        self._deepest = 0
+        self._saving = 0.0
+        self._saves = 0
+        self._stalls = 0
+        self._result = None
+        self._peerResult = None
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self._socket.close()
+
+    def play(self, ticks):
+        """
+        Plays ticks ticks at 60 per second against the other side.
+
+        Returns True if the other side finished too, with the same final
+        state. This waits up to VERSUS_TIMEOUT seconds for the other side to
+        start, and as long again for it to finish.
+
+        Parameter ticks: the ticks to play
+        Precondition: ticks is an int > 0
+        """
+        if not self._connect():
+            print('versus %s: the other side never answered' % self._side)
+            return False
+        pauseCollector()
+        deadline = time.perf_counter()
+        linger = VERSUS_LINGER
+        stop = None
+        while linger > 0:
+            self._poll()
+            if self._rollback != None:
+                self._rollBack()
+            if self._tick < ticks:
+                if self._tick - self._confirmed < VERSUS_WINDOW:
+                    self._advance()
+                else:
+                    self._stalls += 1
+            elif self._confirmed >= ticks and self._result == None:
+                self._result = zlib.crc32(repr(self.summary()).encode())
+                stop = time.perf_counter() + VERSUS_TIMEOUT
+            self._sendInputs()
+            if self._result != None:
+                self._post(_PACKET.pack(PACKET_DONE, ticks, self._result))
+                if self._peerResult != None:
+                    linger -= 1
+                elif time.perf_counter() > stop:
+                    break
+            self._flush()
+            deadline += FRAME_BUDGET
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+        #Let the last delayed packets go out
+        while self._outbox:
+            time.sleep(FRAME_BUDGET/4)
+            self._flush()
+        resumeCollector()
+        print(self.report(ticks))
+        return self.isPassing(ticks)
+
+    def summary(self):
+        """
+        Returns a tuple that sums up the state of play, for the final CRC.
+        """
+        wave = self._wave
+        ship = wave.getShip()
+        return (self._tick, self._waves, self._games, self._level,
+        wave.getScore(), wave.getLives(), wave.getAlienCount(),
+        wave.getResult(), None if ship == None else ship.getShipX(),
+        wave.getOrigin(), wave.saveState()[5])
+
+    def isPassing(self, ticks):
+        """
+        Returns True if both sides ended in the same state and rollbacks fit
+        in VERSUS_ROLLBACK of FRAME_BUDGET.
+
+        Parameter ticks: the ticks the game was to last
+        Precondition: ticks is an int > 0
+        """
+        return self._peerResult == (ticks, self._result) and \
+        self.getRollbackTime(0.95) <= VERSUS_ROLLBACK*FRAME_BUDGET
+
+    def report(self, ticks):
+        """
+        Returns a one line summary of the rollbacks and the final state.
+
+        Parameter ticks: the ticks the game was to last
+        Precondition: ticks is an int > 0
+        """
+        n = min(self._rollbacks, VERSUS_SAMPLES)
+        mean = sum(self._times[:n])/n if n > 0 else 0
+        save = self._saving/self._saves if self._saves > 0 else 0
+        if self._peerResult == None:
+            sync = 'NO ANSWER'
+        elif self._peerResult == (ticks, self._result):
+            sync = 'MATCH'
+        else:
+            sync = 'MISMATCH'
+        return 'versus side=%s ticks=%d waves=%d lag=%.0fms jitter=%.0fms ' \
+        'rollbacks=%d replayed=%d deepest=%d rollback mean=%.3fms ' \
+        'p95=%.3fms worst=%.3fms save=%.3fms stalls=%d sync=%s %s' % \
+        (self._side, self._tick, self._waves, self._lag*1000,
+        self._jitter*1000, self._rollbacks, self._replayed, self._deepest,
+        mean*1000, self.getRollbackTime(0.95)*1000,
+        self.getRollbackTime(1)*1000, save*1000, self._stalls, sync,
+        'PASS' if self.isPassing(ticks) else 'FAIL')
+
+    def _connect(self):
+        """
+        Says hello until the other side answers, for up to VERSUS_TIMEOUT
+        seconds. Returns True if it answered.
+        """
+        stop = time.perf_counter() + VERSUS_TIMEOUT
+        while time.perf_counter() < stop:
+            self._sendInputs()
+            self._flush()
+            if self._poll():
+                return True
+            time.sleep(FRAME_BUDGET)
+        return False
+
+    def _newWave(self, level, score):
+        """
+        Returns a new wave, with random numbers seeded by the wave count.
+
+        Parameter level: the waves completed in this game
+        Precondition: level is an int >= 0
+
+        Parameter score: the score the wave starts with
+        Precondition: score is an int >= 0
+        """
+        wave = Wave(level, score, waveFormation(level))
+        wave.setRandom(random.Random(VERSUS_SEED + self._waves))
+        self._waves += 1
+        return wave
+
+    def _inputs(self, tick):
+        """
+        Returns the (ship keys, alien column or -1) of a tick.
+
+        Parameter tick: the tick
+        Precondition: tick is an int in 0.._tick, with both inputs known or
+        predicted
+        """
+        if self._side == 'ship':
+            keys = self._local[tick]
+            aim = self._remote[tick]
+        else:
+            keys = self._remote[tick]
+            aim = self._local[tick]
+        return (keys, -1 if aim == AIM_HOLD else aim)
+
+    def _predict(self):
+        """
+        Returns the predicted remote input: the last one that arrived.
+        """
+        if self._confirmed > 0:
+            return self._remote[self._confirmed-1]
+        return AIM_HOLD if self._side == 'ship' else 0
+
+    def _advance(self):
+        """
+        Chooses this side's input for the next tick and plays it.
+        """
+        wave = self._wave
+        if self._side == 'aliens':
+            local = aimColumn(wave, self._noise)
+        elif self._pilot != None:
+            local = self._pilot.decide(wave)
+        else:
+            self._input.setKeys(scriptKeys(self._tick))
+            local = packKeys(self._input)
+        self._local.append(local)
+        if self._tick >= len(self._remote):
+            self._remote.append(self._predict())
+        self._play(self._tick)
+        self._tick += 1
+
+    def _play(self, tick):
+        """
+        Saves the state before a tick, then plays the tick.
+
+        A ship that was lost is replaced first, and a wave that is over is
+        followed by the next one (or a new game).
+
+        Parameter tick: the tick
+        Precondition: tick is an int >= 0 with both inputs known or predicted
+        """
+        start = time.perf_counter()
+        self._states[tick % VERSUS_WINDOW] = (self._wave,
+        self._wave.saveState(), self._level, self._waves, self._games)
+        self._saving += time.perf_counter() - start
+        self._saves += 1
+        wave = self._wave
+        if wave.getResult() == 2:
+            self._level += 1
+            self._wave = self._newWave(self._level, wave.getScore())
+        elif wave.getResult() == 1:
+            self._games += 1
+            self._level = 0
+            self._wave = self._newWave(0, 0)
+        elif wave.getShip() == None:
+            wave.setShip(Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH,
+            SHIP_HEIGHT, 'ship.png'))
+        keys, aim = self._inputs(tick)
+        self._keys.setMask(keys)
+        self._wave.setAim(aim)
+        self._wave.update(self._keys, FRAME_BUDGET)
+
+    def _rollBack(self):
+        """
+        Restores the state before the first mispredicted tick and plays the
+        ticks since then again, then records how long that took.
+
+        The remote inputs that are still unknown are predicted again from the
+        newest one.
+        """
+        start = time.perf_counter()
+        first = self._rollback
+        self._rollback = None
+        (self._wave, state, self._level, self._waves, self._games) = \
+        self._states[first % VERSUS_WINDOW]
+        self._wave.loadState(state)
+        #The snapshot must see the keys of the tick before, for key presses
+        self._keys.setMask(self._inputs(first-1)[0] if first > 0 else 0)
+        for tick in range(first, self._tick):
+            if tick >= self._confirmed:
+                self._remote[tick] = self._predict()
+            self._play(tick)
+        self._times[self._rollbacks % VERSUS_SAMPLES] = \
+        time.perf_counter() - start
+        self._rollbacks += 1
+        self._replayed += self._tick - first
+        self._deepest = max(self._deepest, self._tick - first)
+
+    def _poll(self):
+        """
+        Reads every packet that has arrived. Returns True if there was one.
+        """
+        got = False
+        while True:
+            try:
+                data = self._socket.recv(_PACKET.size + 2*VERSUS_INPUTS)
+            except (BlockingIOError, ConnectionRefusedError):
+                return got
+            got = True
+            if len(data) < _PACKET.size:
+                continue
+            kind, a, b = _PACKET.unpack_from(data)
+            if kind == PACKET_INPUTS:
+                self._acked = max(self._acked, b)
+                self._receive(a, array.array('H', data[_PACKET.size:]))
+            elif kind == PACKET_DONE:
+                self._peerResult = (a, b)
+
+    def _receive(self, first, inputs):
+        """
+        Takes in remote inputs, noting the first one that was mispredicted.
+
+        Parameter first: the tick of the first input
+        Precondition: first is an int >= 0
+
+        Parameter inputs: the inputs, one per tick from first on
+        Precondition: inputs is an array of unsigned short
+        """
+        for k in range(len(inputs)):
+            tick = first + k
+            if tick < self._confirmed:
+                continue
+            if tick > self._confirmed:
+                break
+            value = inputs[k]
+            if tick < self._tick:
+                if self._remote[tick] != value:
+                    self._remote[tick] = value
+                    if self._rollback == None or tick < self._rollback:
+                        self._rollback = tick
+            else:
+                self._remote.append(value)
+            self._confirmed += 1
+
+    def _sendInputs(self):
+        """
+        Sends the local inputs the other side does not have yet.
+        """
+        end = min(self._tick, self._acked + VERSUS_INPUTS)
+        self._post(_PACKET.pack(PACKET_INPUTS, self._acked, self._confirmed) +
+        self._local[self._acked:end].tobytes())
+
+    def _post(self, packet):
+        """
+        Sends a packet after the simulated delay.
+
+        Parameter packet: the packet
+        Precondition: packet is a bytes object
+        """
+        delay = self._lag
+        if self._jitter > 0:
+            delay += self._noise.uniform(-self._jitter, self._jitter)
+        if delay <= 0:
+            self._sendNow(packet)
+            return
+        heapq.heappush(self._outbox, (time.perf_counter() + delay,
+        self._posted, packet))
+        self._posted += 1
+
+    def _flush(self):
+        """
+        Sends the delayed packets that are due.
+        """
+        now = time.perf_counter()
+        while self._outbox and self._outbox[0][0] <= now:
+            self._sendNow(heapq.heappop(self._outbox)[2])
+
+    def _sendNow(self, packet):
+        """
+        Sends a packet to the other side at once.
+
+        A side that is not listening yet (or any more) just loses the packet.
+
+        Parameter packet: the packet
+        Precondition: packet is a bytes object
+        """
+        try:
+            self._socket.sendto(packet, self._peer)
+        except OSError:
+            pass
+
+
+def _playSide(side, ticks):
+    """
+    Plays one side of a versus game and exits with status 1 if it failed.
+
+    This is the target of the second process of --versus both.
+
+    Parameter side: the side to play
+    Precondition: side is 'ship' or 'aliens'
+
+    Parameter ticks: the ticks to play
+    Precondition: ticks is an int > 0
+    """
+    session = RollbackSession(side, VERSUS_LAG, VERSUS_JITTER)
+    passed = session.play(ticks)
+    session.close()
+    if not passed:
+        sys.exit(1)
+
+
+def runVersus(side, ticks):
+    """
+    Plays a versus game headless and prints the reports.
+
+    Returns True if every side played here passed.
+
+    Parameter side: the side to play, or 'both' to play the ship here and
+    the aliens in a second process
+    Precondition: side is 'ship', 'aliens' or 'both'
+
+    Parameter ticks: the ticks to play
+    Precondition: ticks is an int > 0
+    """
+    print('versus side=%s mode=%s ticks=%d' % (side, GAME_MODE, ticks))
+    try:
+        session = RollbackSession('ship' if side == 'both' else side,
+        VERSUS_LAG, VERSUS_JITTER)
+    except OSError as e:
+        print('versus: cannot listen on port %d (%s)' % (VERSUS_PORT, e))
+        return False
+    other = None
+    if side == 'both':
+        context = multiprocessing.get_context('spawn')
+        other = context.Process(target = _playSide, args = ('aliens', ticks),
+        daemon = True)
+        other.start()
+    passed = session.play(ticks)
+    session.close()
+    if other != None:
+        other.join(VERSUS_TIMEOUT)
+        passed = passed and other.exitcode == 0
+    return passed
@@ -15,15 +15,101 @@ complicated issue.  If you do not know, ask on Piazza and we will answer.
 Authors: Zain Khoja (znk4), Gracie Jing (kgj7)
 Date: May 7, 2019
 """
-from game2d import *
+from backend import *
 from consts import *
 from models import *
+from particles import *
+from bunkers import *
+from hud import *
+from formations import *
+import math
+import operator
 import random
+import time
 
 # PRIMARY RULE: Wave can only access attributes in models.py via getters/setters
 # Wave is NOT allowed to access anything in app.py (Subcontrollers are not permitted
 # to access anything in their parent. To see why, take CS 3152)
 
+# The coordinates of a model, to hash every alien in one pass (see _alienHash)
+_X = operator.attrgetter('x')
+_Y = operator.attrgetter('y')
+
+
+def waveFormation(level):
+    """
+    Returns the Formation for a level.
+
+    With --waves, this is wave level of the campaign (see formations.py); in
+    endless mode the campaign starts over after its last wave. Otherwise it
+    is the full grid, and only endless mode grows it. There, rows and columns
+    each grow by ENDLESS_GROWTH per level, starting from ALIEN_ROWS and
+    ALIENS_IN_ROW, until the formation would hold more than ENDLESS_MAX_ALIENS
+    aliens.
+
+    Parameter level: the number of waves completed
+    Precondition: level is an int >= 0
+    """
+    if WAVES != None:
+        campaign = openCampaign(WAVES)
+        return campaign.getFormation(level % campaign.getCount())
+    rows = ALIEN_ROWS
+    cols = ALIENS_IN_ROW
+    if GAME_MODE == MODE_ENDLESS:
+        for n in range(level):
+            bigger_rows = int(rows*ENDLESS_GROWTH + 0.999)
+            bigger_cols = int(cols*ENDLESS_GROWTH + 0.999)
+            if bigger_rows*bigger_cols > ENDLESS_MAX_ALIENS:
+                break
+            rows = bigger_rows
+            cols = bigger_cols
+    return gridFormation(rows, cols)
+
+
+def _boltHash(bolt):
+    """
+    Returns the hash of where a bolt is, for Wave.stateHash.
+
+    Parameter bolt: the bolt
+    Precondition: bolt is a Bolt
+    """
+    return hash((bolt.getBoltX(), bolt.getBoltY()))
+
+
+def _putBack(pool, free, bolt):
+    """
+    Returns the number of bolts ready for reuse after bolt goes back to pool.
+
+    The bolt takes the slot after the free ones, and only grows the list if
+    every slot is taken.
+
+    Parameter pool: the pool
+    Precondition: pool is a list of Bolt
+
+    Parameter free: the number of bolts at the front of pool ready for reuse
+    Precondition: free is an int, 0 <= free <= len(pool)
+
+    Parameter bolt: the bolt that left play
+    Precondition: bolt is a Bolt
+    """
+    if free < len(pool):
+        pool[free] = bolt
+    else:
+        pool.append(bolt)
+    return free + 1
+
+
+def finalLevel():
+    """
+    Returns the level whose wave wins a game that is not endless.
+
+    That is the last wave of the campaign with --waves, or the last of
+    GAME_WAVES grids.
+    """
+    if WAVES != None:
+        return openCampaign(WAVES).getCount() - 1
+    return GAME_WAVES - 1
+
 
 class Wave(object):
     """
@@ -44,7 +130,8 @@ class Wave(object):
     #UPDATE ME LATER
     INSTANCE ATTRIBUTES:
         _ship:   [Ship object] the player ship to control
-        _aliens: [2D list of Alien or None] the 2d list of aliens in the wave
+        _aliens: [list of Alien or None] the aliens in the wave, one per cell
+                 of _formation in the same order (None for a dead alien)
         _bolts:  [list of Bolt]the laser bolts currently on screen
         _dline:  [GPath object] the defensive line being protected
         _lives:  [int >= 0] the number of lives left
@@ -65,14 +152,68 @@ class Wave(object):
     LIST MORE ATTRIBUTES (AND THEIR INVARIANTS) HERE IF NECESSARY
     _direction:    [str] tracks whether aliens are moving left or right
     _go_down:      [bool] tracks whether the aliens have moved down
-    _last:         [bool] tracks if 's' was pressed during the last frame
-    _steps:        [int] number between 1 and BOLT_RATE that represents
+    _formation:    [Formation] the cells and types of the aliens
+    _steps:        [int] number between 1 and _boltRate that represents
+    _boltRate:     [int > 0] the most alien steps between alien bolts
     _result:       [int] tracks if player is playing (0), lost (1), won (2)
     _speed:        [int] tracks the current threshhold of _time for each step
     _mute:         [bool] determines whether sound is on or off
     _score:        [int] tracks the player's score
-    _scoreLabel:   [GLabel object] prints the player's score on the screen
+    _scoreLabel:   [ScoreLabel object] prints the player's score on the screen
     _spriteList:   [list of GSprite objects] sprites for Alien animation
+    _originX:      [number] x-coordinate of the alien cell at row 0, column 0
+                   (the cell moves with the formation even if its alien is dead)
+    _originY:      [number] y-coordinate of the alien cell at row 0, column 0
+    _rows:         [int >= 1] the number of rows in the formation
+    _cols:         [int >= 1] the number of aliens per row in the formation
+    _alienW:       [number > 0] the width of an alien (ALIEN_WIDTH, scaled
+                   down so that large formations fit on screen)
+    _alienH:       [number > 0] the height of an alien, scaled like _alienW
+    _sepX:         [number > 0] horizontal separation between aliens (scaled)
+    _pitchX:       [number > 0] distance between neighbouring columns
+    _pitchY:       [number > 0] distance between neighbouring rows
+    _walkX:        [number > 0] pixels moved by one horizontal alien step
+    _walkY:        [number > 0] pixels moved by one downward alien step
+    _alive:        [int >= 0] the number of living aliens
+    _colAlive:     [list of int >= 0] the number of living aliens per column
+    _rowAlive:     [list of int >= 0] the number of living aliens per row
+    _particles:    [ParticleSystem, or None if NumPy is not installed or the
+                   run is headless] the explosions of dead aliens and ships
+    _bunkers:      [list of Bunker] the shields above the defense line, left to
+                   right, centered at multiples of GAME_WIDTH/(BUNKER_COUNT+1)
+    _pending:      [generator, or None once the wave is built] the rest of the
+                   formation and bolt pools still to be built (see buildStep)
+    _playerPool:   [list of Bolt] player bolts out of play; the first
+                   _playerFree are ready for reuse, and the list never
+                   shrinks, so a bolt going back never has to grow it
+    _playerFree:   [int >= 0] the number of player bolts ready for reuse
+    _alienPool:    [list of Bolt] alien bolts out of play, kept like
+                   _playerPool
+    _alienFree:    [int >= 0] the number of alien bolts ready for reuse
+    _frame:        [0 or 1] the animation frame of every living alien
+    _observers:    [list] the objects told about kills and bolts (see
+                   addObserver); usually empty
+    _telemetry:    [EventLog or None] where kills, hits and shots are
+                   recorded (see setTelemetry); None records nothing
+    _shots:        [int >= 0] the number of shots the ship has fired
+    _detail:       [int] the optional work shed, one of the SHED constants
+                   (see setDetail)
+    _offsetX:      [list of number] for each alien in _aliens, its distance
+                   from _originX (its column times _pitchX)
+    _offsetY:      [list of number] for each alien, its distance from _originY
+    _random:       [random.Random or the random module] where the random
+                   columns and bolt delays come from (see setRandom)
+    _aim:          [int or None] the column the aliens fire from, -1 to hold
+                   fire, or None for a random column (see setAim)
+    _ticks:        [int >= 0] the number of updates played
+    _randomHashed: [int or None] the hash of the state of _random, None to
+                   hash it again after a number was drawn (see _randint)
+    _aliensHashed: [int or None] the hash of where every living alien is,
+                   None to hash them again (see _alienHash)
+    _boltsHashed:  [int] the sum of the hashes of where the bolts in play
+                   are, masked with HASH_MASK (see _boltHash)
+    _bunkersHashed: [int or None] the hash of the bunker rows, None to hash
+                   them again (see _bunkerHash)
     """
 
     # GETTERS AND SETTERS (ONLY ADD IF YOU NEED THEM)
@@ -109,49 +250,289 @@ class Wave(object):
         """
         return self._score
 
+    def getAlienCount(self):
+        """
+        Returns the number of living aliens.
+        """
+        return self._alive
+
+    def getBoltCount(self):
+        """
+        Returns the number of laser bolts currently on screen.
+        """
+        return len(self._bolts)
+
+    def getAliens(self):
+        """
+        Returns the list of aliens (None for a dead alien), one per cell of
+        getFormation() and in the same order.
+
+        The list is the wave's own; do not change it.
+        """
+        return self._aliens
+
+    def getFormation(self):
+        """
+        Returns the Formation the wave started with.
+        """
+        return self._formation
+
+    def getBottomAlien(self, col):
+        """
+        Returns the lowest living alien in a column, or None if it has none.
+
+        Parameter col: the column
+        Precondition: col is an int in 0..cols-1
+        """
+        if self._colAlive[col] == 0:
+            return None
+        for row in range(self._rows):
+            index = self._formation.indexOf(row, col)
+            if index >= 0 and self._aliens[index] != None:
+                return self._aliens[index]
+        return None
+
+    def getBolts(self):
+        """
+        Returns the list of bolts on screen.
+
+        The list is the wave's own; do not change it.
+        """
+        return self._bolts
+
+    def getShotCount(self):
+        """
+        Returns the number of shots the ship has fired (a spread counts once).
+        """
+        return self._shots
+
+    def getBunkers(self):
+        """
+        Returns the list of bunkers, left to right.
+        """
+        return self._bunkers
+
+    def getOrigin(self):
+        """
+        Returns (x, y) of the alien cell at row 0, column 0.
+
+        Every alien is at getOrigin() plus its column and row times getPitch().
+        """
+        return (self._originX, self._originY)
+
+    def getPitch(self):
+        """
+        Returns (x, y) distance between neighbouring columns and rows.
+        """
+        return (self._pitchX, self._pitchY)
+
+    def getAlienSize(self):
+        """
+        Returns (width, height) of an alien in this wave.
+        """
+        return (self._alienW, self._alienH)
+
+    def getAlienFrame(self):
+        """
+        Returns the animation frame (0 or 1) of every living alien.
+        """
+        return self._frame
+
+    def addObserver(self, observer):
+        """
+        Adds an object to be told what happens in the wave.
+
+        The observer is called as the events happen, inside update:
+
+            observer.alienKilled(row, col)  an alien was shot
+            observer.boltFired(bolt)        a bolt was put in play
+            observer.boltRemoved(bolt)      a bolt left play
+
+        With no observers these cost one check of an empty list.
+
+        Parameter observer: the observer
+        Precondition: observer has the three methods above
+        """
+        self._observers.append(observer)
+
+    def removeObserver(self, observer):
+        """
+        Stops telling an observer what happens in the wave.
+
+        Parameter observer: the observer
+        Precondition: observer was added with addObserver
+        """
+        self._observers.remove(observer)
+
+    def setTelemetry(self, log):
+        """
+        Sets where the wave records kills, ship hits and shots.
+
+        Parameter log: the event log, or None to record nothing
+        Precondition: log is an EventLog or None
+        """
+        self._telemetry = log
+
+    def setDetail(self, level):
+        """
+        Sets how much optional work the wave sheds (see FrameGovernor).
+
+        At SHED_ANIMATION the aliens stop changing frame as they walk, at
+        SHED_HUD the score label is refreshed every HUD_INTERVAL draws, and at
+        SHED_SOUND the alien sounds are muted. The game plays the same at
+        every level.
+
+        Parameter level: the governor level
+        Precondition: level is one of the SHED constants
+        """
+        if level != self._detail:
+            self._detail = level
+            self._scoreLabel.setInterval(HUD_INTERVAL if level >= SHED_HUD
+            else 1)
+
+    def setRandom(self, rng):
+        """
+        Sets where the wave gets its random numbers, and draws the delay to
+        the first alien bolt again from it.
+
+        Two waves given generators in the same state (and the same input)
+        play exactly the same, which is what versus.py relies on.
+
+        Parameter rng: the random numbers
+        Precondition: rng is a random.Random (or the random module)
+        """
+        self._random = rng
+        self._randomHashed = None
+        self._steps = self._randint(self._boltRate)
+
+    def setAim(self, col):
+        """
+        Sets the column the aliens fire from, instead of a random one.
+
+        In bullet-hell mode it is the first of the volley columns. A column
+        with no living alien does not fire.
+
+        Parameter col: the column, -1 to hold fire, or None for random columns
+        Precondition: col is None or an int >= -1
+        """
+        self._aim = col
+
+    def isBuilt(self):
+        """
+        Returns True if every row of aliens and the bolt pools have been built.
+        """
+        return self._pending == None
+
     # INITIALIZER (standard form) TO CREATE SHIP AND ALIENS
-    def __init__(self, num_waves, wave_score):
+    def __init__(self, num_waves, wave_score, formation = None, lazy = False):
         """
         Initializes an Wave object.
 
+        Formations larger than the standard grid are scaled down uniformly so
+        that they still fit between ALIEN_CEILING and the defense line. A
+        formation with its own speed or bolt rate uses them instead of the
+        defaults.
+
+        A lazy Wave starts with no aliens. The formation is built a few rows at
+        a time by calls to buildStep, so Invaders can prepare the next wave in
+        the idle time of a pause screen. A lazy Wave must be finished with
+        buildStep(None) before it is updated or drawn.
+
         OBJECT ATTRIBUTES
             num_waves:  [int] contains the wave number
             wave_score: [int] contains the player's score
+            formation:  [Formation or None] the aliens, None for
+                        waveFormation(num_waves)
+            lazy:       [bool] True to build the aliens later with buildStep
         """
+        if formation == None:
+            formation = waveFormation(num_waves)
         self._ship = Ship(GAME_WIDTH/2, SHIP_BOTTOM, SHIP_WIDTH, SHIP_HEIGHT,
         'ship.png')
-        self._aliens = self._populate_aliens()
+        self._sizeFormation(formation)
+        self._aliens = []
+        self._offsetX = []
+        self._offsetY = []
         self._bolts = []
+        self._playerPool = []
+        self._playerFree = 0
+        self._alienPool = []
+        self._alienFree = 0
+        self._frame = 0
+        self._observers = []
+        self._telemetry = None
+        self._detail = SHED_NONE
+        self._pending = self._build()
+        if not lazy:
+            self.buildStep(None)
         self._dline = GPath(points=[0, DEFENSE_LINE, GAME_WIDTH, DEFENSE_LINE],
         linewidth = 1, linecolor = [0.5, 0.5, 0.5, 1.0])
         self._lives = SHIP_LIVES
         self._time = ALIEN_SPEED
         self._direction = 'right'
         self._go_down = False
-        self._last = False
-        self._steps = random.randint(0, BOLT_RATE)
+        self._shots = 0
+        self._boltRate = formation.getBoltRate() or BOLT_RATE
+        self._random = random
+        self._aim = None
+        self._ticks = 0
+        self._randomHashed = None
+        self._aliensHashed = None
+        self._boltsHashed = 0
+        self._bunkersHashed = None
+        self._steps = self._randint(self._boltRate)
         self._result = 0
-        if num_waves != 0:
+        if formation.getSpeed() != None:
+            self._speed = formation.getSpeed()
+        elif num_waves != 0:
             self._speed = ALIEN_SPEED/(num_waves+1)
         else:
             self._speed = ALIEN_SPEED
         self._mute = 1
         self._score = wave_score
-        self._scoreLabel = GLabel(text="Score: " + str(self._score),
-        font_name = 'Arcade.ttf', font_size = 36, linecolor = 'white',
-        x = ALIEN_H_SEP+100, y = GAME_HEIGHT-ALIEN_V_SEP-25)
+        self._scoreLabel = ScoreLabel(self._score, ALIEN_H_SEP+20,
+        GAME_HEIGHT-ALIEN_V_SEP-25, SCORE_SIZE)
+        #Explosions are only for show, so headless runs skip them (and NumPy)
+        self._particles = None
+        if not HEADLESS:
+            self._particles = ParticleSystem.create()
+        self._bunkers = []
+        for k in range(BUNKER_COUNT):
+            self._bunkers.append(Bunker(GAME_WIDTH*(k+1)/(BUNKER_COUNT+1),
+            BUNKER_Y))
+
+    # METHOD TO BUILD A LAZY WAVE
+    def buildStep(self, budget):
+        """
+        Builds rows of aliens (then pooled bolts) for about budget seconds.
+
+        Returns True if the wave is complete. A row is never left half built,
+        so a step can run over budget by the time of one row.
+
+        Parameter budget: the time to spend in seconds, or None to finish
+        Precondition: budget is None or a number > 0
+        """
+        if self._pending == None:
+            return True
+        start = time.perf_counter()
+        for row in self._pending:
+            if budget != None and time.perf_counter() - start >= budget:
+                return False
+        self._pending = None
+        return True
 
     # UPDATE METHOD TO MOVE THE SHIP, ALIENS, AND LASER BOLTS
     def update(self, input, dt):
         """
         Animates a single frame in the game.
 
-        Parameter input: an input passed down from invaders
-        Precondition: a valid input
+        Parameter input: the keys of this frame, passed down from invaders
+        Precondition: input is an InputSnapshot
 
         Parameter dt: The time in seconds since last update
         Precondition: dt is a number (int or float)
         """
+        self._ticks += 1
         if self._ship != None:
             self._ship.moveShip(input)
         self._alienMove(dt)
@@ -160,6 +541,21 @@ class Wave(object):
         self._detectCollisions()
         self._checkResults()
         self._changeVolume(input)
+        self.updateEffects(dt)
+
+    def updateEffects(self, dt):
+        """
+        Advances the explosions by dt seconds.
+
+        update does this every frame. Invaders also calls it on the pause
+        and game over screens, where the wave is not updated, so the burst
+        of a lost ship plays out instead of hanging in the air.
+
+        Parameter dt: The time in seconds since last update
+        Precondition: dt is a number (int or float)
+        """
+        if self._particles != None:
+            self._particles.update(dt)
 
     # DRAW METHOD TO DRAW THE SHIP, ALIENS, DEFENSIVE LINE AND BOLTS
     def draw(self, view):
@@ -171,93 +567,457 @@ class Wave(object):
         """
         if self._ship != None:      #Draw ship
             self._ship.draw(view)
-        for row in self._aliens:    #Draw aliens
-            for alien in row:
-                if alien != None:
-                    alien.draw(view)
+        for alien in self._aliens:  #Draw aliens
+            if alien != None:
+                alien.draw(view)
         self._dline.draw(view)      #Draw defense line
+        for bunker in self._bunkers:  #Draw bunkers
+            bunker.draw(view)
         for b in self._bolts:       #Draw bolts
             b.draw(view)
+        if self._particles != None: #Draw explosions
+            self._particles.draw(view)
         #Draw score
         if self._scoreLabel != None:
             self._scoreLabel.draw(view)
 
+    # METHODS TO SAVE AND RESTORE PLAY (see versus.py)
+    def saveState(self):
+        """
+        Returns everything update can change, for loadState.
+
+        This is the ship, which aliens are alive and where the formation is,
+        the bolts, the bunker bitmaps, the counters and timers of the wave and
+        the state of its random numbers. Aliens and ships are kept by
+        reference, and the rest as plain numbers, so saving costs a few list
+        copies plus a tuple per bolt. Explosions are only for show and are
+        not saved.
+        """
+        ship_x = None
+        if self._ship != None:
+            ship_x = self._ship.getShipX()
+        bolts = []
+        for b in self._bolts:
+            bolts.append((b.getBoltX(), b.getBoltY(), b.getBoltVelocity(),
+            b.getBoltVX()))
+        bunkers = []
+        for bunker in self._bunkers:
+            bunkers.append(tuple(bunker.getRows()))
+        return (self._ship, ship_x, list(self._aliens), list(self._colAlive),
+        list(self._rowAlive), bolts, bunkers, self._originX, self._originY,
+        self._lives, self._time, self._direction, self._go_down, self._shots,
+        self._steps, self._result, self._speed, self._score, self._frame,
+        self._alive, self._mute, self._aim, self._random.getstate(),
+        self._randomHashed, self._ticks)
+
+    def loadState(self, state):
+        """
+        Puts the wave back as it was when saveState returned state.
+
+        Parameter state: the saved state
+        Precondition: state was returned by saveState of this wave
+        """
+        (self._ship, ship_x, aliens, col_alive, row_alive, bolts, bunkers,
+        self._originX, self._originY, self._lives, self._time, self._direction,
+        self._go_down, self._shots, self._steps, self._result, self._speed,
+        self._score, self._frame, self._alive, self._mute, self._aim,
+        random_state, self._randomHashed, self._ticks) = state
+        self._aliensHashed = None
+        self._bunkersHashed = None
+        if self._ship != None:
+            self._ship.setShipX(ship_x)
+        self._aliens[:] = aliens
+        self._colAlive[:] = col_alive
+        self._rowAlive[:] = row_alive
+        for index in range(len(aliens)):
+            a = aliens[index]
+            if a != None:
+                a.setAlienX(self._originX + self._offsetX[index])
+                a.setAlienY(self._originY + self._offsetY[index])
+                a.frame = self._frame
+        for b in self._bolts:
+            self._releaseBolt(b)
+        del self._bolts[:]
+        for bolt_x, bolt_y, speed, vx in bolts:
+            self._newBolt(bolt_x, bolt_y, speed, 'green' if speed > 0 else
+            'red', vx)
+        for k in range(len(bunkers)):
+            self._bunkers[k].setRows(bunkers[k])
+        self._random.setstate(random_state)
+        self._scoreLabel.setValue(self._score)
+
+    # METHODS TO HASH PLAY (see difftest.py)
+    def stateHash(self):
+        """
+        Returns a hash of everything update can change, as an unsigned 64-bit
+        int.
+
+        Two waves that hash the same after every tick played the same game.
+        This is the hash of one flat tuple: the hashes of the aliens, the
+        bolts, the bunkers and the random numbers, the ship x (-1 with no
+        ship; a ship never leaves the height it was made at), then the
+        counters (see hashParts). Only numbers go into it, so the hash is the
+        same in every process and every run.
+
+        Every part but the ship and the counters is kept from tick to tick and
+        only worked out again where it changed, so a tick does not look at
+        every bolt or alien. The aliens are hashed again, from where they
+        actually are, after the formation steps or one dies, the bunkers after
+        one is hit, and the random numbers after a number was drawn. The bolt
+        hash is the sum of the hashes of where each bolt is: it is worked out
+        again as the bolts move, every tick, and a bolt adds its hash when it
+        is put in play and takes it away when it leaves. So a bolt that moves
+        wrongly shows on the tick it does.
+        """
+        ship = self._ship
+        ship_x = -1
+        if ship != None:
+            ship_x = ship.getShipX()
+        aliens = self._aliensHashed
+        if aliens == None:
+            aliens = self._alienHash()
+        bunkers = self._bunkersHashed
+        if bunkers == None:
+            bunkers = self._bunkerHash()
+        drawn = self._randomHashed
+        if drawn == None:
+            drawn = self._randomHash()
+        return hash((aliens, self._boltsHashed, bunkers, drawn, ship_x,
+        self._ticks, self._originX, self._originY, self._frame, self._alive,
+        self._speed, self._time, self._steps, self._score, self._lives,
+        self._result, self._direction == 'right', self._go_down, self._shots,
+        self._mute, -2 if self._aim == None else self._aim)) & HASH_MASK
+
+    def hashParts(self):
+        """
+        Returns the hashes of the parts of the state, to tell which part of
+        two states differs.
+
+        The parts are the aliens (x and y of each living alien), the bolts
+        (see stateHash), the ship (x and y, or -1), the counters, the bunkers
+        (the rows of each) and the random numbers, in that order. The counters
+        are the ticks, origin, alien frame, alive count, _speed, _time,
+        _steps, _score, _lives, _result, direction, _go_down, shots, mute and
+        aim.
+        """
+        ship = -1
+        if self._ship != None:
+            ship = hash((self._ship.getShipX(), self._ship.getShipY()))
+        return (self._alienHash(), self._boltsHashed, ship,
+        hash(self._counters()), self._bunkerHash(), self._randomHash())
+
+    def _alienHash(self):
+        """
+        Returns the hash of the x and y of every living alien.
+
+        The aliens are read where they are, not placed from the origin, so an
+        alien out of place changes the hash. (They all show the same frame,
+        which is a counter.) It is only worked out again after the formation
+        stepped or an alien died.
+        """
+        if self._aliensHashed == None:
+            aliens = [a for a in self._aliens if a != None]
+            self._aliensHashed = hash((*map(_X, aliens), *map(_Y, aliens)))
+        return self._aliensHashed
+
+    def _randomHash(self):
+        """
+        Returns the hash of the state of _random.
+
+        It is only worked out again after a number was drawn.
+        """
+        if self._randomHashed == None:
+            self._randomHashed = hash(self._random.getstate()[1])
+        return self._randomHashed
+
+    def _bunkerHash(self):
+        """
+        Returns the hash of the rows of every bunker.
+
+        It is only worked out again after a bunker was hit.
+        """
+        if self._bunkersHashed == None:
+            rows = []
+            for bunker in self._bunkers:
+                rows.extend(bunker.getRows())
+            self._bunkersHashed = hash(tuple(rows))
+        return self._bunkersHashed
+
+    def _counters(self):
+        """
+        Returns the counters and timers of the wave as a tuple of numbers.
+        """
+        return (self._ticks, self._originX, self._originY, self._frame,
+        self._alive, self._speed, self._time, self._steps, self._score,
+        self._lives, self._result, self._direction == 'right', self._go_down,
+        self._shots, self._mute, -2 if self._aim == None else self._aim)
+
     # HELPER METHODS FOR COLLISION DETECTION
     def _detectCollisions(self):
         """
-        Detects if an alien bolt has collided with the ship.
+        Detects if a player bolt has hit an alien or an alien bolt has collided
+        with the ship.
+
+        Each player bolt is tested only against the grid cells it crossed
+        since the last update (see _hitAlien). The rest of the formation is
+        never looked at, so the cost of this method grows with the number of
+        bolts and not bolts times aliens. Most
+        alien bolts are nowhere near the bunkers or the ship, so their heights
+        are compared here before any method is called.
         """
-        for b in self._bolts:
-            for i in range(0, len(self._aliens)):
-                for j in range(0, len(self._aliens[i])):
-                    if self._aliens[i][j] != None:
-                        if self._aliens[i][j].collides(b):
-                            if self._mute == 1:
-                                self._aliens[i][j].alienDeathPlay()
-                            #Update score
-                            self._score += self._aliens[i][j].getType() * 100
-                            self._scoreLabel.text = "Score: " + str(self._score)
-                            self._aliens[i][j] = None
-                            self._bolts.remove(b)
-                            #Dynamically speed up waves
-                            self._speed *= 0.97
-            if self._ship != None:
-                if self._ship.collides(b):
-                    if self._mute == 1:
-                        self._ship.shipDeathPlay()
-                    self._ship = None
-                    self._lives -= 1
-                    self._bolts.clear()
+        bolts = self._bolts
+        ship = self._ship
+        if ship != None:
+            ship_low = ship.getShipY() - (SHIP_HEIGHT + BOLT_HEIGHT)/2
+            ship_high = ship.getShipY() + (SHIP_HEIGHT + BOLT_HEIGHT)/2
+        else:
+            #An empty range, so no bolt is compared with a missing ship
+            ship_low = 1
+            ship_high = 0
+        bunker_low = BUNKER_Y - (BUNKER_ROWS*BUNKER_CELL + BOLT_HEIGHT)/2
+        bunker_high = BUNKER_Y + (BUNKER_ROWS*BUNKER_CELL + BOLT_HEIGHT)/2
+        keep = 0
+        seen = 0
+        for b in bolts:
+            seen += 1
+            y = b.y
+            if bunker_low <= y <= bunker_high and self._hitBunker(b):
+                self._releaseBolt(b)
+            elif b.isPlayerBolt():
+                if self._hitAlien(b):
+                    self._releaseBolt(b)
+                else:
+                    bolts[keep] = b
+                    keep += 1
+            elif ship_low <= y <= ship_high and ship.collides(b):
+                self._releaseBolt(b)
+                self._hitShip()
+                if self._ship == None:
+                    #The ship blew up, which clears the screen of bolts
+                    for other in bolts[:keep] + bolts[seen:]:
+                        self._releaseBolt(other)
+                    keep = 0
+                    break
+            else:
+                bolts[keep] = b
+                keep += 1
+        del bolts[keep:]
+
+    def _hitBunker(self, bolt):
+        """
+        Returns True if the bolt (from either side) hit a bunker.
+
+        Bunkers all sit at BUNKER_Y, so most bolts are ruled out by a single
+        comparison. Otherwise the only bunker the bolt can touch is the one
+        whose slot it is in.
+
+        Parameter bolt: The laser bolt to check
+        Precondition: bolt is of class Bolt
+        """
+        if abs(bolt.y - BUNKER_Y) > (BUNKER_ROWS*BUNKER_CELL + BOLT_HEIGHT)/2:
+            return False
+        index = round(bolt.x*(BUNKER_COUNT+1)/GAME_WIDTH) - 1
+        if index < 0 or index >= BUNKER_COUNT:
+            return False
+        if self._bunkers[index].absorbBolt(bolt):
+            self._bunkersHashed = None
+            return True
+        return False
+
+    def _hitAlien(self, bolt):
+        """
+        Returns True if the player bolt hit an alien (which is then removed).
+
+        Aliens sit on a regular grid that moves as one, so the aliens the bolt
+        can touch are the cells within half an alien (plus half a bolt) of it.
+        A bolt moves further than a row pitch in one update once a formation
+        is scaled down, so every row it covered since the last update is
+        checked, from the bottom up: the lowest living alien in its path is
+        the one it hit. Each cell is found in the formation by a binary
+        search.
+
+        Parameter bolt: The laser bolt to check
+        Precondition: bolt is a player Bolt
+        """
+        reach_x = (self._alienW + BOLT_WIDTH)/2
+        reach_y = (self._alienH + BOLT_HEIGHT)/2
+        x = bolt.x - self._originX
+        y = bolt.y - self._originY
+        first_col = max(0, math.ceil((x - reach_x)/self._pitchX))
+        last_col = min(self._cols-1, math.floor((x + reach_x)/self._pitchX))
+        first_row = max(0, math.ceil((y - bolt.getBoltVelocity() - reach_y)/
+        self._pitchY))
+        last_row = min(self._rows-1, math.floor((y + reach_y)/self._pitchY))
+        index = -1
+        for row in range(first_row, last_row+1):
+            if self._rowAlive[row] > 0:
+                for col in range(first_col, last_col+1):
+                    index = self._formation.indexOf(row, col)
+                    if index >= 0 and self._aliens[index] != None:
+                        break
+                    index = -1
+                if index >= 0:
+                    break
+        if index < 0:
+            return False
+        alien = self._aliens[index]
+        if self._mute == 1 and self._detail < SHED_SOUND:
+            alien.alienDeathPlay()
+        if self._particles != None:
+            self._particles.burst(alien.getAlienX(), alien.getAlienY(),
+            PARTICLES_PER_ALIEN, alien.getType())
+        #Update score
+        self._score += alien.getType() * 100
+        self._scoreLabel.setValue(self._score)
+        self._aliens[index] = None
+        self._aliensHashed = None
+        for observer in self._observers:
+            observer.alienKilled(row, col)
+        if self._telemetry != None:
+            self._telemetry.emit(EVENT_KILL, alien.getType(), row, col)
+        self._alive -= 1
+        self._colAlive[col] -= 1
+        self._rowAlive[row] -= 1
+        #Dynamically speed up waves
+        self._speed *= 0.97
+        return True
+
+    def _hitShip(self):
+        """
+        Handles an alien bolt hitting the ship.
+
+        In the classic game the ship is destroyed and a life is lost. In
+        bullet-hell mode the ship survives and the player loses
+        HELL_HIT_PENALTY points instead, so the screen can fill up.
+        """
+        if GAME_MODE == MODE_BULLET_HELL:
+            self._score = max(0, self._score - HELL_HIT_PENALTY)
+            self._scoreLabel.setValue(self._score)
+            if self._telemetry != None:
+                self._telemetry.emit(EVENT_HIT, self._lives, self._score, 0)
+            return
+        if self._mute == 1:
+            self._ship.shipDeathPlay()
+        if self._particles != None:
+            self._particles.burst(self._ship.getShipX(), self._ship.getShipY(),
+            PARTICLES_PER_SHIP, 0)
+        self._ship = None
+        self._lives -= 1
+        if self._telemetry != None:
+            self._telemetry.emit(EVENT_HIT, self._lives, self._score, 1)
 
     #HELPER METHODS FOR WAVE
+    def _sizeFormation(self, formation):
+        """
+        Sets the formation size and the (possibly scaled) alien dimensions.
+
+        The standard grid keeps the sizes in consts.py exactly. A grid that
+        would be wider than FORMATION_WIDTH or taller than FORMATION_HEIGHT is
+        shrunk by a single factor, so the aliens keep their shape. The height
+        is the one _populate_aliens lays out: every row's pitch plus the gap
+        of one alien left under the ceiling, less the separation under the
+        bottom row. The alive counts per row and column are filled in as the
+        aliens are built.
+
+        Parameter formation: the aliens
+        Precondition: formation is a Formation
+        """
+        rows = formation.getRows()
+        cols = formation.getCols()
+        self._formation = formation
+        self._rows = rows
+        self._cols = cols
+        scale = min(1, FORMATION_WIDTH/(cols*(ALIEN_H_SEP+ALIEN_WIDTH)),
+        FORMATION_HEIGHT/(rows*(ALIEN_V_SEP+ALIEN_HEIGHT) + ALIEN_HEIGHT -
+        ALIEN_V_SEP))
+        self._alienW = ALIEN_WIDTH*scale
+        self._alienH = ALIEN_HEIGHT*scale
+        self._sepX = ALIEN_H_SEP*scale
+        self._pitchX = (ALIEN_H_SEP+ALIEN_WIDTH)*scale
+        self._pitchY = (ALIEN_V_SEP+ALIEN_HEIGHT)*scale
+        self._walkX = ALIEN_H_WALK*scale
+        self._walkY = ALIEN_V_WALK*scale
+        self._alive = formation.getSize()
+        self._colAlive = [0]*cols
+        self._rowAlive = [0]*rows
+
+    def _build(self):
+        """
+        Builds the formation and then fills the bolt pools.
+
+        This is a generator, yielding between pieces of work (see buildStep).
+        Filling the pools up front means a wave in steady play never has to
+        make a new Bolt.
+        """
+        yield from self._populate_aliens()
+        if GAME_MODE == MODE_BULLET_HELL:
+            size = BOLT_POOL_HELL
+        else:
+            size = BOLT_POOL
+        #Pooled bolts wait off screen until they are put in play
+        for k in range(size):
+            self._playerPool.append(Bolt(-BOLT_WIDTH, -BOLT_HEIGHT,
+            BOLT_WIDTH, BOLT_HEIGHT, BOLT_SPEED, 'green'))
+            self._alienPool.append(Bolt(-BOLT_WIDTH, -BOLT_HEIGHT,
+            BOLT_WIDTH, BOLT_HEIGHT, -BOLT_SPEED, 'red'))
+            self._playerFree += 1
+            self._alienFree += 1
+            if k % 64 == 63:
+                yield k
+
     def _populate_aliens(self):
         """
-        Populate a 2D array with Alien objects.
-        """
-        thanos_army = []
-        alien_x = ALIEN_H_SEP + (ALIEN_WIDTH/2)
-        alien_y = GAME_HEIGHT - (ALIEN_CEILING + (ALIEN_HEIGHT/2) + \
-        (ALIEN_HEIGHT*ALIEN_ROWS) + (ALIEN_V_SEP*(ALIEN_ROWS-1)))
-        image_index = 0
-        row_counter = 0
-        for row in range(ALIEN_ROWS):
-            temp_row = []
-            for column in range(ALIENS_IN_ROW):
-                temp_row.append(Alien(alien_x, alien_y, ALIEN_WIDTH,
-                ALIEN_HEIGHT, ALIEN_IMAGES[image_index], image_index+1))
-                alien_x += (ALIEN_H_SEP + ALIEN_WIDTH)
-            thanos_army.append(temp_row)
-            #Reset the x value to the beginning of the row
-            alien_x = ALIEN_H_SEP + (ALIEN_WIDTH/2)
-            #Increment the y value upwards
-            alien_y += (ALIEN_V_SEP + ALIEN_HEIGHT)
-            #Ensure 2 rows of aliens per image
-            row_counter += 1
-            if row_counter == 2:
-                image_index += 1
-                if image_index >= len(ALIEN_IMAGES):
-                    image_index = 0
-                row_counter = 0
-        return thanos_army
+        Populate the list _aliens with Alien objects, one row at a time.
+
+        Only the cells of the formation get an alien, and each gets the image
+        of its type. This is a generator: it yields after every finished row
+        so that buildStep can stop between rows.
+        """
+        thanos_army = self._aliens
+        self._originX = self._sepX + (self._alienW/2)
+        self._originY = GAME_HEIGHT - (ALIEN_CEILING + (self._alienH/2) + \
+        (self._pitchY*self._rows) - (self._pitchY-self._alienH))
+        cells = self._formation.getCells()
+        types = self._formation.getTypes()
+        last = 0
+        for index in range(len(cells)):
+            row, col = divmod(cells[index], self._cols)
+            if row != last:
+                yield last
+                last = row
+            kind = types[index]
+            self._offsetX.append(col*self._pitchX)
+            self._offsetY.append(row*self._pitchY)
+            thanos_army.append(Alien(self._originX + self._offsetX[-1],
+            self._originY + self._offsetY[-1], self._alienW, self._alienH,
+            ALIEN_IMAGES[kind-1], kind))
+            self._rowAlive[row] += 1
+            self._colAlive[col] += 1
+        yield last
 
     def _determineDirection(self):
         """
         Determines the direction of the alien wave.
+
+        The edges of the wave come from the per-column alive counts, so this
+        looks at one number per column instead of every alien.
         """
         min_x = GAME_WIDTH
         max_x = 0
-        #Find leftmost x value
-        for row in self._aliens:
-            for a in row:
-                if a != None:
-                    if a.getAlienX() < min_x:
-                        min_x = a.getAlienX()
-                    if a.getAlienX() > max_x:
-                        max_x = a.getAlienX()
+        #Find leftmost and rightmost living columns
+        left = 0
+        while left < self._cols and self._colAlive[left] == 0:
+            left += 1
+        if left < self._cols:
+            right = self._cols-1
+            while self._colAlive[right] == 0:
+                right -= 1
+            min_x = self._originX + left*self._pitchX
+            max_x = self._originX + right*self._pitchX
         #Determine direction
-        if max_x >= GAME_WIDTH-ALIEN_H_SEP-ALIEN_WIDTH/2:
+        if max_x >= GAME_WIDTH-self._sepX-self._alienW/2:
             self._direction = 'left'
-        if min_x <= ALIEN_H_SEP+ALIEN_WIDTH/2:
+        if min_x <= self._sepX+self._alienW/2:
             self._direction = 'right'
 
     def _alienMove(self, dt):
@@ -277,15 +1037,23 @@ class Wave(object):
             if self._go_down == True:
                 self._go_down = self._bustDown()
             else:
-                for row in self._aliens:
-                    for a in row:
-                        if a != None:
-                            if self._direction == 'right':
-                                a.setAlienX(a.getAlienX() + ALIEN_H_WALK)
-                            if self._direction == 'left':
-                                a.setAlienX(a.getAlienX() - ALIEN_H_WALK)
-                            #Animate aliens
-                            a.frame = (a.frame+1) % 2
+                if self._direction == 'right':
+                    self._originX += self._walkX
+                if self._direction == 'left':
+                    self._originX -= self._walkX
+                animate = self._detail < SHED_ANIMATION
+                if animate:
+                    self._frame = 1 - self._frame
+                #Every alien is placed from the origin, not moved from where
+                #it was, so loadState can put it back exactly
+                origin = self._originX
+                frame = self._frame
+                for a, offset in zip(self._aliens, self._offsetX):
+                    if a != None:
+                        a.setAlienX(origin + offset)
+                        #Animate aliens
+                        a.frame = frame
+                self._aliensHashed = None
             self._time = 0
             self._steps -= 1
         else:
@@ -295,10 +1063,12 @@ class Wave(object):
         """
         Moves an Alien down.
         """
-        for row in self._aliens:
-            for a in row:
-                if a != None:
-                    a.setAlienY(a.getAlienY() - ALIEN_V_WALK)
+        self._originY -= self._walkY
+        origin = self._originY
+        for a, offset in zip(self._aliens, self._offsetY):
+            if a != None:
+                a.setAlienY(origin + offset)
+        self._aliensHashed = None
         return False
 
     def _fireBolt(self, input):
@@ -309,55 +1079,214 @@ class Wave(object):
         bolt on screen. If there is a bolt, the ship must wait to shoot. When
         the bolt flies off screen, a new bolt may be fired.
 
-        Parameter input: an input passed down from invaders
-        Precondition: a valid input
+        Parameter input: the keys of this frame, passed down from invaders
+        Precondition: input is an InputSnapshot
         """
-        pew = input.is_key_down('spacebar')
+        pew = input.isDown(KEY_FIRE)
         if self._ship != None:
             bolt_x = self._ship.getShipX()
             bolt_y = self._ship.getShipY() + SHIP_HEIGHT/2 + BOLT_HEIGHT/2
-            safety = False
-            #Check if there is already a player bolt
-            for b in self._bolts:
-                if b.isPlayerBolt():
-                    safety = True
-            #Press 'spacebar' to shoot
-            if pew and not self._last and not safety:
-                if self._mute == 1:
-                    self._ship.shipBoltPlay()
-                self._bolts.append(Bolt(bolt_x, bolt_y, BOLT_WIDTH,
-                BOLT_HEIGHT, BOLT_SPEED, 'green'))
-        for b in self._bolts:
-            b.setBoltY(b.getBoltY() + b.getBoltVelocity())
-            if (b.getBoltY() - BOLT_HEIGHT/2) >= GAME_HEIGHT or \
-            (b.getBoltY() + BOLT_HEIGHT/2) <= 0:
-                self._bolts.remove(b)
-        self._last = pew
+            if GAME_MODE == MODE_BULLET_HELL:
+                #Hold 'spacebar' to fire a spread shot every frame
+                if pew:
+                    if self._mute == 1 and input.isPressed(KEY_FIRE):
+                        self._ship.shipBoltPlay()
+                    self._spreadShot(bolt_x, bolt_y, SPREAD_SHOTS, BOLT_SPEED,
+                    'green')
+                    self._shots += 1
+                    if self._telemetry != None:
+                        self._telemetry.emit(EVENT_SHOT, 0, SPREAD_SHOTS, -1)
+            else:
+                safety = False
+                #Check if there is already a player bolt
+                for b in self._bolts:
+                    if b.isPlayerBolt():
+                        safety = True
+                        break
+                #Press 'spacebar' to shoot
+                if input.isPressed(KEY_FIRE) and not safety:
+                    if self._mute == 1:
+                        self._ship.shipBoltPlay()
+                    self._newBolt(bolt_x, bolt_y, BOLT_SPEED, 'green', 0)
+                    self._shots += 1
+                    if self._telemetry != None:
+                        self._telemetry.emit(EVENT_SHOT, 0, 1, -1)
+        self._moveBolts()
+
+    def _moveBolts(self):
+        """
+        Moves every bolt, drops the ones that have left the screen and hashes
+        where the rest are.
+
+        The list is compacted in place in one pass instead of removing bolts
+        one at a time, which would be quadratic with thousands of bolts on
+        screen. Dropped bolts go back to their pool.
+        """
+        bolts = self._bolts
+        keep = 0
+        hashed = 0
+        for b in bolts:
+            if b.moveBolt():
+                bolts[keep] = b
+                keep += 1
+                hashed += _boltHash(b)
+            else:
+                self._releaseBolt(b)
+        del bolts[keep:]
+        self._boltsHashed = hashed & HASH_MASK
+
+    def _newBolt(self, bolt_x, bolt_y, speed, color, vx):
+        """
+        Puts a bolt in play, reusing one from the pools if there is one.
+
+        Player and alien bolts have separate pools, so a reused bolt already
+        has the right color. The hash of where the bolt is goes into
+        _boltsHashed (see stateHash).
+
+        Parameter bolt_x: horizontal location of the bolt
+        Precondition: bolt_x is a number
+
+        Parameter bolt_y: vertical location of the bolt
+        Precondition: bolt_y is a number
+
+        Parameter speed: the vertical velocity of the bolt
+        Precondition: speed is a nonzero number (> 0 for player bolts)
+
+        Parameter color: the color of the bolt
+        Precondition: color is 'green' for player bolts, 'red' otherwise
+
+        Parameter vx: the horizontal velocity of the bolt
+        Precondition: vx is a number
+        """
+        bolt = None
+        if speed > 0 and self._playerFree > 0:
+            self._playerFree -= 1
+            bolt = self._playerPool[self._playerFree]
+        elif speed < 0 and self._alienFree > 0:
+            self._alienFree -= 1
+            bolt = self._alienPool[self._alienFree]
+        if bolt != None:
+            bolt.resetBolt(bolt_x, bolt_y, speed, vx)
+        else:
+            bolt = Bolt(bolt_x, bolt_y, BOLT_WIDTH, BOLT_HEIGHT, speed, color,
+            vx)
+        self._boltsHashed = (self._boltsHashed + _boltHash(bolt)) & HASH_MASK
+        self._bolts.append(bolt)
+        for observer in self._observers:
+            observer.boltFired(bolt)
+
+    def _releaseBolt(self, bolt):
+        """
+        Returns a bolt that left play to its pool.
+
+        The caller must also take it out of _bolts.
+
+        Parameter bolt: the bolt to release
+        Precondition: bolt is a Bolt that was in _bolts
+        """
+        for observer in self._observers:
+            observer.boltRemoved(bolt)
+        self._boltsHashed = (self._boltsHashed - _boltHash(bolt)) & HASH_MASK
+        if bolt.isPlayerBolt():
+            self._playerFree = _putBack(self._playerPool, self._playerFree, bolt)
+        else:
+            self._alienFree = _putBack(self._alienPool, self._alienFree, bolt)
+
+    def _spreadShot(self, bolt_x, bolt_y, count, speed, color):
+        """
+        Fires a fan of count bolts centered on (bolt_x, bolt_y).
+
+        Parameter bolt_x: horizontal location of the center bolt
+        Precondition: bolt_x is a number
+
+        Parameter bolt_y: vertical location of the bolts
+        Precondition: bolt_y is a number
+
+        Parameter count: the number of bolts in the fan
+        Precondition: count is an int > 0
+
+        Parameter speed: the vertical velocity of each bolt
+        Precondition: speed is a nonzero number (> 0 for player bolts)
+
+        Parameter color: the color of the bolts
+        Precondition: color is a valid color string
+        """
+        middle = (count-1)/2
+        for k in range(count):
+            self._newBolt(bolt_x, bolt_y, speed, color, (k-middle)*SPREAD_ANGLE)
+
+    def _randint(self, top):
+        """
+        Returns a random int in 0..top from _random, and marks the state of
+        _random to be hashed again.
+
+        The state only changes when a number is drawn, so it is only hashed
+        on the first stateHash after a draw, not every tick. Numbers drawn
+        from _random anywhere else show up in the hash after the next draw.
+
+        Parameter top: the largest int to return
+        Precondition: top is an int >= 0
+        """
+        value = self._random.randint(0, top)
+        self._randomHashed = None
+        return value
 
     def _alienBolts(self):
         """
         Creates a new Bolt object and fires from a random alien.
         """
-        #Find random nonempty column
-        rand_col = random.randint(0, ALIENS_IN_ROW-1)
-        while rand_col == None:
-            rand_col = random.randint(0, ALIENS_IN_ROW-1)
-        #Find bottommost alien in column
-        bottom_index = 0
-        shooter = self._aliens[bottom_index][rand_col]
-        while shooter == None and bottom_index < ALIEN_ROWS:
-            shooter = self._aliens[bottom_index][rand_col]
-            bottom_index += 1
+        if GAME_MODE == MODE_BULLET_HELL:
+            self._alienVolley()
+            return
+        #Only a frame where the aliens may fire draws a column, so the random
+        #numbers (and their hash) are left alone on every other frame
+        if self._time < self._speed or self._steps > 1:
+            return
+        #Find bottommost alien in a random (or the aimed) column
+        if self._aim == None:
+            rand_col = self._randint(self._cols-1)
+        else:
+            rand_col = self._aim
+        shooter = None
+        if rand_col >= 0 and rand_col < self._cols:
+            shooter = self.getBottomAlien(rand_col)
         #Fire the bolt from the shooter
-        if shooter != None and self._time >= self._speed:
+        if shooter != None:
             bolt_x = shooter.getAlienX()
-            bolt_y = shooter.getAlienY() - ALIEN_HEIGHT/2 - BOLT_HEIGHT/2
-            if self._steps <= 1:
-                if self._mute == 1:
+            bolt_y = shooter.getAlienY() - self._alienH/2 - BOLT_HEIGHT/2
+            if self._mute == 1 and self._detail < SHED_SOUND:
+                shooter.alienBoltPlay()
+            self._newBolt(bolt_x, bolt_y, -BOLT_SPEED, 'red', 0)
+            self._steps = self._randint(self._boltRate)
+            if self._telemetry != None:
+                self._telemetry.emit(EVENT_SHOT, 1, 1, rand_col)
+
+    def _alienVolley(self):
+        """
+        Fires a spread from the bottom alien of VOLLEY_COLUMNS random columns.
+
+        This is the bullet-hell replacement for the single alien bolt. It fires
+        every frame so that thousands of bolts build up on screen.
+        """
+        played = False
+        for n in range(VOLLEY_COLUMNS):
+            if n == 0 and self._aim != None:
+                col = self._aim
+            else:
+                col = self._randint(self._cols-1)
+            shooter = None
+            if col >= 0 and col < self._cols:
+                shooter = self.getBottomAlien(col)
+            if shooter != None:
+                if self._mute == 1 and not played and \
+                self._detail < SHED_SOUND:
                     shooter.alienBoltPlay()
-                self._bolts.append(Bolt(bolt_x, bolt_y, BOLT_WIDTH,
-                BOLT_HEIGHT, -BOLT_SPEED, 'red'))
-                self._steps = random.randint(0, BOLT_RATE)
+                    played = True
+                self._spreadShot(shooter.getAlienX(), shooter.getAlienY() -
+                self._alienH/2 - BOLT_HEIGHT/2, VOLLEY_SPREAD,
+                -HELL_BOLT_SPEED, 'red')
+                if self._telemetry != None:
+                    self._telemetry.emit(EVENT_SHOT, 1, VOLLEY_SPREAD, col)
 
     def _checkResults(self):
         """
@@ -366,27 +1295,24 @@ class Wave(object):
         #Check loss conditions
         if self._lives <= 0:
             self._result = 1
-        for row in self._aliens:
-            for a in row:
-                if a != None:
-                    if a.getAlienY() - ALIEN_HEIGHT/2 < DEFENSE_LINE:
-                        self._result = 1
+        #Only the lowest living row can reach the defense line
+        bottom = 0
+        while bottom < self._rows and self._rowAlive[bottom] == 0:
+            bottom += 1
+        if bottom < self._rows and \
+        self._originY + bottom*self._pitchY - self._alienH/2 < DEFENSE_LINE:
+            self._result = 1
         #Check win conditions
-        allNone = True
-        for row in self._aliens:
-            for a in row:
-                if a != None:
-                    allNone = False
-        if allNone:
+        if self._alive == 0:
             self._result = 2
 
     def _changeVolume(self, input):
         """
         Allows the user to mute and unmute the game sounds.
         """
-        if input.is_key_down('m') and self._mute == 1:
+        if input.isDown(KEY_MUTE) and self._mute == 1:
             self._mute = 0
-        elif input.is_key_down('p') and self._mute == 0:
+        elif input.isDown(KEY_UNMUTE) and self._mute == 0:
             self._mute = 1
 
 